@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+from __future__ import absolute_import
+from __future__ import print_function
+
+"""
+Measuring the time to generate the duck punched constructors, in fresh python processes,
+without the code cache, with a cold cache (generating and storing the code), and with a warm cache.
+
+A warm cache only skips the slot plan analysis and the source generation and compilation :
+the validators and default values are python functions, rebuilt in every process.
+
+Usage : python benchmarks/codecache_time.py [repeat]
+The ROS environment (or the python path to the generated messages) should already be setup.
+"""
+
+import shutil
+import subprocess
+import sys
+import tempfile
+
+timer = """
+import time
+import pyros_msgs.msg
+from pyros_msgs import codecache
+from pyros_msgs.opt_as_array import opt_as_array
+classes = [getattr(pyros_msgs.msg, n) for n in dir(pyros_msgs.msg) if n.startswith('test_opt_') and n.endswith('_as_array')]
+cache_dir = {cache_dir!r}
+if cache_dir is not None:
+    codecache.enable(cache_dir)
+start = time.time()
+for msg_mod in classes:
+    opt_as_array._generate_init(msg_mod, ['data'])
+print((time.time() - start) / len(classes))
+"""
+
+
+def measure(cache_dir, cold, repeat):
+    """Generate the constructors in a new python process, repeat times, and return the best time per class in seconds"""
+    times = []
+    for _ in range(repeat):
+        if cold and cache_dir is not None:
+            shutil.rmtree(cache_dir, ignore_errors=True)
+        output = subprocess.check_output([sys.executable, '-c', timer.format(cache_dir=cache_dir)])
+        times.append(float(output.decode().strip().splitlines()[-1]))
+    return min(times)
+
+
+if __name__ == '__main__':
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    cache_dir = tempfile.mkdtemp()
+    try:
+        for name, path, cold in [('no cache', None, False), ('cold cache', cache_dir, True), ('warm cache', cache_dir, False)]:
+            print("{name:<12} {time:8.1f} us per class".format(name=name, time=measure(path, cold, repeat) * 1000000))
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
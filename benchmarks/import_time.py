@@ -0,0 +1,47 @@
+#!/usr/bin/env python
+from __future__ import absolute_import
+from __future__ import print_function
+
+"""
+Measuring the import time of pyros_msgs.opt_as_nested, in fresh python processes.
+
+Message types are imported and duck punched lazily, on first access :
+importing the module alone does not import genpy, numpy or the generated messages
+(tests/opt_as_nested/test_lazy_load.py checks it), and is much cheaper than accessing any optional message type.
+Accessing a single type costs about as much as accessing all of them, the import of genpy and std_msgs dominating.
+
+Usage : python benchmarks/import_time.py [repeat]
+The ROS environment (or the python path to the generated messages) should already be setup.
+"""
+
+import subprocess
+import sys
+
+statements = [
+    ('import only', "import pyros_msgs.opt_as_nested"),
+    ('one type', "import pyros_msgs.opt_as_nested; pyros_msgs.opt_as_nested.opt_int32"),
+    ('all types', "from pyros_msgs.opt_as_nested import *"),
+]
+
+timer = """
+import time
+start = time.time()
+{statement}
+print(time.time() - start)
+"""
+
+
+def measure(statement, repeat):
+    """Run the statement in a new python process, repeat times, and return the best time in seconds"""
+    times = []
+    for _ in range(repeat):
+        output = subprocess.check_output([sys.executable, '-c', timer.format(statement=statement)])
+        times.append(float(output.decode().strip().splitlines()[-1]))
+    return min(times)
+
+
+if __name__ == '__main__':
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    baseline = measure('pass', repeat)
+    for name, statement in statements:
+        print("{name:<12} {time:8.2f} ms".format(name=name, time=(measure(statement, repeat) - baseline) * 1000))
@@ -0,0 +1,117 @@
+from __future__ import absolute_import
+from __future__ import print_function
+
+"""
+Benchmarks of the conversion of optional field messages to dicts and back,
+against a naive conversion walking the message slots.
+
+Usage (offline, with pytest-benchmark installed) :
+    python -m pytest benchmarks/test_bench_convert.py
+"""
+
+import pytest
+
+pytest.importorskip('pytest_benchmark')
+
+try:
+    import genpy
+    import std_msgs.msg
+    import pyros_msgs.opt_as_array
+    import pyros_msgs.opt_as_nested
+    import pyros_msgs.msg
+    from pyros_msgs import convert
+except ImportError:
+    # Because we need to access Ros message types here (from ROS env or from virtualenv, or from somewhere else)
+    import pyros_setup
+    # We rely on default configuration to point us ot the proper distro
+    pyros_setup.configurable_import().configure().activate()
+    import genpy
+    import std_msgs.msg
+    import pyros_msgs.opt_as_array
+    import pyros_msgs.opt_as_nested
+    import pyros_msgs.msg
+    from pyros_msgs import convert
+
+
+def naive_to_dict(msg):
+    """Walk the slots of a message with getattr, as a generic bridge does"""
+    if not getattr(msg, 'initialized_', True):
+        return {}
+    d = {}
+    for s in msg.__slots__:
+        if s == 'initialized_':
+            continue
+        v = getattr(msg, s)
+        if s in getattr(msg, '_opt_slots', ()):
+            if not v:
+                continue
+            v = v[0] if len(v) == 1 else list(v)
+        if isinstance(v, genpy.Message) and 'initialized_' in v.__slots__:
+            if not v.initialized_:
+                continue
+            v = v.data
+        if isinstance(v, (genpy.Time, genpy.Duration)):
+            v = {'secs': v.secs, 'nsecs': v.nsecs}
+        elif isinstance(v, genpy.Message):
+            v = naive_to_dict(v)
+        elif isinstance(v, (list, tuple)):
+            v = [naive_to_dict(e) if isinstance(e, genpy.Message) else e for e in v]
+        d[s] = v
+    return d
+
+
+def naive_from_dict(msg_class, values):
+    """Convert nested dicts with the slot types, as a generic bridge does"""
+    kwds = {}
+    for s, st in zip(msg_class.__slots__, msg_class._slot_types):
+        if s not in values or values[s] is None:
+            continue
+        v = values[s]
+        if st in ('time', 'duration'):
+            v = (genpy.Time if st == 'time' else genpy.Duration)(**v)
+        elif isinstance(v, dict):
+            nested_class = convert.resolve(st.rstrip('[]'))
+            v = naive_from_dict(nested_class, v)
+        kwds[s] = v
+    return msg_class(**kwds)
+
+
+pyros_msgs.opt_as_array.duck_punch(pyros_msgs.msg.test_opt_header_as_array, ['data'])
+pyros_msgs.opt_as_array.duck_punch(pyros_msgs.msg.test_opt_int32_as_array, ['data'])
+
+header = std_msgs.msg.Header(seq=42, stamp=genpy.Time(4, 2), frame_id='fortytwo')
+messages = {
+    'opt_as_array int32': pyros_msgs.msg.test_opt_int32_as_array(data=42),
+    'opt_as_array header': pyros_msgs.msg.test_opt_header_as_array(data=header),
+    'opt_as_nested int32': pyros_msgs.opt_as_nested.opt_int32(data=42),
+    'opt_as_nested header': pyros_msgs.opt_as_nested.opt_header(data=header),
+    'opt_as_nested header unset': pyros_msgs.opt_as_nested.opt_header(),
+}
+names = sorted(messages)
+
+
+@pytest.mark.parametrize('name', names)
+@pytest.mark.benchmark(group='to_dict')
+def test_to_dict(benchmark, name):
+    msg = messages[name]
+    assert benchmark(convert.to_dict, msg) == naive_to_dict(msg)
+
+
+@pytest.mark.parametrize('name', names)
+@pytest.mark.benchmark(group='to_dict')
+def test_to_dict_naive(benchmark, name):
+    benchmark(naive_to_dict, messages[name])
+
+
+@pytest.mark.parametrize('name', names)
+@pytest.mark.benchmark(group='from_dict')
+def test_from_dict(benchmark, name):
+    msg = messages[name]
+    assert benchmark(convert.from_dict, type(msg), convert.to_dict(msg)) == msg
+
+
+@pytest.mark.parametrize('name', names)
+@pytest.mark.benchmark(group='from_dict')
+def test_from_dict_naive(benchmark, name):
+    msg = messages[name]
+    assert benchmark(naive_from_dict, type(msg), convert.to_dict(msg)) == msg
@@ -0,0 +1,237 @@
+from __future__ import absolute_import
+from __future__ import print_function
+
+"""
+Benchmarks of the duck punched optional message types, against the genpy generated message types.
+
+For every type in msg/opt_as_array and msg/opt_as_nested, we measure :
+- construction with a value
+- default construction
+- construction failing validation (duck punched types only)
+- serialize / deserialize round trip
+
+The genpy baseline is a fresh copy of the generated message class, loaded from the generated module,
+that has not been duck punched.
+
+Usage (offline, with pytest-benchmark installed) :
+    python -m pytest benchmarks/test_bench_messages.py
+    python -m pytest benchmarks/test_bench_messages.py --benchmark-compare  # to catch regressions with a saved run
+"""
+
+import sys
+from io import BytesIO
+
+import pytest
+
+pytest.importorskip('pytest_benchmark')
+
+try:
+    import genpy
+    import std_msgs.msg
+    import pyros_msgs.opt_as_array
+    import pyros_msgs.opt_as_nested
+    import pyros_msgs.msg
+except ImportError:
+    # Because we need to access Ros message types here (from ROS env or from virtualenv, or from somewhere else)
+    import pyros_setup
+    # We rely on default configuration to point us ot the proper distro
+    pyros_setup.configurable_import().configure().activate()
+    import genpy
+    import std_msgs.msg
+    import pyros_msgs.opt_as_array
+    import pyros_msgs.opt_as_nested
+    import pyros_msgs.msg
+
+# type name -> (valid value, invalid value)
+values = {
+    'empty': (std_msgs.msg.Empty(), 42),
+    'bool': (True, 42),
+    'int8': (42, 'fortytwo'), 'int16': (42, 'fortytwo'), 'int32': (42, 'fortytwo'), 'int64': (42, 'fortytwo'),
+    'uint8': (42, 'fortytwo'), 'uint16': (42, 'fortytwo'), 'uint32': (42, 'fortytwo'), 'uint64': (42, 'fortytwo'),
+    'float32': (4.2, 'fortytwo'), 'float64': (4.2, 'fortytwo'),
+    'string': ('fortytwo', 42),
+    'time': (genpy.Time(4, 2), 42),
+    'duration': (genpy.Duration(4, 2), 42),
+    'header': (std_msgs.msg.Header(seq=42, frame_id='fortytwo'), 42),
+}
+
+type_names = sorted(values)
+
+
+def load_source(name, path):
+    """Load a python module from its source file"""
+    try:
+        import importlib.util
+    except ImportError:  # python 2
+        import imp
+        return imp.load_source(name, path)
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def unpatched(msg_class):
+    """Load a fresh copy of a genpy generated message class, that has not been duck punched"""
+    module = sys.modules[msg_class.__module__]
+    fresh_module = load_source('_unpatched' + module.__name__.replace('.', '_'), module.__file__.replace('.pyc', '.py'))
+    return getattr(fresh_module, msg_class.__name__)
+
+
+_array_types = {}
+_nested_types = {}
+
+
+def array_types(type_name):
+    """The duck punched and genpy opt_as_array message types"""
+    if type_name not in _array_types:
+        msg_class = getattr(pyros_msgs.msg, 'test_opt_{0}_as_array'.format(type_name))
+        baseline = unpatched(msg_class)
+        pyros_msgs.opt_as_array.duck_punch(msg_class, ['data'])
+        _array_types[type_name] = msg_class, baseline
+    return _array_types[type_name]
+
+
+def nested_types(type_name):
+    """The duck punched and genpy opt_as_nested message types"""
+    if type_name not in _nested_types:
+        msg_class = getattr(pyros_msgs.opt_as_nested, 'opt_{0}'.format(type_name))
+        _nested_types[type_name] = msg_class, unpatched(msg_class)
+    return _nested_types[type_name]
+
+
+def roundtrip(msg):
+    buff = BytesIO()
+    msg.serialize(buff)
+    return type(msg)().deserialize(buff.getvalue())
+
+
+#
+# opt_as_array
+#
+
+@pytest.mark.parametrize('type_name', type_names)
+@pytest.mark.benchmark(group='opt_as_array construction')
+def test_array_init(benchmark, type_name):
+    msg_class, _ = array_types(type_name)
+    value = values[type_name][0]
+    benchmark(lambda: msg_class(data=value))
+
+
+@pytest.mark.parametrize('type_name', type_names)
+@pytest.mark.benchmark(group='opt_as_array construction')
+def test_array_init_genpy(benchmark, type_name):
+    _, baseline = array_types(type_name)
+    value = values[type_name][0]
+    benchmark(lambda: baseline(data=[value]))
+
+
+@pytest.mark.parametrize('type_name', type_names)
+@pytest.mark.benchmark(group='opt_as_array default construction')
+def test_array_init_default(benchmark, type_name):
+    msg_class, _ = array_types(type_name)
+    benchmark(msg_class)
+
+
+@pytest.mark.parametrize('type_name', type_names)
+@pytest.mark.benchmark(group='opt_as_array default construction')
+def test_array_init_default_genpy(benchmark, type_name):
+    _, baseline = array_types(type_name)
+    benchmark(baseline)
+
+
+@pytest.mark.parametrize('type_name', type_names)
+@pytest.mark.benchmark(group='opt_as_array validation failure')
+def test_array_init_except(benchmark, type_name):
+    msg_class, _ = array_types(type_name)
+    value = values[type_name][1]
+
+    def init_except():
+        try:
+            msg_class(data=value)
+        except AttributeError:
+            pass
+        else:
+            raise AssertionError("{0} accepted {1!r}".format(msg_class._type, value))
+    benchmark(init_except)
+
+
+@pytest.mark.parametrize('type_name', type_names)
+@pytest.mark.benchmark(group='opt_as_array serialization roundtrip')
+def test_array_roundtrip(benchmark, type_name):
+    msg_class, _ = array_types(type_name)
+    msg = msg_class(data=values[type_name][0])
+    benchmark(roundtrip, msg)
+
+
+@pytest.mark.parametrize('type_name', type_names)
+@pytest.mark.benchmark(group='opt_as_array serialization roundtrip')
+def test_array_roundtrip_genpy(benchmark, type_name):
+    _, baseline = array_types(type_name)
+    msg = baseline(data=[values[type_name][0]])
+    benchmark(roundtrip, msg)
+
+
+#
+# opt_as_nested
+#
+
+@pytest.mark.parametrize('type_name', type_names)
+@pytest.mark.benchmark(group='opt_as_nested construction')
+def test_nested_init(benchmark, type_name):
+    msg_class, _ = nested_types(type_name)
+    value = values[type_name][0]
+    benchmark(lambda: msg_class(data=value))
+
+
+@pytest.mark.parametrize('type_name', type_names)
+@pytest.mark.benchmark(group='opt_as_nested construction')
+def test_nested_init_genpy(benchmark, type_name):
+    _, baseline = nested_types(type_name)
+    value = values[type_name][0]
+    benchmark(lambda: baseline(initialized_=True, data=value))
+
+
+@pytest.mark.parametrize('type_name', type_names)
+@pytest.mark.benchmark(group='opt_as_nested default construction')
+def test_nested_init_default(benchmark, type_name):
+    msg_class, _ = nested_types(type_name)
+    benchmark(msg_class)
+
+
+@pytest.mark.parametrize('type_name', type_names)
+@pytest.mark.benchmark(group='opt_as_nested default construction')
+def test_nested_init_default_genpy(benchmark, type_name):
+    _, baseline = nested_types(type_name)
+    benchmark(baseline)
+
+
+@pytest.mark.parametrize('type_name', type_names)
+@pytest.mark.benchmark(group='opt_as_nested validation failure')
+def test_nested_init_except(benchmark, type_name):
+    msg_class, _ = nested_types(type_name)
+
+    def init_except():
+        try:
+            msg_class(initialized_=True)
+        except AttributeError:
+            pass
+        else:
+            raise AssertionError("{0} accepted initialized_".format(msg_class._type))
+    benchmark(init_except)
+
+
+@pytest.mark.parametrize('type_name', type_names)
+@pytest.mark.benchmark(group='opt_as_nested serialization roundtrip')
+def test_nested_roundtrip(benchmark, type_name):
+    msg_class, _ = nested_types(type_name)
+    msg = msg_class(data=values[type_name][0])
+    benchmark(roundtrip, msg)
+
+
+@pytest.mark.parametrize('type_name', type_names)
+@pytest.mark.benchmark(group='opt_as_nested serialization roundtrip')
+def test_nested_roundtrip_genpy(benchmark, type_name):
+    _, baseline = nested_types(type_name)
+    msg = baseline(initialized_=True, data=values[type_name][0])
+    benchmark(roundtrip, msg)
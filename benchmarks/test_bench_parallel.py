@@ -0,0 +1,54 @@
+from __future__ import absolute_import
+from __future__ import print_function
+
+"""
+Benchmarks of the parallel conversion of dicts into serialized messages, for an increasing number of worker processes,
+against the conversion in this process only.
+
+The speedup is bounded by the number of cpus of the machine running the benchmark.
+
+Usage (offline, with pytest-benchmark installed) :
+    python -m pytest benchmarks/test_bench_parallel.py
+"""
+
+import multiprocessing
+
+import pytest
+
+pytest.importorskip('pytest_benchmark')
+
+try:
+    import pyros_msgs.opt_as_array
+    import pyros_msgs.msg
+    from pyros_msgs import batch, convert, parallel
+except ImportError:
+    # Because we need to access Ros message types here (from ROS env or from virtualenv, or from somewhere else)
+    import pyros_setup
+    # We rely on default configuration to point us ot the proper distro
+    pyros_setup.configurable_import().configure().activate()
+    import pyros_msgs.opt_as_array
+    import pyros_msgs.msg
+    from pyros_msgs import batch, convert, parallel
+
+pyros_msgs.opt_as_array.duck_punch(pyros_msgs.msg.test_opt_header_as_array, ['data'])
+
+# a dataset of rows, with the optional field set in half of them
+dicts = [{'data': {'seq': i, 'stamp': {'secs': i, 'nsecs': 42}, 'frame_id': 'fortytwo'}} if i % 2 else {} for i in range(200000)]
+
+worker_counts = sorted(set([1, 2, 4, multiprocessing.cpu_count()]))
+
+
+@pytest.mark.benchmark(group='convert_serialize')
+def test_convert_serialize_in_process(benchmark):
+    def convert_serialize():
+        return batch.serialize_many(list(convert.from_dicts(pyros_msgs.msg.test_opt_header_as_array, dicts)))
+    buf, offsets = benchmark.pedantic(convert_serialize, rounds=3)
+    assert len(offsets) == len(dicts) + 1
+
+
+@pytest.mark.parametrize('workers', worker_counts)
+@pytest.mark.benchmark(group='convert_serialize')
+def test_convert_serialize_parallel(benchmark, workers):
+    buf, offsets = benchmark.pedantic(parallel.convert_serialize, args=(pyros_msgs.msg.test_opt_header_as_array, dicts),
+                                      kwargs={'workers': workers}, rounds=3)
+    assert len(offsets) == len(dicts) + 1
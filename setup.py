@@ -9,6 +9,7 @@ setup_args = generate_distutils_setup(
         'pyros_msgs',
         'pyros_msgs.opt_as_array',
         'pyros_msgs.opt_as_nested',
+        'pyros_msgs.opt_as_bitmask',
     ],
     package_dir={
         'pyros_msgs': 'src/pyros_msgs'
@@ -4,6 +4,8 @@ from __future__ import print_function
 import sys
 import six
 
+__version__ = '0.0.1'  # keep in sync with package.xml
+
 # Utility functions
 
 # Ref : http://wiki.ros.org/msg
@@ -37,7 +39,18 @@ ros_python_default_mapping = {
     'duration': 0,
 }
 
+# numeric bounds of ros types, as (min, max). Values outside of these cannot be packed by genpy.
+ros_python_range_mapping = {
+    'int8': (-2 ** 7, 2 ** 7 - 1), 'uint8': (0, 2 ** 8 - 1),
+    'int16': (-2 ** 15, 2 ** 15 - 1), 'uint16': (0, 2 ** 16 - 1),
+    'int32': (-2 ** 31, 2 ** 31 - 1), 'uint32': (0, 2 ** 32 - 1),
+    'int64': (-2 ** 63, 2 ** 63 - 1), 'uint64': (0, 2 ** 64 - 1),
+    'float32': (-3.4028234663852886e+38, 3.4028234663852886e+38),
+    'float64': (-sys.float_info.max, sys.float_info.max),
+}
+
 __all__ = [
     'ros_python_type_mapping',
-    'ros_python_default_mapping'
+    'ros_python_default_mapping',
+    'ros_python_range_mapping',
 ]
\ No newline at end of file
@@ -0,0 +1,151 @@
+from __future__ import absolute_import
+from __future__ import print_function
+
+"""
+pyros_msgs.aio decodes streams of length prefixed messages, from an asyncio StreamReader, without blocking the event loop.
+
+Each message on the stream is its length (uint32, little endian), followed by the serialized message,
+as ros frames messages on its tcp connections. frame() builds such a stream.
+
+The decoder is an async iterator. It reads what the stream has available, in chunks, and decodes
+all the complete messages read, only waiting on the stream when no complete message is left.
+Messages are decoded as they are consumed : while the consumer is busy, nothing more is read,
+the StreamReader buffer fills up, and the transport stops reading from the socket.
+
+This needs python 3.5 or later.
+"""
+
+import asyncio
+import struct
+from io import BytesIO
+
+import genpy
+
+_struct_I = struct.Struct('<I')
+
+# the size of the messages above which the stream is considered corrupted
+max_message_size = 64 * 1024 * 1024
+
+
+def frame(msgs):
+    """
+    Serialize messages into a stream of length prefixed messages.
+    :param msgs: an iterable of messages
+    :return: the stream bytes
+    """
+    buff = BytesIO()
+    for msg in msgs:
+        start = buff.tell()
+        buff.write(b'\0\0\0\0')  # the length, known once serialized
+        msg.serialize(buff)
+        end = buff.tell()
+        buff.seek(start)
+        buff.write(_struct_I.pack(end - start - 4))
+        buff.seek(end)
+    return buff.getvalue()
+
+
+class MessageStream(object):
+    """
+    An async iterator of the messages decoded from a StreamReader.
+    It yields messages one by one, or lists of messages if batch_size is set.
+    """
+
+    def __init__(self, reader, msg_class, batch_size=None, read_size=64 * 1024, max_size=None):
+        """
+        :param reader: the asyncio StreamReader
+        :param msg_class: the message class of all messages on the stream
+        :param batch_size: the maximum number of messages per list yielded, or None to yield messages one by one.
+        Lists hold the messages already received, up to batch_size : waiting for more is left to the consumer.
+        :param read_size: the maximum number of bytes read from the stream at once
+        :param max_size: the maximum size of a message, larger ones raising ValueError. Defaults to max_message_size.
+        """
+        if batch_size is not None and batch_size < 1:
+            raise ValueError("batch_size should be at least 1, not {0}".format(batch_size))
+        self.reader = reader
+        self.msg_class = msg_class
+        self.batch_size = batch_size
+        self.read_size = read_size
+        self.max_size = max_size or max_message_size
+        self._buffer = bytearray()
+        self._ready = []
+
+    def _decode(self, limit):
+        """Decode up to limit complete messages from the buffer, removing them from it"""
+        buf = self._buffer
+        offset = 0
+        spans = []
+        while len(spans) < limit and offset + 4 <= len(buf):
+            length = _struct_I.unpack_from(buf, offset)[0]
+            if length > self.max_size:
+                raise ValueError("message of {0} bytes on the stream, larger than {1} : the stream is corrupted".format(length, self.max_size))
+            if offset + 4 + length > len(buf):
+                break  # incomplete message
+            spans.append((offset + 4, offset + 4 + length))
+            offset += 4 + length
+        if not spans:
+            return []
+        data = bytes(buf[:offset])
+        del buf[:offset]
+        try:
+            return [self.msg_class().deserialize(data[start:end]) for start, end in spans]
+        except struct.error as e:
+            raise genpy.DeserializationError(e)
+
+    async def _read(self):
+        """Read from the stream until the buffer holds a complete message, returning False at the end of the stream"""
+        while True:
+            if len(self._buffer) >= 4:
+                length = _struct_I.unpack_from(self._buffer, 0)[0]
+                if length > self.max_size:  # not reading it all before failing
+                    raise ValueError("message of {0} bytes on the stream, larger than {1} : the stream is corrupted".format(length, self.max_size))
+                if len(self._buffer) >= 4 + length:
+                    return True
+            data = await self.reader.read(self.read_size)
+            if not data:
+                if self._buffer:
+                    raise asyncio.IncompleteReadError(bytes(self._buffer), None)
+                return False
+            self._buffer.extend(data)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self.batch_size is None:
+            if not self._ready:
+                if not await self._read():
+                    raise StopAsyncIteration
+                # decoding all complete messages already read, not to look for them in the buffer again
+                self._ready = self._decode(len(self._buffer))
+                self._ready.reverse()
+            return self._ready.pop()
+
+        if not await self._read():
+            raise StopAsyncIteration
+        return self._decode(self.batch_size)
+
+
+def decode(reader, msg_class, batch_size=None, read_size=64 * 1024, max_size=None):
+    """
+    Decode the length prefixed messages of a stream, as an async iterator ::
+
+        async for msg in pyros_msgs.aio.decode(reader, msg_class):
+            ...
+
+    :param reader: the asyncio StreamReader
+    :param msg_class: the message class of all messages on the stream
+    :param batch_size: the maximum number of messages per list yielded, or None to yield messages one by one
+    :param read_size: the maximum number of bytes read from the stream at once
+    :param max_size: the maximum size of a message, larger ones raising ValueError. Defaults to max_message_size.
+    :return: the MessageStream async iterator
+    """
+    return MessageStream(reader, msg_class, batch_size, read_size, max_size)
+
+
+__all__ = [
+    'frame',
+    'decode',
+    'MessageStream',
+    'max_message_size',
+]
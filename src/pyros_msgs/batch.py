@@ -0,0 +1,127 @@
+from __future__ import absolute_import
+from __future__ import print_function
+
+"""
+pyros_msgs.batch serializes batches of messages of the same type into one buffer, and deserializes them back.
+
+Messages are serialized one after the other into one bytearray, with a table of offsets :
+message i is buf[offsets[i]:offsets[i + 1]]. genpy writes each message straight into the bytearray,
+so there is no buffer allocated per message, and no copy to gather them.
+Passing the same bytearray again overwrites it, reusing its storage.
+
+Deserializing a batch reads each message at its offset. The offsets table is not needed :
+without it, the messages are found by walking the buffer, as pyros_msgs.wire does.
+Messages duck punched with opt_as_array fast_serialize are read in place, without slicing the buffer.
+"""
+
+import array
+import struct
+
+import genpy
+import six
+
+from pyros_msgs import wire
+
+
+def _to_bytes(buf):
+    if isinstance(buf, bytes):
+        return buf
+    return bytes(buf) if six.PY3 else str(bytearray(buf))
+
+
+class _Writer(object):
+    """The buffer genpy serializes into : it only calls write(), that appends to the bytearray"""
+    __slots__ = ('write',)
+
+    def __init__(self, buf):
+        self.write = buf.extend
+
+
+class _Overwriter(object):
+    """
+    The buffer genpy serializes into, over the previous content of the bytearray : write() writes at a running position.
+    Overwriting the previous content, instead of clearing it, keeps the storage of the bytearray.
+    """
+    __slots__ = ('buf', 'pos')
+
+    def __init__(self, buf):
+        self.buf = buf
+        self.pos = 0
+
+    def write(self, data):
+        end = self.pos + len(data)
+        self.buf[self.pos:end] = data
+        self.pos = end
+
+
+def serialize_many(msgs, buf=None):
+    """
+    Serialize messages of the same type into one buffer.
+    :param msgs: the messages, a sequence
+    :param buf: a bytearray to serialize into, reusing its storage. Its previous content is overwritten.
+    python shrinks the storage of a bytearray truncated to less than half its size : reusing it for batches
+    of similar sizes keeps it.
+    :return: a tuple (buf, offsets) with buf the bytearray holding the serialized messages,
+    and offsets an array.array of len(msgs) + 1 positions : message i is buf[offsets[i]:offsets[i + 1]]
+    """
+    if buf is None:
+        buf = bytearray()
+    offsets = array.array('L', [0]) * (len(msgs) + 1)
+    if msgs:
+        msg_class = type(msgs[0])
+        previous_len = len(buf)
+        overwriter = _Overwriter(buf)
+        writer = _Writer(buf)
+        for i, msg in enumerate(msgs):
+            if type(msg) is not msg_class:
+                raise TypeError("cannot serialize a {0} in a batch of {1}".format(type(msg).__name__, msg_class._type))
+            if overwriter.pos < previous_len:
+                msg.serialize(overwriter)
+                offsets[i + 1] = overwriter.pos
+            else:  # past the previous content, appending
+                msg.serialize(writer)
+                offsets[i + 1] = len(buf)
+    del buf[offsets[-1]:]
+    return buf, offsets
+
+
+def deserialize_many(msg_class, buf, offsets=None):
+    """
+    Deserialize a batch of messages of the same type.
+    :param msg_class: the message class
+    :param buf: the buffer holding the serialized messages (bytes, bytearray, memoryview, mmap...)
+    :param offsets: the offsets from serialize_many(), or None to find the messages by walking the buffer
+    :return: the list of messages
+    """
+    data = _to_bytes(buf)  # genpy decodes strings from bytes
+    if offsets is None:
+        offsets = [0]
+        try:
+            while offsets[-1] < len(data):
+                offsets.append(wire.skip_message(msg_class, data, offsets[-1]))
+        except struct.error as e:
+            raise genpy.DeserializationError(e)  # most likely buffer underfill
+        if offsets[-1] > len(data):
+            raise genpy.DeserializationError("buffer underfill : the last message ends at {0}, after the end of the buffer at {1}".format(offsets[-1], len(data)))
+
+    # the generated deserialize reads at an offset, others need their own slice
+    read = getattr(msg_class.deserialize, '_read', None)
+    if read is None:
+        return [msg_class().deserialize(data[offsets[i]:offsets[i + 1]]) for i in range(len(offsets) - 1)]
+
+    msgs = []
+    try:
+        for i in range(len(offsets) - 1):
+            msg = msg_class()
+            if read(data, offsets[i], msg) != offsets[i + 1]:
+                raise genpy.DeserializationError("message {0} does not end at offset {1}".format(i, offsets[i + 1]))
+            msgs.append(msg)
+    except struct.error as e:
+        raise genpy.DeserializationError(e)  # most likely buffer underfill
+    return msgs
+
+
+__all__ = [
+    'serialize_many',
+    'deserialize_many',
+]
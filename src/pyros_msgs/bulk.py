@@ -0,0 +1,169 @@
+from __future__ import absolute_import
+from __future__ import print_function
+
+"""
+pyros_msgs.bulk validates whole sequences of numeric values at once, for primitive array slots.
+
+Sequences like array.array, bytes, bytearray, memoryview or numpy arrays hold their values
+without one python object per element. Their element type is checked once,
+and the range of their values is checked in bulk, only when their element type is wider than the slot type.
+
+They are stored as they are in the message (genpy serializes them with struct.pack(pattern, *values)),
+except for uint8[] slots, for which genpy needs bytes.
+"""
+
+import array
+import math
+
+import six
+
+from pyros_msgs import ros_python_range_mapping
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def _format_range(kind, itemsize):
+    """
+    Find the range of values that can be held by a sequence element, from its kind and size
+    :param kind: 'i' for signed integers, 'u' for unsigned integers, 'f' for floats
+    :param itemsize: the size of the element in bytes
+    :return: a tuple (min, max)
+    """
+    if kind == 'i':
+        return -2 ** (8 * itemsize - 1), 2 ** (8 * itemsize - 1) - 1
+    elif kind == 'u':
+        return 0, 2 ** (8 * itemsize) - 1
+    elif itemsize <= 4:
+        return ros_python_range_mapping['float32']
+    else:
+        return ros_python_range_mapping['float64']
+
+
+# struct / array / memoryview format characters of numeric elements
+_format_kinds = {
+    'b': 'i', 'h': 'i', 'i': 'i', 'l': 'i', 'q': 'i',
+    'B': 'u', 'H': 'u', 'I': 'u', 'L': 'u', 'Q': 'u',
+    'f': 'f', 'd': 'f',
+}
+
+
+def _element_kind(slot_value):
+    """
+    Find the kind and size of the elements of a sequence, without looking at the elements themselves.
+    :param slot_value: a sequence holding its values in bulk
+    :return: a tuple (kind, itemsize), or (None, None) if the elements are not numbers
+    """
+    if isinstance(slot_value, array.array):
+        return _format_kinds.get(slot_value.typecode), slot_value.itemsize
+    elif isinstance(slot_value, memoryview):
+        if slot_value.ndim != 1:
+            return None, None
+        # only the last character is the element type. others are byte order and alignment.
+        return _format_kinds.get(slot_value.format[-1:]), slot_value.itemsize
+    elif numpy is not None and isinstance(slot_value, numpy.ndarray):
+        if slot_value.ndim != 1 or slot_value.dtype.kind not in 'iuf':
+            return None, None
+        return slot_value.dtype.kind, slot_value.dtype.itemsize
+    else:
+        return None, None
+
+
+def _out_of_range(values, slot_min, slot_max, is_float):
+    """
+    Whether a sequence holds numbers out of the range of a slot type.
+    NaN and infinity are out of range for floats but can still be packed : they are accepted.
+    Numpy arrays are checked without any python loop, other sequences of floats are checked value by value,
+    since the minimum and maximum of a sequence holding NaN depend on the order of its values.
+    """
+    if numpy is not None and isinstance(values, numpy.ndarray):
+        if is_float:
+            values = values[numpy.isfinite(values)]
+        return bool(len(values)) and bool(values.min() < slot_min or values.max() > slot_max)
+    elif not is_float:
+        return min(values) < slot_min or max(values) > slot_max
+    else:
+        return any(not (slot_min <= v <= slot_max or math.isinf(v) or math.isnan(v)) for v in values)
+
+
+def _to_bytes(slot_value):
+    """Copy the buffer of a sequence into bytes, without any python object per element"""
+    if isinstance(slot_value, (bytes, bytearray)):
+        return slot_value
+    elif six.PY2 and isinstance(slot_value, array.array):
+        return slot_value.tostring()
+    else:
+        return slot_value.tobytes()
+
+
+def bulk_types(slot_type):
+    """
+    The sequence types that can be validated in bulk for an array of slot_type.
+    :param slot_type: the ros type of the array elements, ie. 'float32' for a 'float32[]' slot
+    :return: a tuple of types, empty if the elements cannot be validated in bulk
+    """
+    if slot_type not in ros_python_range_mapping:
+        return ()
+    types = (array.array, memoryview)
+    if slot_type == 'uint8':
+        types += (bytes, bytearray)
+    if numpy is not None:
+        types += (numpy.ndarray,)
+    return types
+
+
+def make_bulk_validator(slot_type):
+    """
+    Build the function validating sequences of values in bulk, for an array of slot_type.
+    :param slot_type: the ros type of the array elements, ie. 'float32' for a 'float32[]' slot
+    :return: a function taking a sequence, returning the value to store in the slot, or raising TypeError
+    """
+    slot_min, slot_max = ros_python_range_mapping[slot_type]
+    slot_kinds = 'f' if slot_type.startswith('float') else 'iu'
+
+    def validate_bulk(slot_value):
+        if isinstance(slot_value, (bytes, bytearray)):  # only accepted for uint8, and always in range
+            return slot_value
+
+        kind, itemsize = _element_kind(slot_value)
+        if kind is None or kind not in slot_kinds:
+            raise TypeError("value '{slot_value}' is not a sequence of {slot_type}".format(slot_value=slot_value, slot_type=slot_type))
+
+        format_min, format_max = _format_range(kind, itemsize)
+        if len(slot_value) and (format_min < slot_min or format_max > slot_max):
+            # the elements can hold values out of the slot range : checking the actual values
+            if _out_of_range(slot_value, slot_min, slot_max, kind == 'f'):
+                raise TypeError("value '{slot_value}' is out of range for type {slot_type}".format(slot_value=slot_value, slot_type=slot_type))
+
+        if slot_type == 'uint8':
+            return _to_bytes(slot_value)
+        return slot_value
+
+    return validate_bulk
+
+
+def make_range_validator(slot_type):
+    """
+    Build the function checking the range of a list of numbers in bulk, for an array of slot_type.
+    The type of the numbers should already have been validated.
+    :param slot_type: the ros type of the array elements, ie. 'int8' for a 'int8[]' slot
+    :return: a function taking a list of numbers, returning it, or raising TypeError
+    """
+    slot_min, slot_max = ros_python_range_mapping[slot_type]
+    is_float = slot_type.startswith('float')
+
+    def validate_range(slot_value):
+        if slot_value and _out_of_range(slot_value, slot_min, slot_max, is_float):
+            raise TypeError("value '{slot_value}' is out of range for type {slot_type}".format(slot_value=slot_value, slot_type=slot_type))
+        return slot_value
+
+    return validate_range
+
+
+__all__ = [
+    'bulk_types',
+    'make_bulk_validator',
+    'make_range_validator',
+]
@@ -0,0 +1,100 @@
+from __future__ import absolute_import
+from __future__ import print_function
+
+"""
+pyros_msgs.codecache keeps the code generated when duck punching message classes in an on-disk cache.
+
+Duck punching analyses a message class, and compiles code specialized for its slots.
+With the cache enabled, the slot plan and the compiled code are stored on disk,
+keyed by the message type, its md5sum, the duck punching options, the pyros_msgs version and the python version.
+Processes starting with a warm cache skip the slot analysis, the source generation and the compilation, and just load them.
+The validators and default values baked in the code are python functions : they are still built in every process.
+benchmarks/codecache_time.py measures the time to generate the constructors without the cache, with a cold and a warm cache.
+
+The cache is disabled by default. Enable it with enable(cache_dir), or with the PYROS_MSGS_CODE_CACHE environment variable.
+"""
+
+import hashlib
+import marshal
+import os
+import sys
+
+import pyros_msgs
+
+cache_dir = os.environ.get('PYROS_MSGS_CODE_CACHE') or None
+
+
+def enable(path=None):
+    """
+    Enable the cache of generated code.
+    :param path: the directory where the code is cached. Defaults to ~/.cache/pyros_msgs/code
+    """
+    global cache_dir
+    cache_dir = path or os.path.join(os.path.expanduser('~'), '.cache', 'pyros_msgs', 'code')
+
+
+def disable():
+    """Disable the cache of generated code. The code already cached stays on disk."""
+    global cache_dir
+    cache_dir = None
+
+
+def cache_key(msg_mod, kind, options):
+    """
+    The key of the code generated for a message class.
+    :param msg_mod: the ros message class
+    :param kind: what the code is for, ie. 'opt_as_array.__init__'
+    :param options: the duck punching options the code depends on, with a stable repr
+    :return: the key, as an hex string
+    """
+    key = hashlib.sha1()
+    for part in (msg_mod._type, msg_mod._md5sum, kind, repr(options), pyros_msgs.__version__, sys.version):
+        key.update(str(part).encode('utf-8'))
+    return key.hexdigest()
+
+
+def _write_atomic(path, data):
+    """Write a file so that concurrent processes never read it partially written"""
+    tmp_path = '{0}.{1}.tmp'.format(path, os.getpid())
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.rename(tmp_path, path)
+
+
+def load(msg_mod, kind, options, generate):
+    """
+    Get the slot plan and the code generated for a message class, from the cache if possible.
+    :param msg_mod: the ros message class
+    :param kind: what the code is for, ie. 'opt_as_array.__init__'
+    :param options: the duck punching options the code depends on, with a stable repr
+    :param generate: a function returning (plan, code) when it is not cached.
+    plan must be made of python builtin types only, and code is a code object.
+    :return: a tuple (plan, code)
+    """
+    if cache_dir is None:
+        return generate()
+
+    path = os.path.join(cache_dir, cache_key(msg_mod, kind, options) + '.marshal')
+    try:
+        with open(path, 'rb') as f:
+            plan, code = marshal.loads(f.read())
+        return plan, code
+    except (IOError, OSError, EOFError, ValueError, TypeError):
+        pass  # not cached yet, or not readable : generating it again
+
+    plan, code = generate()
+    try:
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+        _write_atomic(path, marshal.dumps((plan, code)))
+    except (IOError, OSError):
+        pass  # the cache is only an optimization, we keep going without it
+    return plan, code
+
+
+__all__ = [
+    'enable',
+    'disable',
+    'cache_key',
+    'load',
+]
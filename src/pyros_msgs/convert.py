@@ -0,0 +1,409 @@
+from __future__ import absolute_import
+from __future__ import print_function
+
+"""
+pyros_msgs.convert converts python dicts (as received from pyros bridges) into ros messages, and back.
+
+The message constructor does the validation : messages duck punched by opt_as_array
+get their optional fields as arrays, and opt_as_nested messages get their initialized_ field set.
+Nested message fields can be given as dicts, and are converted recursively.
+
+Messages are converted to dicts of plain python values (JSON serializable), optional fields that are not set
+being absent (or None if asked) : empty opt_as_array fields, opt_as_nested fields not initialized,
+and opt_as_bitmask fields without their presence bit. An opt_as_array field set to one value is converted to that value.
+
+The conversion of a message class is prepared once, and cached. To dicts, it is compiled for the message class.
+"""
+
+import json
+
+import genpy
+import six
+
+from pyros_msgs import ros_python_type_mapping
+from pyros_msgs import typecache
+
+
+def _is_optional(msg_class):
+    """Whether a message class is an optional message type from opt_as_nested"""
+    return 'initialized_' in msg_class.__slots__
+
+
+def _make_value_converter(slot_type):
+    """
+    Build the function converting a dict value for a slot, once for all values.
+    :param slot_type: the ros type of the slot
+    :return: a function converting a value, or None if values can be passed to the constructor as they are
+    """
+    if '[' in slot_type:
+        # array type (variable or fixed size)
+        convert_element = _make_value_converter(slot_type[:slot_type.index('[')])
+        if convert_element is None:
+            return None
+
+        def convert_array(value):
+            if isinstance(value, (list, tuple)):
+                return [convert_element(v) for v in value]
+            return convert_element(value)  # optional field as an array
+
+        return convert_array
+
+    elif slot_type in ros_python_type_mapping:
+        return None
+
+    elif slot_type in ('time', 'duration'):
+        time_class = genpy.Time if slot_type == 'time' else genpy.Duration
+
+        def convert_time(value):
+            return time_class(**value) if isinstance(value, dict) else value
+
+        return convert_time
+
+    else:
+        msg_class = typecache.get_message_class(slot_type)
+        if msg_class is None:
+            raise TypeError("message class for '{slot_type}' not found".format(slot_type=slot_type))
+
+        if _is_optional(msg_class):
+            data_type = dict(zip(msg_class.__slots__, msg_class._slot_types))['data']
+            convert_data = _make_value_converter(data_type)
+            data_class = typecache.get_message_class(data_type) if '/' in data_type and '[' not in data_type else None
+            # to_dict() converts an optional field to its data : a dict is the data if the data is a message,
+            # unless it only holds the data field of the optional message type
+            data_slots = set(data_class.__slots__) if data_class is not None else None
+
+            def convert_optional(value):
+                if value is None:
+                    return msg_class()
+                elif isinstance(value, msg_class):
+                    return value
+                elif isinstance(value, dict) and (data_slots is None or (set(value) == {'data'} and 'data' not in data_slots)):
+                    return from_dict(msg_class, value)
+                else:  # the data of the optional field
+                    return msg_class(data=convert_data(value) if convert_data else value)
+
+            convert_optional.accepts_none = True  # None means not set, and converts to a message not initialized
+            return convert_optional
+
+        def convert_message(value):
+            return from_dict(msg_class, value) if isinstance(value, dict) else value
+
+        return convert_message
+
+
+# message class -> {slot : value converter}
+_converters = {}
+
+
+def _get_converters(msg_class):
+    """Get the value converters for the slots of a message class, preparing them the first time"""
+    try:
+        return _converters[msg_class]
+    except KeyError:
+        converters = {}
+        for s, st in zip(msg_class.__slots__, msg_class._slot_types):
+            converter = _make_value_converter(st)
+            if converter is not None:
+                converters[s] = converter
+        _converters[msg_class] = converters
+        return converters
+
+
+_from_dict_header = """
+def from_dict(values):
+    kwds = dict(values)
+"""
+
+_from_dict_convert = """
+    v = kwds.get('{s}')
+    if v is not None:
+        kwds['{s}'] = _convert_{i}(v)
+"""
+
+# opt_as_nested field : None converts to a message not initialized
+_from_dict_convert_optional = """
+    if '{s}' in kwds:
+        kwds['{s}'] = _convert_{i}(kwds['{s}'])
+"""
+
+# opt_as_bitmask optional field : None means not set, the constructor leaves its presence bit cleared
+_from_dict_drop_unset = """
+    if '{s}' in kwds and kwds['{s}'] is None:
+        del kwds['{s}']
+"""
+
+_from_dict_footer = """
+    return msg_class(**kwds)
+"""
+
+
+# message class -> compiled from_dict
+_from_dicts = {}
+
+
+def _get_from_dict(msg_class):
+    """Get the function converting a dict to a message of msg_class, compiling it the first time"""
+    try:
+        return _from_dicts[msg_class]
+    except KeyError:
+        namespace = {'msg_class': msg_class}
+        convert_code = []
+        for i, (s, converter) in enumerate(sorted(_get_converters(msg_class).items())):
+            namespace['_convert_{i}'.format(i=i)] = converter
+            template = _from_dict_convert_optional if getattr(converter, 'accepts_none', False) else _from_dict_convert
+            convert_code.append(template.format(i=i, s=s))
+        for s in msg_class.__dict__.get('_presence_bits', ()):
+            convert_code.append(_from_dict_drop_unset.format(s=s))
+        source = _from_dict_header + ''.join(convert_code) + _from_dict_footer
+        exec(compile(source, '<{0} from_dict>'.format(msg_class._type), 'exec'), namespace)
+        _from_dicts[msg_class] = namespace['from_dict']
+        return _from_dicts[msg_class]
+
+
+def from_dict(msg_class, values):
+    """
+    Convert a dict into a message, through the message constructor.
+    :param msg_class: the message class
+    :param values: a dict of slot name -> value. Values for nested messages can be dicts too.
+    A None value for an optional field means it is not set.
+    :return: the message
+    """
+    return _get_from_dict(msg_class)(values)
+
+
+def _plain_list(value):
+    """Convert an array value (list, tuple, array.array, numpy array...) to a list of plain python values"""
+    if isinstance(value, (bytes, bytearray)):
+        return list(bytearray(value))
+    tolist = getattr(value, 'tolist', None)
+    return tolist() if tolist is not None else list(value)
+
+
+def _value_expr(slot_type, expr, namespace, name):
+    """
+    Generate the python expression converting a value to a plain python value.
+    :param slot_type: the ros type of the value
+    :param expr: the python expression of the value. It should be a simple name, since it can be evaluated twice.
+    :param namespace: the namespace of the generated code, where functions used by the expression are added
+    :param name: a unique name for the functions added to the namespace
+    :return: the python expression
+    """
+    if '[' in slot_type:
+        base_type = slot_type[:slot_type.index('[')]
+        if base_type in ros_python_type_mapping:
+            return '_plain_list({e})'.format(e=expr)
+        return '[{elem} for {x} in {e}]'.format(elem=_value_expr(base_type, '_' + name, namespace, name + '_'), x='_' + name, e=expr)
+    elif slot_type in ros_python_type_mapping:
+        return expr
+    elif slot_type in ('time', 'duration'):
+        return "{{'secs': {e}.secs, 'nsecs': {e}.nsecs}}".format(e=expr)
+    else:
+        msg_class = typecache.get_message_class(slot_type)
+        if msg_class is None:
+            raise TypeError("message class for '{slot_type}' not found".format(slot_type=slot_type))
+        namespace['_to_dict_' + name] = _get_to_dict(msg_class, True)
+        return '_to_dict_{n}({e})'.format(n=name, e=expr)
+
+
+_to_dict_header = """
+def to_dict(msg):
+    d = {}
+"""
+
+_to_dict_slot = """
+    v = msg.{s}
+    d['{s}'] = {value}
+"""
+
+# opt_as_array optional field : an array with one value, or empty when not set
+_to_dict_opt_slot = """
+    v = msg.{s}
+    if len(v) == 1:
+        v = v[0]
+        d['{s}'] = {value}
+    elif len(v):
+        d['{s}'] = {values}
+"""
+
+# opt_as_array optional field of a primitive type : the array can hold its values in bulk (array.array, numpy, bytes)
+_to_dict_opt_plain_slot = """
+    v = msg.{s}
+    if type(v) is not list:
+        v = _plain_list(v)
+    if len(v) == 1:
+        d['{s}'] = v[0]
+    elif v:
+        d['{s}'] = v
+"""
+
+# opt_as_nested optional field
+_to_dict_opt_nested_slot = """
+    v = msg.{s}
+    if v.initialized_:
+        v = v.data
+        d['{s}'] = {value}
+"""
+
+# the data of an optional message type itself
+_to_dict_opt_data = """
+    if msg.initialized_:
+        v = msg.{s}
+        d['{s}'] = {value}
+"""
+
+# opt_as_bitmask optional field
+_to_dict_opt_presence_slot = """
+    if msg.presence_ & {bit}:
+        v = msg.{s}
+        d['{s}'] = {value}
+"""
+
+_to_dict_unset = """
+    else:
+        d['{s}'] = None
+"""
+
+_to_dict_footer = """
+    return d
+"""
+
+# (message class, unset_as_none) -> compiled to_dict
+_to_dicts = {}
+
+
+def _get_to_dict(msg_class, unset_as_none):
+    """Get the function converting a message of msg_class to a dict, compiling it the first time"""
+    try:
+        return _to_dicts[msg_class, unset_as_none]
+    except KeyError:
+        pass
+
+    namespace = {'_plain_list': _plain_list}
+    opt_slots = getattr(msg_class, '_opt_slots', ())
+    presence_bits = getattr(msg_class, '_presence_bits', {})
+    code = []
+    for i, (s, st) in enumerate(zip(msg_class.__slots__, msg_class._slot_types)):
+        name = str(i)
+        field_class = None
+        if '[' not in st and st not in ros_python_type_mapping and st not in ('time', 'duration'):
+            field_class = typecache.get_message_class(st)
+
+        if s in ('initialized_', 'presence_'):
+            continue  # internal fields
+        elif s == 'data' and _is_optional(msg_class):
+            # the data of an optional message type itself
+            code.append(_to_dict_opt_data.format(s=s, value=_value_expr(st, 'v', namespace, name)))
+        elif s in presence_bits:
+            code.append(_to_dict_opt_presence_slot.format(s=s, bit=presence_bits[s], value=_value_expr(st, 'v', namespace, name)))
+        elif s in opt_slots and st[:-2] in ros_python_type_mapping:
+            code.append(_to_dict_opt_plain_slot.format(s=s))
+        elif s in opt_slots and st.endswith('[]'):
+            code.append(_to_dict_opt_slot.format(
+                s=s, value=_value_expr(st[:-2], 'v', namespace, name), values=_value_expr(st, 'v', namespace, name)))
+        elif field_class is not None and _is_optional(field_class):
+            data_type = dict(zip(field_class.__slots__, field_class._slot_types))['data']
+            code.append(_to_dict_opt_nested_slot.format(s=s, value=_value_expr(data_type, 'v', namespace, name)))
+        else:
+            code.append(_to_dict_slot.format(s=s, value=_value_expr(st, 'v', namespace, name)))
+            continue
+        if unset_as_none:
+            code.append(_to_dict_unset.format(s=s))
+
+    source = _to_dict_header + ''.join(code) + _to_dict_footer
+    exec(compile(source, '<{0} to_dict>'.format(msg_class._type), 'exec'), namespace)
+    _to_dicts[msg_class, unset_as_none] = namespace['to_dict']
+    return _to_dicts[msg_class, unset_as_none]
+
+
+def to_dict(msg, unset_as_none=False):
+    """
+    Convert a message into a dict of plain python values.
+    :param msg: the message
+    :param unset_as_none: if True, optional fields that are not set are None in the dict, instead of absent.
+    Nested messages are always converted with absent optional fields.
+    :return: the dict
+    """
+    to_dict = _to_dicts.get((type(msg), unset_as_none)) or _get_to_dict(type(msg), unset_as_none)
+    return to_dict(msg)
+
+
+def to_json(msg, unset_as_none=False):
+    """
+    Convert a message into a JSON string.
+    :param msg: the message
+    :param unset_as_none: if True, optional fields that are not set are null, instead of absent.
+    :return: the JSON string
+    """
+    return json.dumps(to_dict(msg, unset_as_none))
+
+
+def from_json(msg_type, text):
+    """
+    Convert a JSON string into a message, through the message constructor.
+    :param msg_type: the message class, or the ros message type, ie. 'std_msgs/Header'
+    :param text: the JSON string of an object
+    :return: the message
+    """
+    return from_dict(resolve(msg_type), json.loads(text))
+
+
+def resolve(msg_type):
+    """
+    Resolve a message type into its class
+    :param msg_type: the message class, or the ros message type, ie. 'std_msgs/Header'
+    :return: the message class
+    """
+    if isinstance(msg_type, six.string_types):
+        msg_class = typecache.get_message_class(msg_type)
+        if msg_class is None:
+            raise TypeError("message class for '{msg_type}' not found".format(msg_type=msg_type))
+        return msg_class
+    return msg_type
+
+
+RAISE = 'raise'
+SKIP = 'skip'
+COLLECT = 'collect'
+
+
+def from_dicts(msg_type, dicts, on_error=RAISE, errors=None):
+    """
+    Convert an iterable of dicts into messages, lazily : only one dict is converted at a time.
+    :param msg_type: the message class, or the ros message type, ie. 'std_msgs/Header'
+    :param dicts: an iterable of dicts, ie. a generator reading them from a bridge
+    :param on_error: what to do when a dict cannot be converted :
+    RAISE the error (default), SKIP the dict, or COLLECT the error in errors and skip the dict
+    :param errors: the list where (index, dict, error) tuples are appended, when on_error is COLLECT
+    :return: a generator of messages
+    """
+    if on_error not in (RAISE, SKIP, COLLECT):
+        raise ValueError("on_error should be one of {0}, not {1!r}".format((RAISE, SKIP, COLLECT), on_error))
+    if on_error == COLLECT and errors is None:
+        raise ValueError("errors should be a list, to collect errors")
+    msg_class = resolve(msg_type)
+    _get_converters(msg_class)  # failing early if the message class cannot be converted
+
+    def convert():
+        for i, values in enumerate(dicts):
+            try:
+                msg = from_dict(msg_class, values)
+            except (AttributeError, TypeError, ValueError) as e:
+                if on_error == RAISE:
+                    raise
+                elif on_error == COLLECT:
+                    errors.append((i, values, e))
+                continue
+            yield msg
+
+    return convert()
+
+
+__all__ = [
+    'from_dict',
+    'from_dicts',
+    'to_dict',
+    'to_json',
+    'from_json',
+    'resolve',
+    'RAISE', 'SKIP', 'COLLECT',
+]
@@ -0,0 +1,352 @@
+from __future__ import absolute_import
+from __future__ import print_function
+
+"""
+pyros_msgs.msg_loader generates our message classes in-process, from the .msg files in msg/opt_as_array, msg/opt_as_nested and msg/opt_as_bitmask.
+
+This does not need catkin, a sourced workspace, or pyros_setup : only genmsg and genpy.
+The python code generated for a .msg file is cached on disk, keyed by a hash of the .msg file,
+so the message definitions are parsed only once, and the next processes just import the cached code.
+
+Dependencies on messages from other packages (ie. std_msgs/Header) are found in the search path if given,
+or else from the already generated python message classes, that are importable.
+"""
+
+import hashlib
+import importlib
+import os
+import sys
+import threading
+import types
+
+package_name = 'pyros_msgs'
+
+# the msg directories of our source tree : src/pyros_msgs/../../msg
+_source_msg_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'msg')
+
+
+def default_msg_dirs():
+    """
+    The directories where our .msg files are.
+    They can be set with the PYROS_MSGS_MSG_PATH environment variable (separated by os.pathsep),
+    and default to the msg directories of our source tree.
+    """
+    env_path = os.environ.get('PYROS_MSGS_MSG_PATH')
+    if env_path:
+        return [d for d in env_path.split(os.pathsep) if d]
+    return [os.path.join(_source_msg_dir, d) for d in ('opt_as_array', 'opt_as_nested', 'opt_as_bitmask')]
+
+
+def default_cache_dir():
+    """
+    The directory where the generated python code is cached.
+    It can be set with the PYROS_MSGS_CACHE environment variable, and defaults to ~/.cache/pyros_msgs
+    """
+    return os.environ.get('PYROS_MSGS_CACHE') or os.path.join(os.path.expanduser('~'), '.cache', package_name)
+
+
+def find_msg_files(msg_dirs=None):
+    """
+    Find our .msg files.
+    :param msg_dirs: the directories to look into. Defaults to default_msg_dirs()
+    :return: a dict {message name : .msg file path}
+    """
+    msg_files = {}
+    for d in msg_dirs if msg_dirs is not None else default_msg_dirs():
+        if not os.path.isdir(d):
+            continue
+        for f in sorted(os.listdir(d)):
+            if f.endswith('.msg'):
+                msg_files.setdefault(f[:-len('.msg')], os.path.join(d, f))
+    return msg_files
+
+
+def _dependencies(msg_text, package):
+    """The full names of the message types a message definition depends on"""
+    import genmsg.msgs
+
+    dependencies = set()
+    for line in msg_text.splitlines():
+        line = line.split('#')[0].strip()
+        if not line or '=' in line:  # constants are of builtin types
+            continue
+        base_type = genmsg.msgs.bare_msg_type(line.split()[0])
+        if not genmsg.msgs.is_builtin(base_type):
+            dependencies.add(genmsg.msgs.resolve_type(base_type, package))
+    return dependencies
+
+
+def _dependency_keys(msg_text, search_path, package=package_name):
+    """
+    The keys of the message types a message definition depends on, recursively :
+    their definition if found in the search path, or else the md5sum of their generated python class.
+    """
+    from pyros_msgs import typecache
+
+    keys = []
+    for full_name in sorted(_dependencies(msg_text, package)):
+        dep_package, name = full_name.split('/')
+        dep_path = next((os.path.join(d, name + '.msg') for d in search_path.get(dep_package, ())
+                         if os.path.isfile(os.path.join(d, name + '.msg'))), None)
+        if dep_path is not None:
+            with open(dep_path) as f:
+                dep_text = f.read()
+            keys.append('{0}:{1}'.format(full_name, dep_text))
+            keys.extend(_dependency_keys(dep_text, search_path, dep_package))
+        else:
+            msg_class = typecache.get_message_class(full_name)
+            keys.append('{0}:{1}'.format(full_name, msg_class._md5sum if msg_class is not None else ''))
+    return keys
+
+
+def _cache_key(msg_text, search_path=None):
+    """
+    The hash of a message definition, with the genpy version, since the generated code depends on it,
+    and with the definitions of its dependencies, since the generated md5sum and full text depend on them.
+    """
+    import genpy
+    key = hashlib.sha1(msg_text.encode('utf-8'))
+    key.update(str(getattr(genpy, '__version__', '')).encode('utf-8'))
+    for dep_key in _dependency_keys(msg_text, search_path or {}):
+        key.update(dep_key.encode('utf-8'))
+    return key.hexdigest()
+
+
+def _register_imported(msg_context, full_name):
+    """
+    Register the spec of a message from another package in the msg_context, from its generated python class.
+    This is how we find dependencies like std_msgs/Header without a ROS workspace.
+    """
+    import genmsg.msg_loader
+    from pyros_msgs import typecache
+
+    if msg_context.is_registered(full_name):
+        return
+    msg_class = typecache.get_message_class(full_name)
+    if msg_class is None:
+        raise ImportError("message class for '{0}' not found, needed to generate our messages".format(full_name))
+    # only the first part of _full_text is the message definition, the others are its dependencies
+    text = msg_class._full_text.split('\n' + '=' * 80 + '\n')[0]
+    spec = genmsg.msg_loader.load_msg_from_string(msg_context, text, full_name)
+    for t in spec.types:
+        base_type = genmsg.msgs.bare_msg_type(t)
+        if not genmsg.msgs.is_builtin(base_type):
+            _register_imported(msg_context, genmsg.msgs.resolve_type(base_type, spec.package))
+
+
+def _generate(msg_context, spec, search_path):
+    """Generate the python code for a message spec, registering its dependencies not found in the search path"""
+    import genmsg
+    import genpy.generator
+
+    for t in spec.types:
+        base_type = genmsg.msgs.bare_msg_type(t)
+        if not genmsg.msgs.is_builtin(base_type):
+            dep_name = genmsg.msgs.resolve_type(base_type, spec.package)
+            if genmsg.package_resource_name(dep_name)[0] not in search_path:
+                _register_imported(msg_context, dep_name)
+
+    return '\n'.join(genpy.generator.msg_generator(msg_context, spec, search_path)) + '\n'
+
+
+def generate_source(msg_path, search_path=None):
+    """
+    Generate the python code for a .msg file, with genpy.
+    :param msg_path: the path of our .msg file
+    :param search_path: a dict {package : [msg directories]} to find message dependencies.
+    Dependencies not found there are taken from their generated python classes.
+    :return: the python source, as a string
+    """
+    import genmsg
+    import genmsg.gentools
+    import genmsg.msg_loader
+
+    search_path = dict(search_path or {})
+    search_path.setdefault(package_name, [os.path.dirname(msg_path)])
+
+    msg_context = genmsg.MsgContext.create_default()
+    full_name = genmsg.gentools.compute_full_type_name(package_name, os.path.basename(msg_path))
+    spec = genmsg.msg_loader.load_msg_from_file(msg_context, msg_path, full_name)
+    return _generate(msg_context, spec, search_path)
+
+
+def generate_source_from_string(msg_text, name, search_path=None):
+    """
+    Generate the python code for a message definition, with genpy, without any .msg file.
+    :param msg_text: the message definition, as in a .msg file
+    :param name: the name of the message in our package, ie. 'opt_std_msgs_Header'
+    :param search_path: a dict {package : [msg directories]} to find message dependencies.
+    Dependencies not found there are taken from their generated python classes.
+    :return: the python source, as a string
+    """
+    import genmsg
+    import genmsg.msg_loader
+
+    msg_context = genmsg.MsgContext.create_default()
+    spec = genmsg.msg_loader.load_msg_from_string(msg_context, msg_text, '{0}/{1}'.format(package_name, name))
+    return _generate(msg_context, spec, dict(search_path or {}))
+
+
+def _load_source(name, path):
+    """Import a python module from its source file, letting python cache its bytecode"""
+    try:
+        import importlib.util
+    except ImportError:  # python 2
+        import imp
+        return imp.load_source(name, path)
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def _write_atomic(path, source):
+    """Write a file so that concurrent processes never read it partially written"""
+    tmp_path = '{0}.{1}.tmp'.format(path, os.getpid())
+    with open(tmp_path, 'w') as f:
+        f.write(source)
+    os.rename(tmp_path, path)
+
+
+def _load_cached(name, key, generate, cache_dir, module_name):
+    """Import the generated code of a message, cached under its key, generating it first if it is not cached yet"""
+    cache_dir = cache_dir or default_cache_dir()
+    cached_path = os.path.join(cache_dir, '_{0}_{1}.py'.format(name, key))
+    if not os.path.exists(cached_path):
+        source = generate()
+        if not os.path.isdir(cache_dir):
+            try:
+                os.makedirs(cache_dir)
+            except OSError:  # created by another process meanwhile
+                if not os.path.isdir(cache_dir):
+                    raise
+        _write_atomic(cached_path, source)
+
+    module = _load_source(module_name or '{0}.msg._{1}'.format(package_name, name), cached_path)
+    return getattr(module, name)
+
+
+def load_message(msg_path, cache_dir=None, search_path=None, module_name=None):
+    """
+    Load the message class of one of our .msg files, generating its python code if it is not cached yet.
+    :param msg_path: the path of the .msg file
+    :param cache_dir: the directory where the generated code is cached. Defaults to default_cache_dir()
+    :param search_path: a dict {package : [msg directories]} to find message dependencies
+    :param module_name: the name of the python module of the message class. Defaults to pyros_msgs.msg._<name>
+    :return: the message class
+    """
+    name = os.path.basename(msg_path)[:-len('.msg')]
+    with open(msg_path, 'rb') as f:
+        msg_text = f.read().decode('utf-8')
+    key_search_path = dict(search_path or {})
+    key_search_path.setdefault(package_name, [os.path.dirname(msg_path)])  # as generate_source() does
+    key = _cache_key(msg_text, key_search_path)
+    return _load_cached(name, key, lambda: generate_source(msg_path, search_path), cache_dir, module_name)
+
+
+def load_message_from_string(msg_text, name, cache_dir=None, search_path=None, module_name=None):
+    """
+    Load the message class of a message definition, generating its python code if it is not cached yet.
+    The code is cached as for .msg files, keyed by a hash of the definition.
+    :param msg_text: the message definition, as in a .msg file
+    :param name: the name of the message in our package, ie. 'opt_std_msgs_Header'
+    :param cache_dir: the directory where the generated code is cached. Defaults to default_cache_dir()
+    :param search_path: a dict {package : [msg directories]} to find message dependencies
+    :param module_name: the name of the python module of the message class. Defaults to pyros_msgs.msg._<name>
+    :return: the message class
+    """
+    key = _cache_key(msg_text, search_path)
+    return _load_cached(name, key, lambda: generate_source_from_string(msg_text, name, search_path), cache_dir, module_name)
+
+
+class Loader(object):
+    """
+    Loads our message classes on demand, the first time each one is needed.
+    """
+    def __init__(self, msg_dirs=None, cache_dir=None, search_path=None, module_name=package_name + '.msg'):
+        """
+        :param msg_dirs: the directories where our .msg files are. Defaults to default_msg_dirs()
+        :param cache_dir: the directory where the generated code is cached. Defaults to default_cache_dir()
+        :param search_path: a dict {package : [msg directories]} to find message dependencies
+        :param module_name: the name of the module holding the message classes
+        """
+        self.module_name = module_name
+        self.msg_files = find_msg_files(msg_dirs)
+        self.cache_dir = cache_dir
+        self.search_path = search_path
+        self.msg_classes = {}
+        self._lock = threading.RLock()
+
+    def load(self, name):
+        """
+        Get a message class, loading it if needed.
+        :param name: the name of the message, ie. 'opt_int32'
+        :return: the message class
+        """
+        try:
+            return self.msg_classes[name]
+        except KeyError:
+            pass
+        if name not in self.msg_files:
+            raise AttributeError("no .msg file found for {0!r} in {1}".format(name, package_name))
+        with self._lock:
+            if name not in self.msg_classes:
+                self.msg_classes[name] = load_message(
+                    self.msg_files[name], self.cache_dir, self.search_path, '{0}._{1}'.format(self.module_name, name)
+                )
+        return self.msg_classes[name]
+
+    def module(self):
+        """
+        Build a module holding our message classes, like the genpy generated pyros_msgs.msg package.
+        Message classes are loaded when accessed (python >= 3.7), or all at once (python < 3.7).
+        """
+        msg_module = types.ModuleType(self.module_name)
+        msg_module.__all__ = sorted(self.msg_files)
+        msg_module.__loader__ = self
+
+        def __getattr__(name):
+            return self.load(name)
+
+        msg_module.__getattr__ = __getattr__
+        if sys.version_info < (3, 7):
+            for name in self.msg_files:
+                setattr(msg_module, name, self.load(name))
+        return msg_module
+
+
+_install_lock = threading.Lock()
+
+
+def install(msg_dirs=None, cache_dir=None, search_path=None):
+    """
+    Make our message classes importable as pyros_msgs.msg, without a ROS workspace.
+    Nothing is done if pyros_msgs.msg is already imported.
+    :param msg_dirs: the directories where our .msg files are. Defaults to default_msg_dirs()
+    :param cache_dir: the directory where the generated code is cached. Defaults to default_cache_dir()
+    :param search_path: a dict {package : [msg directories]} to find message dependencies
+    :return: the pyros_msgs.msg module
+    """
+    module_name = '{0}.msg'.format(package_name)
+    with _install_lock:
+        if module_name not in sys.modules:
+            msg_module = Loader(msg_dirs, cache_dir, search_path).module()
+            if not msg_module.__all__:
+                raise ImportError("no .msg file found for {0} in {1}".format(package_name, msg_dirs or default_msg_dirs()))
+            sys.modules[module_name] = msg_module
+            setattr(importlib.import_module(package_name), 'msg', msg_module)
+    return sys.modules[module_name]
+
+
+__all__ = [
+    'default_msg_dirs',
+    'default_cache_dir',
+    'find_msg_files',
+    'generate_source',
+    'generate_source_from_string',
+    'load_message',
+    'load_message_from_string',
+    'Loader',
+    'install',
+]
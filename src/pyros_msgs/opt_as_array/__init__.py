@@ -11,4 +11,5 @@ When importing this module, the ros message field default value for array will b
 """
 
 
-from .opt_as_array import duck_punch
\ No newline at end of file
+from .opt_as_array import duck_punch, build_many, set_validation_level, LIST, COMPACT, OptionalValue, STRICT, FAST, OFF
+from .views import deserialize_views, materialize
@@ -2,122 +2,427 @@ from __future__ import absolute_import
 from __future__ import print_function
 
 import collections
+import itertools
+import math
+import os
 
 import genpy
 import six
 import std_msgs.msg
-from pyros_msgs import ros_python_type_mapping, ros_python_default_mapping
+from pyros_msgs import ros_python_type_mapping, ros_python_default_mapping, ros_python_range_mapping
+from pyros_msgs import typecache
+from pyros_msgs import bulk
+from pyros_msgs import codecache
+from pyros_msgs import profiling
+from pyros_msgs import registry
+from pyros_msgs.opt_as_array import serializers
 
 
-def duck_punch(msg_mod, opt_slot_list):
+def _make_validator(slot_type, strict=False, elements=True):
     """
-    Duck punch / monkey patch msg_mod, by declaring slots in opt_slot_list as optional slots
-    :param msg_mod:
-    :param opt_slot_list:
-    :return:
+    Build the validation function for a slot type, once, when duck punching.
+    The returned function validates the value, and returns it, modified if needed (unicode to str conversion)
+    :param slot_type: the ros type of the slot
+    :param strict: whether to also reject numbers out of the range of the slot type
+    :param elements: whether to validate each element of lists. If False, only the first element is validated.
+    :return: a function taking a slot value, returning the validated value, or raising TypeError
     """
-    def init_punch(self, *args, **kwds):
-        __doc__ = msg_mod.__init__.__doc__
-
-        if args:  # the args for super(msg_mod, self) are fixed to the slots in ros messages
-            # so we can change it to kwarg to be more accepting (and more robust for changes)
-            kwds.update(zip([s for s in self.__slots__], args))
-            args = ()
-
-        def validate_type(slot_value, slot_type):
-            """ Validate the type of the value, and modify the slot dict on the fly"""
-            # if (  # we get that from genpy.message.check_type()
-            #     genpy.base.is_simple(slot_type) or
-            #     slot_type == 'string' or
-            #     slot_type == 'time' or
-            #     slot_type == 'duration' or
-            #     isinstance(slot_value, genpy.message.get_message_class(slot_type))
-            # ):  # validate the type of the value
-            #     # special case for string type(to support unicode kwds)
-            #     if slot_type.startswith('string'):
-            #         return str(slot_value)
-            #     # elif slot_type.startswith('time'):
-            #     #     return str(value)
-            #     # elif slot_type.startswith('duration'):
-            #     #     return str(value)
-            #     # elif isinstance(sv, genpy.message.get_message_class(slot_type)):
-            #     #     return genpy.message.get_message_class(slot_type)()
-            #     else:
-            #         return slot_value
-            # elif not slot_value and slot_type == 'std_msgs/Empty':  # special empty case
-            #     return []  # or None ?
-            # else:
-            #     raise TypeError("value '{slot_value}' is not of type {slot_type}".format(**locals()))
+    if slot_type in ros_python_type_mapping:
+        # simple field type
+        python_type = ros_python_type_mapping.get(slot_type)
+
+        if strict and slot_type in ros_python_range_mapping:
+            slot_min, slot_max = ros_python_range_mapping.get(slot_type)
+            is_float = slot_type.startswith('float')
+
+            def validate_type(slot_value):
+                if isinstance(slot_value, six.string_types):
+                    slot_value = str(slot_value)  # forcing str type (converting from unicode if needed)
+                if not isinstance(slot_value, python_type):
+                    raise TypeError("value '{slot_value}' is not of type {slot_type}".format(slot_value=slot_value, slot_type=slot_type))
+                if slot_value < slot_min or slot_value > slot_max:
+                    # infinity is out of range for floats but can still be packed
+                    if not is_float or not math.isinf(slot_value):
+                        raise TypeError("value '{slot_value}' is out of range for type {slot_type}".format(slot_value=slot_value, slot_type=slot_type))
+                return slot_value
+
+        else:
+            def validate_type(slot_value):
+                if isinstance(slot_value, six.string_types):
+                    slot_value = str(slot_value)  # forcing str type (converting from unicode if needed)
+                if not isinstance(slot_value, python_type):
+                    raise TypeError("value '{slot_value}' is not of type {slot_type}".format(slot_value=slot_value, slot_type=slot_type))
+                return slot_value
+
+    elif slot_type.endswith('[]'):
+        # array type : we validate each element (a field can be optional or can also be a normal list)
+        # in strict mode, the range of the elements is checked in bulk, after their type
+        validate_element = _make_validator(slot_type[:-2])
+        validate_range = bulk.make_range_validator(slot_type[:-2]) if strict and slot_type[:-2] in ros_python_range_mapping else None
+        validate_single = _make_validator(slot_type[:-2], strict)  # for a value not in a list
+        # or we validate all elements at once, for sequences holding numbers in bulk
+        bulk_types = bulk.bulk_types(slot_type[:-2])
+        validate_bulk = bulk.make_bulk_validator(slot_type[:-2]) if bulk_types else None
 
+        def validate_type(slot_value):
+            if bulk_types and isinstance(slot_value, bulk_types):
+                return validate_bulk(slot_value)
             if isinstance(slot_value, six.string_types):
                 slot_value = str(slot_value)  # forcing str type (converting from unicode if needed)
+            if isinstance(slot_value, list):
+                if not elements:
+                    # spot check of the first element only, ie. for a value made a list by the constructor
+                    if slot_value:
+                        validate_single(slot_value[0])
+                    return slot_value
+                slot_value = [validate_element(s) for s in slot_value]
+                if validate_range is not None:
+                    validate_range(slot_value)
+                return slot_value
+            else:
+                return validate_single(slot_value)
 
-            # Detecting possible type problems
-            if slot_type in ros_python_type_mapping and not isinstance(slot_value, ros_python_type_mapping.get(slot_type)):
-                # simple field type
-                raise TypeError("value '{slot_value}' is not of type {slot_type}".format(**locals()))
-
-            elif slot_type.endswith('[]'):
-                if isinstance(slot_value, list):
-                    # we validate each element (a field can be optional or can also be a normal list)
-                    slot_value = [validate_type(s, slot_type[:-2]) for s in slot_value]
-                    # else slot_value is the empty list (valid optional field)
-                else:
-                    slot_value = validate_type(slot_value, slot_type[:-2])
-
-            elif slot_type not in ros_python_type_mapping:  # other cases should all be valid cases
-                # custom field type
-                try:
-                    msg_class = genpy.message.get_message_class(slot_type)
-                except:
-                    raise TypeError("message class for '{slot_type}' not found".format(**locals()))
-                if not isinstance(slot_value, msg_class):
-                    raise TypeError("value '{slot_value}' is not of type {slot_type[:-2]}".format(**locals()))
-
+    else:
+        # custom field type
+        def validate_type(slot_value):
+            if isinstance(slot_value, six.string_types):
+                slot_value = str(slot_value)  # forcing str type (converting from unicode if needed)
+            try:
+                msg_class = typecache.message_classes.get(slot_type) or typecache.get_message_class(slot_type)
+            except:
+                raise TypeError("message class for '{slot_type}' not found".format(slot_type=slot_type))
+            if not isinstance(slot_value, msg_class):
+                raise TypeError("value '{slot_value}' is not of type {slot_type[:-2]}".format(slot_value=slot_value, slot_type=slot_type))
             return slot_value
 
-        def get_default_val_from_type(slot_type):
+    return validate_type
 
-            if slot_type in ros_python_default_mapping:
-                # simple type (check genpy.base.is_simple())
-                return ros_python_default_mapping.get(slot_type)
-            elif slot_type.endswith('[]'):
-                # array type (recurse)
-                return get_default_val_from_type(slot_type[:-2])
-            else:
-                # attempt custom type (call __init__())
-                return genpy.message.get_message_class(slot_type)()
 
-        # Validating arg type (we should be more strict than ROS.)
-        for s, st in [(_slot, _slot_type) for _slot, _slot_type in zip(self.__slots__, self._slot_types)]:
+def _make_default(slot_type):
+    """
+    Find the default value for a slot type, once, when duck punching.
+    :param slot_type: the ros type of the slot
+    :return: a tuple (default_value, factory_type). If factory_type is not None,
+    the default value is built by the factory for that type, found in the typecache.
+    """
+    if slot_type in ros_python_default_mapping:
+        # simple type (check genpy.base.is_simple())
+        return ros_python_default_mapping.get(slot_type), None
+    elif slot_type.endswith('[]'):
+        # array type (recurse)
+        return _make_default(slot_type[:-2])
+    else:
+        # attempt custom type (call __init__())
+        return None, slot_type
+
+
+def _unknown_slot(self, kwds):
+    """Raise the same error as genpy.Message.__init__ for the first keyword that is not a slot of the message"""
+    for k in kwds:
+        if k not in self.__slots__:
+            raise AttributeError("%s is not an attribute of %s" % (k, self.__class__.__name__))
+
+
+# How optional values are stored in the message
+LIST = 'list'
+COMPACT = 'compact'
+
+
+class OptionalValue(tuple):
+    """
+    The compact storage of an optional value : an immutable sequence, with no per instance storage besides its values.
+    It reads like the list stored by default, compares equal to it, and genpy serializes it the same way.
+    """
+    __slots__ = ()
+
+    def __eq__(self, other):
+        if isinstance(other, list):
+            other = tuple(other)
+        return tuple.__eq__(self, other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = tuple.__hash__
+
+    def __repr__(self):
+        return repr(list(self))
+
+
+# the optional value when not set, shared by all messages
+empty = OptionalValue()
+
+
+def compact(slot_value):
+    """
+    Store an optional value compactly : a list becomes the shared empty value, or an OptionalValue.
+    Sequences holding numbers in bulk (array.array, numpy array, etc.) are already compact, and kept as they are.
+    """
+    if isinstance(slot_value, list):
+        return OptionalValue(slot_value) if slot_value else empty
+    return slot_value
+
+
+_init_header = """
+def __init__(self, *args, **kwds):
+    if args:  # the args for super(msg_mod, self) are fixed to the slots in ros messages
+        # so we can change it to kwarg to be more accepting (and more robust for changes)
+        kwds.update(zip(_slots, args))
+"""
+
+_opt_slot_validate = """
+    v{i} = kwds.get('{s}')
+    if v{i} is not None:
+        if not isinstance(v{i}, list):  # make it a list if needed
+            v{i} = [v{i}]
+        try:
+            _validate_{i}(v{i})
+        except TypeError:
+            raise AttributeError(_error_{i}.format(sv=v{i}))
+    else:
+        v{i} = []
+"""
+
+# sequences holding numbers in bulk are validated at once, and stored without copy
+_opt_slot_validate_bulk = """
+    v{i} = kwds.get('{s}')
+    if v{i} is not None and isinstance(v{i}, _bulk_types_{i}):
+        try:
+            v{i} = _validate_{i}(v{i})
+        except TypeError:
+            raise AttributeError(_error_{i}.format(sv=v{i}))
+    elif v{i} is not None:
+        if not isinstance(v{i}, list):  # make it a list if needed
+            v{i} = [v{i}]
+        try:
+            _validate_{i}(v{i})
+        except TypeError:
+            raise AttributeError(_error_{i}.format(sv=v{i}))
+    else:
+        v{i} = []
+"""
+
+# no validation : values are assigned directly, optional values are only made lists if needed
+_opt_slot_unchecked = """
+    v{i} = kwds.get('{s}')
+    if v{i} is None:
+        v{i} = []
+    elif not isinstance(v{i}, _list_types_{i}):  # make it a list if needed
+        v{i} = [v{i}]
+"""
+
+_slot_unchecked = """
+    v{i} = kwds.get('{s}')
+"""
+
+_slot_validate = """
+    if '{s}' in kwds:
+        v{i} = _validate_{i}(kwds['{s}'])
+    else:
+        v{i} = None
+"""
+
+_unknown_slot_check = """
+    if kwds and not _slot_set.issuperset(kwds):
+        _unknown_slot(self, kwds)
+"""
+
+_opt_slot_assign = """
+    self.{s} = v{i}
+"""
+
+_opt_slot_assign_compact = """
+    self.{s} = _compact(v{i})
+"""
+
+# We follow the usual ROS generated message behavior and assign default values
+_slot_assign_default = """
+    self.{s} = v{i} if v{i} is not None else _default_{i}
+"""
+
+_slot_assign_factory = """
+    self.{s} = v{i} if v{i} is not None else (_default_factories.get(_default_{i}) or _get_default_factory(_default_{i}))()
+"""
+
+
+def _plan_init(msg_mod, opt_slot_list):
+    """
+    Analyse the message class once, to find how each slot is validated and assigned by the constructor.
+    :param msg_mod: the ros message class
+    :param opt_slot_list: the list of slots to consider optional
+    :return: the slot plan, a tuple of (slot, slot_type, kind) with kind one of 'opt_bulk', 'opt', 'default', 'factory'
+    """
+    plan = []
+    for s, st in zip(msg_mod.__slots__, msg_mod._slot_types):
+        if s in opt_slot_list and st.endswith('[]'):
+            plan.append((s, st, 'opt_bulk' if bulk.bulk_types(st[:-2]) else 'opt'))
+        else:  # not an optional field
+            plan.append((s, st, 'default' if _make_default(st)[1] is None else 'factory'))
+    return tuple(plan)
+
+
+def _compile_init(msg_mod, plan, storage=LIST, validation=None):
+    """
+    Generate and compile the source of a constructor specialized for the slot plan.
+    :param msg_mod: the ros message class
+    :param plan: the slot plan, from _plan_init()
+    :param storage: how optional values are stored, LIST or COMPACT
+    :param validation: the validation level. With OFF, values are not validated.
+    :return: the code object defining __init__
+    """
+    opt_slot_assign = _opt_slot_assign_compact if storage == COMPACT else _opt_slot_assign
+    validate_code = []
+    assign_code = []
+    for i, (s, st, kind) in enumerate(plan):
+        if validation == OFF:
+            validate_code.append((_opt_slot_unchecked if kind in ('opt_bulk', 'opt') else _slot_unchecked).format(i=i, s=s))
+        elif kind == 'opt_bulk':
+            validate_code.append(_opt_slot_validate_bulk.format(i=i, s=s))
+        elif kind == 'opt':
+            validate_code.append(_opt_slot_validate.format(i=i, s=s))
+        else:
+            validate_code.append(_slot_validate.format(i=i, s=s))
+
+        if kind in ('opt_bulk', 'opt'):
+            assign_code.append(opt_slot_assign.format(i=i, s=s))
+        elif kind == 'default':
+            assign_code.append(_slot_assign_default.format(i=i, s=s))
+        else:
+            assign_code.append(_slot_assign_factory.format(i=i, s=s))
+
+    source = _init_header + ''.join(validate_code) + _unknown_slot_check + ''.join(assign_code)
+    return compile(source, '<{0} duck punched __init__>'.format(msg_mod._type), 'exec')
+
+
+def _generate_init(msg_mod, opt_slot_list, strict=False, storage=LIST, validation=None):
+    """
+    Analyse the message class once, and generate a constructor specialized for its slots.
+    The slot layout, validators and default values are baked in the generated code.
+    The slot plan and the compiled code come from the code cache, when it is enabled.
+    The validators and default values are built here in any case, they cannot be cached on disk.
+    :param msg_mod: the ros message class
+    :param opt_slot_list: the list of slots to consider optional
+    :param strict: whether to also reject numbers out of the range of their slot type
+    :param storage: how optional values are stored, LIST or COMPACT
+    :param validation: the validation level, STRICT, FAST, OFF, or None for full validation
+    :return: the generated __init__ function
+    """
+    def generate():
+        plan = _plan_init(msg_mod, opt_slot_list)
+        return plan, _compile_init(msg_mod, plan, storage, validation)
+
+    # the code does not depend on strict, only the validators do
+    plan, code = codecache.load(msg_mod, 'opt_as_array.__init__', (tuple(opt_slot_list), storage, validation == OFF), generate)
+
+    namespace = {
+        '_slots': tuple(msg_mod.__slots__),
+        '_slot_set': frozenset(msg_mod.__slots__),
+        '_unknown_slot': _unknown_slot,
+        '_default_factories': typecache.default_factories,
+        '_get_default_factory': typecache.get_default_factory,
+        '_compact': compact,
+        '_empty': empty,
+    }
+    for i, (s, st, kind) in enumerate(plan):
+        namespace['_validate_{i}'.format(i=i)] = _make_validator(st, strict or validation == STRICT, elements=validation != FAST)
+        if kind in ('opt_bulk', 'opt'):
+            namespace['_error_{i}'.format(i=i)] = "field {s} has value {{sv}} which is not of type {st}".format(s=s, st=st)
+            namespace['_list_types_{i}'.format(i=i)] = (list,) + bulk.bulk_types(st[:-2])
+            if kind == 'opt_bulk':
+                namespace['_bulk_types_{i}'.format(i=i)] = bulk.bulk_types(st[:-2])
+        elif kind == 'default':
+            namespace['_default_{i}'.format(i=i)] = _make_default(st)[0]
+        else:
+            namespace['_default_{i}'.format(i=i)] = _make_default(st)[1]
+
+    exec(code, namespace)
+
+    init_punch = namespace['__init__']
+    init_punch.__doc__ = msg_mod.__init__.__doc__
+    return init_punch
+
+
+# Validation levels of the constructors
+STRICT = 'strict'  # full validation, and numbers out of the range of their slot type are rejected
+FAST = 'fast'  # only the top level type of values is validated : the first element of lists, not each element
+OFF = 'off'  # no validation, values are assigned directly
+
+# the validation level of message types without their own, None meaning full validation (ranges as duck punched)
+validation_level = os.environ.get('PYROS_MSGS_VALIDATION') or None
 
-            if s in self._opt_slots and st.endswith('[]'):
-                if kwds and kwds.get(s) is not None:
-                    if not isinstance(kwds.get(s), list):  # make it a list if needed
-                        kwds[s] = [kwds.get(s)]
-                    try:
-                        sv = validate_type(kwds.get(s), st)
-                    except TypeError as te:
-                        sv = kwds.get(s)
-                        raise AttributeError("field {s} has value {sv} which is not of type {st}".format(**locals()))
-                else:
-                    kwds[s] = []
 
-            else:  # not an optional field
-                if kwds and s in kwds:
-                    kwds[s] = validate_type(kwds.get(s), st)
-                # else it will be set to None by parent class (according to original ROS message behavior)
+def _check_validation(validation):
+    if validation not in (None, STRICT, FAST, OFF):
+        raise ValueError("validation should be one of {0}, not {1!r}".format((None, STRICT, FAST, OFF), validation))
 
-        # By now the kwds is filled up with values
-        # the parent init will do the usual ROS message setup.
-        super(msg_mod, self).__init__(*args, **kwds)
 
-        # We follow the usual ROS generated message behavior and assign default values
-        for s, st in [(_slot, _slot_type) for _slot, _slot_type in zip(self.__slots__, self._slot_types)]:
-            if getattr(self, s) is None:
-                setattr(self, s, get_default_val_from_type(st))
+_check_validation(validation_level)
 
 
+def _get_init(msg_mod, opt_slot_list, strict, storage, validation):
+    """Get the constructor for the validation level of a message type, generating it the first time"""
+    level = validation or validation_level
+    inits = _inits.setdefault(msg_mod, {})
+    if level not in inits:
+        inits[level] = _generate_init(msg_mod, opt_slot_list, strict, storage, level)
+    return inits[level]
+
+
+def set_validation_level(level, msg_mod=None):
+    """
+    Change the validation level of the constructors, switching to another generated constructor.
+    :param level: STRICT, FAST, OFF, or None for full validation (with ranges checked if duck punched with strict)
+    :param msg_mod: the duck punched message type, or None to change the global level,
+    used by all message types without their own level.
+    """
+    global validation_level
+    _check_validation(level)
+    with registry.locked():
+        if msg_mod is not None:
+            if msg_mod not in _punch_options:
+                raise TypeError("{0} has not been duck punched by pyros_msgs.opt_as_array".format(msg_mod._type))
+            opt_slot_list, strict, storage, _, fast_serialize = _punch_options[msg_mod]
+            _punch_options[msg_mod] = (opt_slot_list, strict, storage, level, fast_serialize)
+            registry.record(msg_mod, 'opt_as_array', opt_slot_list=opt_slot_list, strict=strict, storage=storage, validation=level,
+                            fast_serialize=fast_serialize)
+            punched = [msg_mod]
+        else:
+            validation_level = level
+            punched = [m for m, options in _punch_options.items() if options[3] is None]
+        for m in punched:
+            _builders.pop(m, None)
+            m.__init__ = _get_init(m, *_punch_options[m][:4])
+            profiling.punched(m)
+
+
+def duck_punch(msg_mod, opt_slot_list, strict=False, storage=LIST, validation=None, fast_serialize=False):
+    """
+    Duck punch / monkey patch msg_mod, by declaring slots in opt_slot_list as optional slots
+    The message class is analysed once here, and a constructor specialized for it is installed.
+    :param msg_mod:
+    :param opt_slot_list:
+    :param strict: if True, numbers out of the range of their slot type are rejected on construction,
+    instead of failing later on serialization.
+    :param storage: how optional values are stored. LIST (default) stores a new list in each message.
+    COMPACT stores the shared empty value when not set, or an immutable OptionalValue, saving memory for many messages.
+    Both serialize the same way.
+    :param validation: the validation level of this message type : STRICT, FAST or OFF.
+    None (default) follows the global validation level, set with set_validation_level().
+    :param fast_serialize: if True, serialize and deserialize methods specialized for the message class are installed,
+    instead of the genpy generated ones. They serialize the same bytes, faster for optional fields empty or with one value.
+    :return:
+    """
+    if storage not in (LIST, COMPACT):
+        raise ValueError("storage should be one of {0}, not {1!r}".format((LIST, COMPACT), storage))
+    _check_validation(validation)
+    # doing nothing if already duck punched the same way, and safe from other threads
+    registry.patch(msg_mod, 'opt_as_array', _duck_punch, opt_slot_list=opt_slot_list, strict=strict, storage=storage, validation=validation,
+                   fast_serialize=fast_serialize)
+
+
+def _duck_punch(msg_mod, opt_slot_list, strict, storage, validation, fast_serialize=False):
+    _inits.pop(msg_mod, None)
+    init_punch = _get_init(msg_mod, opt_slot_list, strict, storage, validation)
 
     # SEEMS WE CANNOT DO THAT => keep everything in an array. makes the null [] case less surprising anyway...
     # def get_punch(self, key):
@@ -144,6 +449,199 @@ def duck_punch(msg_mod, opt_slot_list):
     # Registering the list of optional field (required by pyros_schemas)
     msg_mod._opt_slots = opt_slot_list
 
+    # keeping the genpy generated serializers around, in case we duck punch again
+    serialize = msg_mod.__dict__.get('_serialize_punched', msg_mod.serialize)
+    deserialize = msg_mod.__dict__.get('_deserialize_punched', msg_mod.deserialize)
+    if fast_serialize:
+        msg_mod._serialize_punched = serialize
+        msg_mod._deserialize_punched = deserialize
+        msg_mod.serialize, msg_mod.deserialize = serializers.generate(msg_mod)
+    else:
+        msg_mod.serialize = serialize
+        msg_mod.deserialize = deserialize
+
+    # Remembering how we duck punched, to build batches of messages the same way
+    _punch_options[msg_mod] = (opt_slot_list, strict, storage, validation, fast_serialize)
+    _builders.pop(msg_mod, None)
+    profiling.punched(msg_mod)
+
+
+# message class -> (opt_slot_list, strict, storage, validation, fast_serialize)
+_punch_options = {}
+# message class -> {validation level: generated __init__}
+_inits = {}
+# message class -> (column validators, builder)
+_builders = {}
+
+
+def _make_opt_column_validator(slot, slot_type, strict):
+    """
+    Build the function validating a column of values for an optional slot, once for all messages.
+    It behaves as the generated constructor for each value, None meaning the slot is not set.
+    A column of numbers held in bulk (array.array, numpy array, etc.) is validated at once.
+    """
+    validate_type = _make_validator(slot_type, strict)
+    validate_single = _make_validator(slot_type[:-2], strict)  # for a value not in a list
+    bulk_types = bulk.bulk_types(slot_type[:-2])
+    validate_column_bulk = _make_column_validator(slot_type[:-2], strict) if bulk_types else None
+    error = "field {s} has value {{sv}} which is not of type {st}".format(s=slot, st=slot_type)
+
+    def validate_opt(slot_value):
+        if slot_value is None:
+            return None
+        elif bulk_types and isinstance(slot_value, bulk_types):
+            try:
+                return validate_type(slot_value)
+            except TypeError:
+                raise AttributeError(error.format(sv=slot_value))
+        elif not isinstance(slot_value, list):  # make it a list
+            try:
+                validate_single(slot_value)
+            except TypeError:
+                raise AttributeError(error.format(sv=[slot_value]))
+            return [slot_value]
+        try:
+            validate_type(slot_value)
+        except TypeError:
+            raise AttributeError(error.format(sv=slot_value))
+        return slot_value
+
+    def validate_column(column):
+        if bulk_types and isinstance(column, bulk_types):
+            # one value per message, held in bulk
+            try:
+                return [[v] for v in validate_column_bulk(column)]
+            except TypeError:
+                raise AttributeError(error.format(sv=column))
+        return [validate_opt(v) for v in column]
+
+    return validate_column
+
+
+def _make_column_validator(slot_type, strict):
+    """
+    Build the function validating a column of values for a slot, once for all messages.
+    None means the slot is not set, and will get its default value.
+    A column of numbers held in bulk (array.array, numpy array, etc.) is validated at once.
+    """
+    validate_type = _make_validator(slot_type, strict)
+    bulk_types = bulk.bulk_types(slot_type)
+    validate_bulk = bulk.make_bulk_validator(slot_type) if bulk_types else None
+
+    def validate_column(column):
+        if bulk_types and isinstance(column, bulk_types):
+            column = validate_bulk(column)
+            return list(bytearray(column)) if isinstance(column, (bytes, bytearray)) else column.tolist()
+        return [validate_type(v) if v is not None else None for v in column]
+
+    return validate_column
+
+
+_builder_header = """
+def build(msg_mod, columns):
+    new = msg_mod.__new__
+    for {values} in zip(*columns):
+        self = new(msg_mod)
+"""
+
+_builder_opt_slot_assign = """
+        self.{s} = v{i} if v{i} is not None else []
+"""
+
+_builder_opt_slot_assign_compact = """
+        self.{s} = _compact(v{i}) if v{i} is not None else _empty
+"""
+
+_builder_slot_assign_default = """
+        self.{s} = v{i} if v{i} is not None else _default_{i}
+"""
+
+_builder_slot_assign_factory = """
+        self.{s} = v{i} if v{i} is not None else (_default_factories.get(_default_{i}) or _get_default_factory(_default_{i}))()
+"""
+
+_builder_footer = """
+        yield self
+"""
+
+
+def _generate_builder(msg_mod, opt_slot_list, strict, storage=LIST, validation=None):
+    """
+    Analyse the message class once, and generate the column validators and a builder
+    assigning validated values to the slots of new messages directly.
+    Columns are validated once for all messages, fully : only the STRICT validation level changes it, to check ranges.
+    :param msg_mod: the ros message class
+    :param opt_slot_list: the list of slots to consider optional
+    :param strict: whether to also reject numbers out of the range of their slot type
+    :param storage: how optional values are stored, LIST or COMPACT
+    :param validation: the validation level of the message type
+    :return: a tuple (column validators, builder)
+    """
+    strict = strict or (validation or validation_level) == STRICT
+    opt_slot_assign = _builder_opt_slot_assign_compact if storage == COMPACT else _builder_opt_slot_assign
+    namespace = {
+        'zip': six.moves.zip,
+        '_default_factories': typecache.default_factories,
+        '_get_default_factory': typecache.get_default_factory,
+        '_compact': compact,
+        '_empty': empty,
+    }
+    validators = []
+    assign_code = []
+    for i, (s, st) in enumerate(zip(msg_mod.__slots__, msg_mod._slot_types)):
+        if s in opt_slot_list and st.endswith('[]'):
+            validators.append(_make_opt_column_validator(s, st, strict))
+            assign_code.append(opt_slot_assign.format(i=i, s=s))
+        else:  # not an optional field
+            validators.append(_make_column_validator(st, strict))
+            default_value, factory_type = _make_default(st)
+            if factory_type is None:
+                namespace['_default_{i}'.format(i=i)] = default_value
+                assign_code.append(_builder_slot_assign_default.format(i=i, s=s))
+            else:
+                namespace['_default_{i}'.format(i=i)] = factory_type
+                assign_code.append(_builder_slot_assign_factory.format(i=i, s=s))
+
+    values = ''.join('v{i}, '.format(i=i) for i in range(len(msg_mod.__slots__)))
+    source = _builder_header.format(values=values) + ''.join(assign_code) + _builder_footer
+    exec(compile(source, '<{0} duck punched builder>'.format(msg_mod._type), 'exec'), namespace)
+    return validators, namespace['build']
+
+
+def build_many(msg_mod, columns, lazy=False):
+    """
+    Build many messages at once, from columns of values.
+    Each column is validated once for all messages, and the messages are built without going through the constructor.
+    The message class must have been duck punched first.
+    :param msg_mod: the duck punched ros message class
+    :param columns: a dict of slot name -> sequence of values, one per message.
+    A None value means the slot is not set for that message, and gets its default value.
+    :param lazy: if True, return a generator building the messages when iterated on, instead of a list
+    :return: a list, or a generator, of messages
+    """
+    if msg_mod not in _punch_options:
+        raise TypeError("{0} has not been duck punched by pyros_msgs.opt_as_array".format(msg_mod._type))
+    for k in columns:
+        if k not in msg_mod.__slots__:
+            raise AttributeError("%s is not an attribute of %s" % (k, msg_mod.__name__))
+    if not columns:
+        raise ValueError("at least one column is needed to build messages")
+    sizes = set(len(c) for c in columns.values())
+    if len(sizes) > 1:
+        raise ValueError("all columns should have the same length, got lengths {0}".format(sorted(sizes)))
+
+    try:
+        validators, build = _builders[msg_mod]
+    except KeyError:
+        validators, build = _builders[msg_mod] = _generate_builder(msg_mod, *_punch_options[msg_mod][:4])
+
+    validated = [
+        validate(columns[s]) if s in columns else itertools.repeat(None)
+        for s, validate in zip(msg_mod.__slots__, validators)
+    ]
+    messages = build(msg_mod, validated)
+    return messages if lazy else list(messages)
+
 #
 # default data values extracted from genpy.generator:default_value()
 #
@@ -0,0 +1,307 @@
+from __future__ import absolute_import
+from __future__ import print_function
+
+"""
+pyros_msgs.opt_as_array.serializers generates serialize / deserialize methods specialized for a message class.
+
+genpy generated methods write each field on its own, and loop over arrays with a length prefix.
+Optional fields are mostly empty, or hold one value : the generated methods write the empty array as a constant,
+and a single value with one precompiled struct.Struct, length included.
+Consecutive fixed size fields are packed with one precompiled struct.Struct, and the serialized message
+is written to the buffer at once.
+
+The output is byte identical to genpy. Deserialized values are the same too, except bool arrays being lists
+instead of map objects on python 3.
+Nested messages are serialized in place, as genpy does.
+"""
+
+import struct
+
+import genpy
+import six
+
+from pyros_msgs import typecache
+from pyros_msgs.wire import primitive_formats
+
+_struct_I = struct.Struct('<I')
+_zero = _struct_I.pack(0)
+
+# time and duration on the wire : secs and nsecs
+_time_formats = {'time': 'II', 'duration': 'ii'}
+
+
+def _message_class(slot_type):
+    msg_class = typecache.get_message_class(slot_type)
+    if msg_class is None:
+        raise TypeError("message class for '{slot_type}' not found".format(slot_type=slot_type))
+    if '_presence_bits' in msg_class.__dict__:
+        # the presence bits are restored by the duck punched deserialize, that we would not call
+        raise TypeError("{0} is duck punched by pyros_msgs.opt_as_bitmask, and cannot be nested in generated serializers".format(msg_class._type))
+    return msg_class
+
+
+class _Generator(object):
+    """Generate the source of the write and read functions of a message class, with the namespace they need"""
+
+    def __init__(self):
+        self.namespace = {
+            'struct': struct,
+            '_struct_I': _struct_I,
+            '_zero': _zero,
+            '_Time': genpy.Time,
+            '_Duration': genpy.Duration,
+        }
+        self.count = 0
+
+    def name(self, prefix, value):
+        """Add a value to the namespace, with a unique name"""
+        name = '_{0}{1}'.format(prefix, self.count)
+        self.count += 1
+        self.namespace[name] = value
+        return name
+
+    def fields(self, msg_class, expr, prepare):
+        """
+        Flatten the fields of a message, nested messages being serialized in place, as genpy does.
+        :param msg_class: the message class
+        :param expr: the python expression of the message
+        :param prepare: a list where lines creating nested values missing before reading are added
+        :return: a list of (slot type, python expression of the field, whether it is optional)
+        """
+        opt_slots = getattr(msg_class, '_opt_slots', ())
+        fields = []
+        for s, st in zip(msg_class.__slots__, msg_class._slot_types):
+            field = '{0}.{1}'.format(expr, s)
+            if st in _time_formats:
+                prepare.append('if {0} is None:'.format(field))
+                prepare.append('    {0} = {1}()'.format(field, '_Time' if st == 'time' else '_Duration'))
+            if st in primitive_formats or st in _time_formats or st == 'string' or '[' in st:
+                fields.append((st, field, s in opt_slots))
+            else:
+                prepare.append('if {0} is None:'.format(field))
+                prepare.append('    {0} = {1}()'.format(field, self.name('class', _message_class(st))))
+                fields.extend(self.fields(_message_class(st), field, prepare))
+        return fields
+
+    def body(self, fields, indent):
+        """Generate the write and read lines of flattened fields"""
+        write_lines, read_lines = [], []
+        group = []
+        for st, field, optional in fields:
+            if st in primitive_formats or st in _time_formats:
+                group.append((st, field))
+                continue
+            if group:
+                write_lines += self.write_fixed(group, indent)
+                read_lines += self.read_fixed(group, indent)
+                group = []
+            if st == 'string':
+                write_lines += self.write_string(field, indent)
+                read_lines += self.read_string(field, indent)
+            else:
+                write_lines += self.write_array(st, field, indent, optional)
+                read_lines += self.read_array(st, field, indent, optional)
+        if group:
+            write_lines += self.write_fixed(group, indent)
+            read_lines += self.read_fixed(group, indent)
+        return write_lines, read_lines
+
+    # fixed size fields, packed together
+
+    def fixed_struct(self, group):
+        return struct.Struct('<' + ''.join(primitive_formats.get(st) or _time_formats[st] for st, _ in group))
+
+    def fixed_values(self, group):
+        values = []
+        for st, field in group:
+            values.extend(['{0}.secs'.format(field), '{0}.nsecs'.format(field)] if st in _time_formats else [field])
+        return values
+
+    def write_fixed(self, group, indent):
+        return [indent + 'parts.append({0}.pack({1}))'.format(self.name('struct', self.fixed_struct(group)), ', '.join(self.fixed_values(group)))]
+
+    def read_fixed(self, group, indent):
+        fixed_struct = self.fixed_struct(group)
+        lines = [
+            indent + '({0},) = {1}.unpack_from(buf, offset)'.format(', '.join(self.fixed_values(group)), self.name('struct', fixed_struct)),
+            indent + 'offset += {0}'.format(fixed_struct.size),
+        ]
+        for st, field in group:
+            if st == 'bool':
+                lines.append(indent + '{0} = bool({0})'.format(field))
+        return lines
+
+    # fields of variable size
+
+    def write_string(self, field, indent):
+        return [
+            indent + '_x = {0}'.format(field),
+            indent + 'if not isinstance(_x, bytes):',
+            indent + '    _x = _x.encode(\'utf-8\')',
+            indent + 'parts.append(_struct_I.pack(len(_x)))',
+            indent + 'parts.append(_x)',
+        ]
+
+    def read_string(self, field, indent):
+        return [
+            indent + '_n = _struct_I.unpack_from(buf, offset)[0]',
+            indent + 'offset += 4',
+            indent + '{0} = buf[offset:offset + _n]{1}'.format(field, '.decode(\'utf-8\')' if six.PY3 else ''),
+            indent + 'offset += _n',
+        ]
+
+    def write_array(self, slot_type, field, indent, optional):
+        base_type, size = slot_type[:-1].split('[')
+        lines = [indent + '_a = {0}'.format(field)]
+        if base_type in ('uint8', 'char'):
+            # genpy writes uint8 arrays from bytes, or from lists of numbers
+            if size:
+                return lines + [
+                    indent + 'if type(_a) in (list, tuple):',
+                    indent + '    parts.append(struct.pack(\'<{0}B\', *_a))'.format(size),
+                    indent + 'else:',
+                    indent + '    parts.append(struct.pack(\'<{0}s\', _a))'.format(size),
+                ]
+            return lines + [
+                indent + '_n = len(_a)',
+                indent + 'if type(_a) in (list, tuple):',
+                indent + '    parts.append(struct.pack(\'<I%dB\' % _n, _n, *_a))',
+                indent + 'else:',
+                indent + '    parts.append(struct.pack(\'<I%ds\' % _n, _n, _a))',
+            ]
+        if base_type in primitive_formats:
+            fmt = primitive_formats[base_type]
+            if size:
+                return lines + [indent + 'parts.append({0}.pack(*_a))'.format(self.name('struct', struct.Struct('<' + size + fmt)))]
+            lines.append(indent + '_n = len(_a)')
+            if optional:
+                # the dominant cases of optional fields : not set, or one value
+                lines += [
+                    indent + 'if _n == 1:',
+                    indent + '    parts.append({0}.pack(1, _a[0]))'.format(self.name('struct', struct.Struct('<I' + fmt))),
+                    indent + 'elif _n == 0:',
+                    indent + '    parts.append(_zero)',
+                    indent + 'else:',
+                    indent + '    parts.append(struct.pack(\'<I%d{0}\' % _n, _n, *_a))'.format(fmt),
+                ]
+            else:
+                lines.append(indent + 'parts.append(struct.pack(\'<I%d{0}\' % _n, _n, *_a))'.format(fmt))
+            return lines
+        if not size:
+            lines.append(indent + 'parts.append(_zero if not _a else _struct_I.pack(len(_a)))')
+        element = '_e{0}'.format(len(indent))
+        lines.append(indent + 'for {0} in _a:'.format(element))
+        write_lines, _ = self.element_body(base_type, element, indent + '    ')
+        return lines + (write_lines or [indent + '    pass'])
+
+    def read_array(self, slot_type, field, indent, optional):
+        base_type, size = slot_type[:-1].split('[')
+        lines = []
+        if size:
+            length = size
+        else:
+            length = '_n'
+            lines += [indent + '_n = _struct_I.unpack_from(buf, offset)[0]', indent + 'offset += 4']
+        if base_type in ('uint8', 'char'):
+            return lines + [
+                indent + '{0} = buf[offset:offset + {1}]'.format(field, length),
+                indent + 'offset += {0}'.format(length),
+            ]
+        if base_type in primitive_formats:
+            fmt = primitive_formats[base_type]
+            itemsize = struct.calcsize('<' + fmt)
+            to_list = ('list(map(bool, ', '))') if base_type == 'bool' else ('', '')
+            if size:
+                unpack = '{0}.unpack_from(buf, offset)'.format(self.name('struct', struct.Struct('<' + size + fmt)))
+                lines.append(indent + '{0} = {1}{2}{3}'.format(field, to_list[0], unpack, to_list[1]))
+            elif optional:
+                lines += [
+                    indent + 'if _n == 1:',
+                    indent + '    {0} = {1}{2}.unpack_from(buf, offset){3}'.format(field, to_list[0], self.name('struct', struct.Struct('<' + fmt)), to_list[1]),
+                    indent + 'elif _n == 0:',
+                    indent + '    {0} = {1}(){2}'.format(field, to_list[0], to_list[1]),
+                    indent + 'else:',
+                    indent + '    {0} = {1}struct.unpack_from(\'<%d{2}\' % _n, buf, offset){3}'.format(field, to_list[0], fmt, to_list[1]),
+                ]
+            else:
+                lines.append(indent + '{0} = {1}struct.unpack_from(\'<%d{2}\' % _n, buf, offset){3}'.format(field, to_list[0], fmt, to_list[1]))
+            return lines + [indent + 'offset += {0} * {1}'.format(length, itemsize)]
+        values = '_l{0}'.format(len(indent))
+        element = '_e{0}'.format(len(indent))
+        lines += [indent + '{0} = []'.format(values), indent + 'for _ in range({0}):'.format(length)]
+        if base_type == 'string':
+            element_create = []
+        elif base_type in _time_formats:
+            element_create = [indent + '    {0} = {1}()'.format(element, '_Time' if base_type == 'time' else '_Duration')]
+        else:
+            element_create = [indent + '    {0} = {1}()'.format(element, self.name('class', _message_class(base_type)))]
+        _, read_lines = self.element_body(base_type, element, indent + '    ')
+        return lines + element_create + read_lines + [
+            indent + '    {0}.append({1})'.format(values, element),
+            indent + '{0} = {1}'.format(field, values),
+        ]
+
+    def element_body(self, base_type, element, indent):
+        """Generate the write and read lines of an array element"""
+        if base_type in ('string', 'time', 'duration'):
+            return self.body([(base_type, element, False)], indent)
+        # elements are created by their message class, with their nested values
+        return self.body(self.fields(_message_class(base_type), element, []), indent)
+
+    def canon(self, msg_class, indent):
+        """Generate the lines normalizing the time and duration fields of the message, as genpy does after reading it"""
+        # genpy only normalizes the fields of the message itself, not the ones of nested messages or in arrays
+        return [indent + 'msg.{0}.canon()'.format(s) for s, st in zip(msg_class.__slots__, msg_class._slot_types) if st in _time_formats]
+
+    def generate(self, msg_class):
+        """
+        Generate the source of the functions write(msg, parts), appending the serialized message to the list parts,
+        and read(buf, offset, msg), filling msg from buf at offset, and returning the offset after it.
+        """
+        prepare = []
+        write_lines, read_lines = self.body(self.fields(msg_class, 'msg', prepare), '    ')
+        return '\n'.join(
+            ['def write(msg, parts):'] + (write_lines or ['    pass']) +
+            ['', 'def read(buf, offset, msg):'] + ['    ' + line for line in prepare] + read_lines +
+            self.canon(msg_class, '    ') + ['    return offset', '']
+        )
+
+
+def generate(msg_mod):
+    """
+    Generate serialize and deserialize methods specialized for a message class.
+    :param msg_mod: the ros message class, with its optional slots in _opt_slots
+    :return: a tuple (serialize, deserialize) of functions, to install on msg_mod
+    """
+    generator = _Generator()
+    source = generator.generate(msg_mod)
+    exec(compile(source, '<{0} generated serializers>'.format(msg_mod._type), 'exec'), generator.namespace)
+    write, read = generator.namespace['write'], generator.namespace['read']
+
+    def serialize(self, buff):
+        parts = []
+        try:
+            write(self, parts)
+        except struct.error as se:
+            self._check_types(struct.error("%s: '%s' when writing '%s'" % (type(se), str(se), str(self))))
+        except TypeError as te:
+            self._check_types(ValueError("%s: '%s' when writing '%s'" % (type(te), str(te), str(self))))
+        buff.write(b''.join(parts))
+
+    def deserialize(self, str):
+        try:
+            read(str, 0, self)
+            return self
+        except struct.error as e:
+            raise genpy.DeserializationError(e)  # most likely buffer underfill
+
+    serialize.__doc__ = msg_mod.serialize.__doc__
+    deserialize.__doc__ = msg_mod.deserialize.__doc__
+    # reading a message at an offset, without slicing the buffer, ie. for batches of messages
+    deserialize._read = read
+    return serialize, deserialize
+
+
+__all__ = [
+    'generate',
+]
@@ -0,0 +1,130 @@
+from __future__ import absolute_import
+from __future__ import print_function
+
+"""
+pyros_msgs.opt_as_array.views deserializes messages with views over the incoming buffer, for large optional arrays.
+
+genpy deserializes a numeric array into a list, with one python object per element, and an uint8 array into a copy.
+For optional numeric arrays, deserialize_views() instead stores a memoryview over the buffer holding the message :
+no copy is made, and python numbers are made only for the elements read.
+A relay can check whether an optional array is set with len(), and forward it as a buffer, without copying it.
+
+The views keep the buffer alive, and see its changes : the buffer should not be reused while messages hold views over it.
+Numeric views serialize as other values, but genpy serializes uint8 arrays as bytes only : call materialize() before.
+
+Views need python 3 on a little endian machine, where the ros wire format is the native one.
+Elsewhere the arrays are copied, into array.array, still without one python object per element.
+"""
+
+import array
+import struct
+import sys
+
+import six
+
+from pyros_msgs import ros_python_range_mapping
+from pyros_msgs import wire
+
+# whether numeric arrays on the wire can be viewed in place, as memoryview.cast() of native numbers
+_native_views = six.PY3 and sys.byteorder == 'little'
+
+_empty_array = struct.pack('<I', 0)
+
+
+def _view(data, slot_type):
+    """
+    View the elements of a serialized array.
+    :param data: the buffer of the elements, without the length prefix
+    :param slot_type: the ros type of the elements
+    :return: a memoryview, or an array.array (or a list) of the elements where they cannot be viewed in place
+    """
+    element_format = wire.primitive_formats[slot_type]
+    if _native_views:
+        return data if element_format == 'B' else data.cast(element_format)
+    elif element_format == 'B':
+        return data.tobytes()
+    try:
+        values = array.array(element_format, data.tobytes())
+        if sys.byteorder != 'little':
+            values.byteswap()
+        return values
+    except ValueError:  # no 64 bits array.array on python 2
+        return list(struct.unpack('<{0}{1}'.format(len(data) // struct.calcsize(element_format), element_format), data.tobytes()))
+
+
+def _view_slots(msg_mod, slots):
+    """Find the slots to view, checking they are variable length arrays of numbers"""
+    slot_types = dict(zip(msg_mod.__slots__, msg_mod._slot_types))
+    if slots is None:
+        slots = [s for s in getattr(msg_mod, '_opt_slots', ()) if slot_types[s][:-2] in ros_python_range_mapping]
+    for s in slots:
+        if s not in slot_types:
+            raise AttributeError("%s is not an attribute of %s" % (s, msg_mod.__name__))
+        if not slot_types[s].endswith('[]') or slot_types[s][:-2] not in ros_python_range_mapping:
+            raise TypeError("{0} is not a variable length array of numbers in {1}".format(s, msg_mod._type))
+    return dict((s, slot_types[s][:-2]) for s in slots)
+
+
+# (message class, slots) -> {slot: element type}
+_view_plans = {}
+
+
+def deserialize_views(msg_mod, buf, slots=None):
+    """
+    Deserialize a message, with views over buf for optional numeric arrays, instead of copies.
+    :param msg_mod: the ros message class, duck punched by opt_as_array
+    :param buf: the serialized message (bytes, bytearray, memoryview, mmap...)
+    :param slots: the array slots to view. Defaults to the optional arrays of numbers of msg_mod.
+    :return: the message
+    """
+    key = (msg_mod, None if slots is None else tuple(slots))
+    plan = _view_plans.get(key)
+    if plan is None:
+        plan = _view_plans[key] = _view_slots(msg_mod, slots)
+
+    data = memoryview(buf)
+    if six.PY3 and data.format != 'B':
+        data = data.cast('B')
+    views = []
+    pieces = []
+    position = 0
+    # the message without the viewed arrays is deserialized by genpy : viewed arrays are replaced by empty ones
+    spans = wire.spans(msg_mod, data)
+    for s, start, end in spans:
+        if s in plan:
+            pieces.append(data[position:start])
+            pieces.append(_empty_array)
+            views.append((s, start + 4, end))
+            position = end
+    message_end = spans[-1][2] if spans else 0
+    if views:
+        pieces.append(data[position:message_end])
+        rest = b''.join(pieces) if six.PY3 else b''.join(p.tobytes() if isinstance(p, memoryview) else p for p in pieces)
+    else:
+        rest = data[:message_end].tobytes()
+
+    msg = msg_mod()
+    msg.deserialize(rest)
+    for s, start, end in views:
+        setattr(msg, s, _view(data[start:end], plan[s]))
+    return msg
+
+
+def materialize(msg):
+    """
+    Replace the views held by a message with copies of their values, ie. before serializing it, or reusing the buffer.
+    uint8 arrays become bytes, and other arrays lists, as genpy deserializes them.
+    :param msg: the message, from deserialize_views()
+    :return: the message
+    """
+    for s in msg.__slots__:
+        value = getattr(msg, s)
+        if isinstance(value, memoryview):
+            setattr(msg, s, value.tobytes() if value.format == 'B' else value.tolist())
+    return msg
+
+
+__all__ = [
+    'deserialize_views',
+    'materialize',
+]
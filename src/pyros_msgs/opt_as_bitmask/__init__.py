@@ -0,0 +1,22 @@
+from __future__ import absolute_import
+from __future__ import print_function
+
+"""
+pyros_msgs.opt_as_bitmask is a module that holds the presence of all optional fields of a message in a single bitmask field.
+
+This is useful if you have a message with many optional fields : instead of one opt_as_nested sub-message per field,
+the message has a first field 'uint64 presence_' (or a smaller unsigned integer), and plain fields.
+The i-th optional field is set when the bit (1 << i) of presence_ is set.
+
+After duck punching, the presence bits are set by the constructor and when assigning optional fields,
+and can be read and changed with is_set(), set_slots(), mark_set() and unset().
+As with opt_as_array and opt_as_nested, passing None for an optional field to the constructor leaves it unset.
+Optional fields holding mutable values (time, duration, messages, arrays) are built only when read.
+The wire format is the usual ROS one, readable by any ROS node : it carries all fields, set or not.
+pyros_msgs.opt_as_bitmask.compact is an opt-in encoding writing only the optional fields that are set.
+In memory, each message still has a slot per declared field : unset fields refer to shared default values,
+or to nothing built yet for mutable values, but the slots are there.
+"""
+
+
+from .opt_as_bitmask import duck_punch, is_set, set_slots, mark_set, unset
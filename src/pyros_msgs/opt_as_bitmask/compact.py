@@ -0,0 +1,148 @@
+from __future__ import absolute_import
+from __future__ import print_function
+
+"""
+pyros_msgs.opt_as_bitmask.compact is a compact wire encoding for messages with presence bits, writing only the fields set.
+
+The ros encoding of a message always carries all its fields, set or not.
+The compact encoding writes the presence_ field, then the fields that are not optional, and only the optional fields
+whose presence bit is set, all as ros encodes them : its size depends on the fields set, not on the fields declared.
+A message with all its optional fields set is encoded as ros does.
+
+The encoding and decoding functions of a message type are generated once, as pyros_msgs.opt_as_array.serializers does.
+Decoded messages have their presence bits as received, and the default values for the optional fields not set.
+
+Other ros nodes do not understand this encoding :
+both ends of a connection need to explicitly opt in, by using these functions instead of serialize / deserialize.
+"""
+
+import struct
+
+import genpy
+
+from pyros_msgs.opt_as_array import serializers
+from pyros_msgs.wire import primitive_formats
+from .opt_as_bitmask import presence_slot_name
+
+
+class _PresenceGenerator(serializers._Generator):
+    """Generate the write and read functions of the compact encoding, optional fields being guarded by their bit"""
+
+    def slot_fields(self, s, st, prepare):
+        """The flattened fields of a slot of the message, as fields() finds them"""
+        field = 'msg.' + s
+        if st in primitive_formats or st in serializers._time_formats or st == 'string' or '[' in st:
+            if st in serializers._time_formats:
+                prepare.append('if {0} is None:'.format(field))
+                prepare.append('    {0} = {1}()'.format(field, '_Time' if st == 'time' else '_Duration'))
+            return [(st, field, False)]
+        msg_class = serializers._message_class(st)
+        prepare.append('if {0} is None:'.format(field))
+        prepare.append('    {0} = {1}()'.format(field, self.name('class', msg_class)))
+        return self.fields(msg_class, field, prepare)
+
+    def generate(self, msg_class):
+        """
+        Generate the source of the functions write(msg, parts), appending the serialized message to the list parts,
+        and read(buf, offset, msg), filling msg from buf at offset, and returning the offset after it.
+        """
+        presence_struct = struct.Struct('<' + primitive_formats[msg_class._slot_types[0]])
+        presence = self.name('struct', presence_struct)
+        write_lines = ['    parts.append({0}.pack(msg.{1}))'.format(presence, presence_slot_name)]
+        read_lines = [
+            '    (_p,) = {0}.unpack_from(buf, offset)'.format(presence),
+            '    offset += {0}'.format(presence_struct.size),
+        ]
+        bits = msg_class._presence_bits
+        plain, plain_prepare = [], []
+        for s, st in list(zip(msg_class.__slots__, msg_class._slot_types))[1:] + [(None, None)]:
+            prepare = []
+            if s is not None and s not in bits:
+                plain += self.slot_fields(s, st, plain_prepare)
+                continue
+            # the fields not optional before this one, packed together
+            write_plain, read_plain = self.body(plain, '    ')
+            write_lines += write_plain
+            read_lines += ['    ' + line for line in plain_prepare] + read_plain
+            plain, plain_prepare = [], []
+            if s is None:
+                break
+            write_slot, read_slot = self.body(self.slot_fields(s, st, prepare), '        ')
+            write_lines += ['    if msg.{0} & {1}:'.format(presence_slot_name, bits[s])] + write_slot
+            read_lines += ['    if _p & {0}:'.format(bits[s])] + ['        ' + line for line in prepare] + read_slot
+        read_lines += self.canon(msg_class, '    ') + [
+            '    msg.{0} = _p'.format(presence_slot_name),
+            '    return offset',
+        ]
+        return '\n'.join(['def write(msg, parts):'] + write_lines + ['', 'def read(buf, offset, msg):'] + read_lines + [''])
+
+
+# message class -> (write, read)
+_codecs = {}
+
+
+def _get_codec(msg_class):
+    try:
+        return _codecs[msg_class]
+    except KeyError:
+        pass
+    if '_presence_bits' not in msg_class.__dict__:
+        raise TypeError("{0} has not been duck punched by pyros_msgs.opt_as_bitmask".format(msg_class._type))
+    generator = _PresenceGenerator()
+    source = generator.generate(msg_class)
+    exec(compile(source, '<{0} compact encoding>'.format(msg_class._type), 'exec'), generator.namespace)
+    _codecs[msg_class] = generator.namespace['write'], generator.namespace['read']
+    return _codecs[msg_class]
+
+
+def serialize(msg, buff):
+    """
+    Serialize a message with presence bits into buffer, with the compact encoding
+    :param msg: the message, of a type duck punched by opt_as_bitmask
+    :param buff: buffer, ``StringIO``
+    """
+    write, _ = _get_codec(type(msg))
+    parts = []
+    try:
+        write(msg, parts)
+    except struct.error as se:
+        msg._check_types(struct.error("%s: '%s' when writing '%s'" % (type(se), str(se), str(msg))))
+    except TypeError as te:
+        msg._check_types(ValueError("%s: '%s' when writing '%s'" % (type(te), str(te), str(msg))))
+    buff.write(b''.join(parts))
+
+
+def read(msg_class, str, offset=0):
+    """
+    Deserialize a message encoded with the compact encoding, at an offset in a buffer
+    :param msg_class: the message type, duck punched by opt_as_bitmask
+    :param str: byte array holding the serialized message, ``str``
+    :param offset: the position of the message in the buffer
+    :return: a tuple (message, the position right after the message), to read what follows it
+    """
+    _, read_msg = _get_codec(msg_class)
+    msg = msg_class()
+    try:
+        end = read_msg(str, offset, msg)
+    except struct.error as e:
+        raise genpy.DeserializationError(e)  # most likely buffer underfill
+    if end > len(str):
+        raise genpy.DeserializationError("buffer underfill : the message ends at {0}, after the end of the buffer at {1}".format(end, len(str)))
+    return msg, end
+
+
+def deserialize(msg_class, str):
+    """
+    Deserialize a message with presence bits, encoded with the compact encoding
+    :param msg_class: the message type, duck punched by opt_as_bitmask
+    :param str: byte array of the serialized message, ``str``
+    :return: the message
+    """
+    return read(msg_class, str)[0]
+
+
+__all__ = [
+    'serialize',
+    'deserialize',
+    'read',
+]
@@ -0,0 +1,239 @@
+from __future__ import absolute_import
+from __future__ import print_function
+
+import struct
+
+import genpy
+import six
+
+from pyros_msgs import ros_python_type_mapping, ros_python_default_mapping, ros_python_range_mapping
+from pyros_msgs import profiling
+from pyros_msgs import registry
+from pyros_msgs import typecache
+from pyros_msgs.opt_as_nested.opt_as_nested import uninitialized
+
+# the name of the field holding the presence bits
+presence_slot_name = 'presence_'
+
+# unsigned integer types that can hold presence bits -> struct format
+_presence_formats = {'uint8': '<B', 'uint16': '<H', 'uint32': '<I', 'uint64': '<Q'}
+
+
+def _default(slot_type):
+    """
+    Find the default value of a slot, as genpy.generator:default_value() does.
+    :param slot_type: the ros type of the slot
+    :return: a tuple (default_value, factory). If factory is not None, it builds a fresh default value.
+    """
+    if slot_type in ros_python_type_mapping:
+        return ros_python_default_mapping.get(slot_type), None
+    elif slot_type == 'time':
+        return None, genpy.Time
+    elif slot_type == 'duration':
+        return None, genpy.Duration
+    elif '[' in slot_type:
+        base_type, size = slot_type[:-1].split('[')
+        if base_type in ('uint8', 'char'):
+            return b'\0' * int(size or 0), None
+        if not size:
+            return None, list
+        element_default, element_factory = _default(base_type)
+        if element_factory is None:
+            return None, lambda: [element_default] * int(size)
+        return None, lambda: [element_factory() for _ in range(int(size))]
+    else:
+        factory = typecache.get_default_factory(slot_type)
+        if factory is None:
+            raise TypeError("message class for '{slot_type}' not found".format(slot_type=slot_type))
+        return None, factory
+
+
+def _optional_slot(slot, presence, bit, default_factory):
+    """
+    Build a property wrapping an optional slot, setting its presence bit when assigned.
+    :param slot: the slot descriptor generated by genpy
+    :param presence: the slot descriptor of the presence bits
+    :param bit: the presence bit of this slot
+    :param default_factory: a callable building the default value on first read, if the slot holds a mutable value
+    :return: the property to set on the message class
+    """
+    def get_value(self):
+        value = slot.__get__(self)
+        if value is uninitialized:
+            value = default_factory()
+            slot.__set__(self, value)
+        return value
+
+    def set_value(self, value):
+        slot.__set__(self, value)
+        presence.__set__(self, presence.__get__(self) | bit)
+
+    return property(get_value, set_value, doc="optional field, marked as set when assigned")
+
+
+def duck_punch(msg_mod, opt_slot_list):
+    """
+    Duck punch / monkey patch msg_mod, to declare slots in opt_slot_list as optional,
+    their presence being held as bits in the presence_ field of the message.
+    The i-th optional slot, in the order of the message slots, is set when the bit (1 << i) of presence_ is set.
+    :param msg_mod: the ros message class. Its first field must be an unsigned integer named presence_
+    :param opt_slot_list: the list of slots to consider optional
+    :return:
+    """
+    # doing nothing if already duck punched the same way, and safe from other threads
+    registry.patch(msg_mod, 'opt_as_bitmask', _duck_punch, opt_slot_list=opt_slot_list)
+
+
+def _duck_punch(msg_mod, opt_slot_list):
+    slot_types = dict(zip(msg_mod.__slots__, msg_mod._slot_types))
+    if msg_mod.__slots__[0] != presence_slot_name or slot_types[presence_slot_name] not in _presence_formats:
+        raise TypeError("{0} is not an optional message type with presence bits : its first field should be an unsigned integer named {1}".format(msg_mod._type, presence_slot_name))
+    presence_format = _presence_formats[slot_types[presence_slot_name]]
+    presence_max = ros_python_range_mapping[slot_types[presence_slot_name]][1]
+    for s in opt_slot_list:
+        if s not in slot_types or s == presence_slot_name:
+            raise AttributeError("%s is not an attribute of %s" % (s, msg_mod.__name__))
+
+    # keeping the genpy generated slot descriptors around, in case we duck punch again
+    if '_slot_descriptors' not in msg_mod.__dict__:
+        msg_mod._slot_descriptors = dict((s, msg_mod.__dict__[s]) for s in msg_mod.__slots__)
+    descriptors = msg_mod._slot_descriptors
+    presence = descriptors[presence_slot_name]
+
+    bits = {}
+    plan = []
+    for s in msg_mod.__slots__[1:]:
+        default_value, default_factory = _default(slot_types[s])
+        if s in opt_slot_list:
+            bit = bits[s] = 1 << len(bits)
+            if bit > presence_max:
+                raise TypeError("{0} has too many optional fields for its {1} field".format(msg_mod._type, presence_slot_name))
+            if default_factory is not None:
+                # mutable default values are built only when read, for optional slots not set
+                default_value = uninitialized
+                setattr(msg_mod, s, _optional_slot(descriptors[s], presence, bit, default_factory))
+                default_factory = None
+            else:
+                setattr(msg_mod, s, _optional_slot(descriptors[s], presence, bit, None))
+        else:
+            setattr(msg_mod, s, descriptors[s])
+        plan.append((s, descriptors[s], bits.get(s, 0), default_value, default_factory))
+    arg_slots = msg_mod.__slots__[1:]
+
+    def init_punch(self, *args, **kwds):
+        __doc__ = msg_mod.__init__.__doc__
+        # excepting when passing presence_. it is meant to be an internal field.
+        if presence_slot_name in kwds:
+            raise AttributeError("The field '{0}' is an internal field of {1} and should not be set by the user.".format(presence_slot_name, msg_mod._type))
+        if args:  # the args for super(msg_mod, self) are fixed to the slots in ros messages
+            # so we can change it to kwarg to be more accepting (and more robust for changes)
+            kwds.update(zip(arg_slots, args))
+
+        present = 0
+        for s, slot, bit, default_value, default_factory in plan:
+            value = kwds.pop(s, uninitialized)
+            if value is None and bit:
+                value = uninitialized  # None means not set, as for opt_as_array and opt_as_nested
+            if value is not uninitialized:
+                if isinstance(value, six.string_types):
+                    value = str(value)  # forcing str type (converting from unicode if needed)
+                slot.__set__(self, value)
+                present |= bit
+            elif default_factory is not None:
+                slot.__set__(self, default_factory())
+            else:
+                slot.__set__(self, default_value)
+        if kwds:
+            raise AttributeError("%s is not an attribute of %s" % (next(iter(kwds)), self.__class__.__name__))
+        presence.__set__(self, present)
+
+    deserialize = msg_mod.__dict__.get('_deserialize_punched', msg_mod.deserialize)
+    deserialize_numpy = msg_mod.__dict__.get('_deserialize_numpy_punched', msg_mod.deserialize_numpy)
+    setstate = msg_mod.__dict__.get('_setstate_punched', msg_mod.__setstate__)
+
+    # deserialization and unpickling assign all slots, setting all presence bits : we restore the received ones
+    def deserialize_punch(self, str):
+        deserialize(self, str)
+        presence.__set__(self, struct.unpack_from(presence_format, str, 0)[0])
+        return self
+
+    def deserialize_numpy_punch(self, str, numpy):
+        deserialize_numpy(self, str, numpy)
+        presence.__set__(self, struct.unpack_from(presence_format, str, 0)[0])
+        return self
+
+    def setstate_punch(self, state):
+        setstate(self, state)
+        presence.__set__(self, state[0])
+
+    # duck punching into genpy generated message classes, to set presence_ bits properly
+    msg_mod._deserialize_punched = deserialize
+    msg_mod._deserialize_numpy_punched = deserialize_numpy
+    msg_mod._setstate_punched = setstate
+    msg_mod.__init__ = init_punch
+    msg_mod.deserialize = deserialize_punch
+    msg_mod.deserialize_numpy = deserialize_numpy_punch
+    msg_mod.__setstate__ = setstate_punch
+
+    # Registering the list of optional field, and their presence bit
+    msg_mod._opt_slots = [s for s in msg_mod.__slots__ if s in bits]
+    msg_mod._presence_bits = bits
+
+    _punch_options[msg_mod] = opt_slot_list
+    profiling.punched(msg_mod)
+
+
+# message class -> opt_slot_list
+_punch_options = {}
+
+
+def _bit(msg, slot):
+    try:
+        return type(msg)._presence_bits[slot]
+    except AttributeError:
+        raise TypeError("{0} has not been duck punched by pyros_msgs.opt_as_bitmask".format(msg._type))
+    except KeyError:
+        raise AttributeError("{0} is not an optional field of {1}".format(slot, type(msg).__name__))
+
+
+def is_set(msg, slot):
+    """
+    Whether an optional field of a message is set.
+    :param msg: the message
+    :param slot: the name of the optional field
+    :return: True if the field is set, False otherwise
+    """
+    return bool(msg.presence_ & _bit(msg, slot))
+
+
+def set_slots(msg):
+    """
+    The optional fields of a message that are set.
+    :param msg: the message
+    :return: the list of names of the optional fields that are set
+    """
+    bits = type(msg)._presence_bits
+    return [s for s in type(msg)._opt_slots if msg.presence_ & bits[s]]
+
+
+def mark_set(msg, slot):
+    """
+    Mark an optional field of a message as set, ie. after modifying its value in place.
+    Assigning the field marks it as set already.
+    :param msg: the message
+    :param slot: the name of the optional field
+    """
+    msg.presence_ |= _bit(msg, slot)
+
+
+def unset(msg, slot):
+    """
+    Unset an optional field of a message, resetting it to its default value.
+    :param msg: the message
+    :param slot: the name of the optional field
+    """
+    bit = _bit(msg, slot)
+    msg_mod = type(msg)
+    default_value, default_factory = _default(dict(zip(msg_mod.__slots__, msg_mod._slot_types))[slot])
+    msg_mod._slot_descriptors[slot].__set__(msg, uninitialized if default_factory is not None else default_value)
+    msg.presence_ &= ~bit
@@ -7,54 +7,101 @@ pyros_msgs.opt_as_nested is a module that declares optional fields as a specific
 
 This is useful if you want to express an optional field in a message without any ambiguity.
 
-When importing this module, a set of ros messages will be imported, and duck punched to make default value a "non initialized value"
+When accessing a message type from this module, the ros message type will be imported, and duck punched to make default value a "non initialized value".
+This is done lazily, only for the message types actually used, the first time they are accessed.
+Optional message types for other data types, arrays or any message type, are synthesized at runtime by optional_of(),
+without any .msg file.
 """
 
-# Getting all msgs first (since our __file__ is set to ros generated __init__)
-
-try:
-    from pyros_msgs.msg import *
-
-except ImportError as ie:
-    # if pyros_msgs.msg not found, it s likely we are not interpreting this from devel/.
-    # importing our generated messages dynamically, using namespace packages (same as genpy generated __init__.py).
-    # Ref : http://stackoverflow.com/a/27586272/4006172
-    from pkgutil import extend_path
-    __path__ = extend_path(__path__, __name__)
-    # TODO : put this in pyros-setup, catkin_pip, pyros_utils, depending on what seems the better fit...
-    # Note that this requires sys.path to already be setup.
-    # It is a second step for ROS packages, after PYTHONPATH configuration...
-    from pyros_msgs.msg import *
-
-# Fixing out __file__ for proper python behavior
-import pyros_utils
-
-# Getting actual filepath (not ros generated init)
-# detecting and fixing ROS generated __init__.py behavior when importing this package
-
-ros_exec = pyros_utils.get_ros_executed_file()
-if ros_exec:
-    __file__ = ros_exec
-
-# Now we can import packages relatively
+import sys
+import threading
 
 from . import opt_as_nested
+from .opt_as_nested import duck_punch, build_many
+
+_setup_done = False
+_setup_lock = threading.Lock()
+
+
+def _setup():
+    """
+    Make our generated messages importable. This is done only once, the first time a message type is accessed.
+    """
+    global _setup_done, __path__, __file__
+    with _setup_lock:
+        if _setup_done:
+            return
+
+        # Getting all msgs first (since our __file__ is set to ros generated __init__)
+        try:
+            import pyros_msgs.msg
+
+        except ImportError as ie:
+            # if pyros_msgs.msg not found, it s likely we are not interpreting this from devel/.
+            # importing our generated messages dynamically, using namespace packages (same as genpy generated __init__.py).
+            # Ref : http://stackoverflow.com/a/27586272/4006172
+            from pkgutil import extend_path
+            __path__ = extend_path(__path__, __name__)
+            # TODO : put this in pyros-setup, catkin_pip, pyros_utils, depending on what seems the better fit...
+            # Note that this requires sys.path to already be setup.
+            # It is a second step for ROS packages, after PYTHONPATH configuration...
+            try:
+                import pyros_msgs.msg
+            except ImportError:
+                # no ROS workspace : generating our messages in-process, from our .msg files
+                from pyros_msgs import msg_loader
+                msg_loader.install()
+
+        # Fixing out __file__ for proper python behavior
+        try:
+            import pyros_utils
+        except ImportError:  # not in a ROS environment, nothing to fix
+            pyros_utils = None
+
+        # Getting actual filepath (not ros generated init)
+        # detecting and fixing ROS generated __init__.py behavior when importing this package
+
+        ros_exec = pyros_utils.get_ros_executed_file() if pyros_utils else None
+        if ros_exec:
+            __file__ = ros_exec
+
+        _setup_done = True
+
+
+def load(name):
+    """
+    Get an optional message type, importing and duck punching it if needed.
+    :param name: the name of the optional message type, ie. 'opt_int32'
+    :return: the duck punched message class
+    """
+    if name not in opt_as_nested.opt_types:
+        raise AttributeError("module {0!r} has no attribute {1!r}".format(__name__, name))
+    _setup()
+    msg_mod = opt_as_nested.load(name)
+    globals()[name] = msg_mod  # next access will not go through __getattr__
+    return msg_mod
+
+
+def optional_of(data_type, cache_dir=None, search_path=None):
+    """
+    Get the optional message type wrapping any data type, synthesizing it at runtime if we have no .msg file for it.
+    :param data_type: the ros type of the data field, ie. 'geometry_msgs/Pose', 'int32[]' or 'float64[3]'
+    :param cache_dir: the directory where the generated code is cached. Defaults to msg_loader.default_cache_dir()
+    :param search_path: a dict {package : [msg directories]} to find the data message type
+    :return: the duck punched message class, the same for each data type
+    """
+    _setup()
+    return opt_as_nested.optional_of(data_type, cache_dir, search_path)
+
+
+def __getattr__(name):
+    # Lazy access to our optional message types (python >= 3.7)
+    return load(name)
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
 
-opt_empty = opt_as_nested.opt_empty
-opt_bool = opt_as_nested.opt_bool
-opt_int8 = opt_as_nested.opt_int8
-opt_int16 = opt_as_nested.opt_int16
-opt_int32 = opt_as_nested.opt_int32
-opt_int64 = opt_as_nested.opt_int64
-opt_uint8 = opt_as_nested.opt_uint8
-opt_uint16 = opt_as_nested.opt_uint16
-opt_uint32 = opt_as_nested.opt_uint32
-opt_uint64 = opt_as_nested.opt_uint64
-opt_float32 = opt_as_nested.opt_float64
-opt_string = opt_as_nested.opt_string
-opt_time = opt_as_nested.opt_time
-opt_duration = opt_as_nested.opt_duration
-opt_header = opt_as_nested.opt_header
 
 __all__ = [
     'opt_empty',
@@ -68,4 +115,11 @@ __all__ = [
     'opt_time',
     'opt_duration',
     'opt_header',
-]
\ No newline at end of file
+
+    'optional_of',
+]
+
+if sys.version_info < (3, 7):
+    # no lazy module attributes before python 3.7, we load all message types now
+    for _name in opt_as_nested.opt_types:
+        load(_name)
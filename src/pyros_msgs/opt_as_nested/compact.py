@@ -0,0 +1,146 @@
+from __future__ import absolute_import
+from __future__ import print_function
+
+"""
+pyros_msgs.opt_as_nested.compact is a compact wire encoding for the optional message types, and the messages holding them.
+
+The ros encoding of an optional message always carries its data, even when the message is not initialized.
+The compact encoding writes only the initialized_ flag for a message that is not initialized,
+and exactly the ros encoding for a message that is initialized.
+Any message can be encoded : its optional message fields, at any depth and in arrays, are encoded that way,
+and all other fields as ros encodes them. A message without optional message fields is encoded as ros does.
+
+The encoding and decoding functions of a message type are generated once, as pyros_msgs.opt_as_array.serializers does.
+
+Other ros nodes do not understand this encoding for uninitialized messages :
+both ends of a connection need to explicitly opt in, by using these functions instead of serialize / deserialize.
+"""
+
+import struct
+
+import genpy
+
+from pyros_msgs.opt_as_array import serializers
+
+_uninitialized = struct.pack('<B', False)
+
+
+def _is_optional(msg_class):
+    # the bool initialized_ field is first in our optional message types, to be able to encode it alone
+    return 'initialized_' in msg_class.__slots__[:1]
+
+
+class _CompactGenerator(serializers._Generator):
+    """Generate the write and read functions of the compact encoding, optional messages not being flattened"""
+
+    def __init__(self):
+        super(_CompactGenerator, self).__init__()
+        self.namespace['_uninitialized'] = _uninitialized
+
+    def fields(self, msg_class, expr, prepare):
+        if _is_optional(msg_class):
+            return [(msg_class, expr, False)]  # encoded on its own, by optional()
+        return super(_CompactGenerator, self).fields(msg_class, expr, prepare)
+
+    def body(self, fields, indent):
+        write_lines, read_lines = [], []
+        plain = []
+        for field in fields + [None]:
+            if field is not None and not isinstance(field[0], type):
+                plain.append(field)
+                continue
+            write_plain, read_plain = super(_CompactGenerator, self).body(plain, indent)
+            write_lines += write_plain
+            read_lines += read_plain
+            plain = []
+            if field is not None:
+                write_optional, read_optional = self.optional(field[0], field[1], indent)
+                write_lines += write_optional
+                read_lines += read_optional
+        return write_lines, read_lines
+
+    def optional(self, msg_class, expr, indent):
+        """Generate the write and read lines of an optional message : its flag alone, or its ros encoding"""
+        prepare = []
+        write_lines, read_lines = self.body(super(_CompactGenerator, self).fields(msg_class, expr, prepare), indent + '    ')
+        return [
+            indent + 'if {0}.initialized_:'.format(expr),
+        ] + write_lines + [
+            indent + 'else:',
+            indent + '    parts.append(_uninitialized)',
+        ], [
+            indent + 'if buf[offset:offset + 1] != _uninitialized:',
+        ] + [indent + '    ' + line for line in prepare] + read_lines + [
+            indent + 'else:',
+            indent + '    {0}.__init__()'.format(expr),
+            indent + '    offset += 1',
+        ]
+
+
+# message class -> (write, read)
+_codecs = {}
+
+
+def _get_codec(msg_class):
+    try:
+        return _codecs[msg_class]
+    except KeyError:
+        pass
+    generator = _CompactGenerator()
+    source = generator.generate(msg_class)
+    exec(compile(source, '<{0} compact encoding>'.format(msg_class._type), 'exec'), generator.namespace)
+    _codecs[msg_class] = generator.namespace['write'], generator.namespace['read']
+    return _codecs[msg_class]
+
+
+def serialize(msg, buff):
+    """
+    Serialize a message into buffer, with the compact encoding
+    :param msg: the message
+    :param buff: buffer, ``StringIO``
+    """
+    write, _ = _get_codec(type(msg))
+    parts = []
+    try:
+        write(msg, parts)
+    except struct.error as se:
+        msg._check_types(struct.error("%s: '%s' when writing '%s'" % (type(se), str(se), str(msg))))
+    except TypeError as te:
+        msg._check_types(ValueError("%s: '%s' when writing '%s'" % (type(te), str(te), str(msg))))
+    buff.write(b''.join(parts))
+
+
+def read(msg_class, str, offset=0):
+    """
+    Deserialize a message encoded with the compact encoding, at an offset in a buffer
+    :param msg_class: the message type
+    :param str: byte array holding the serialized message, ``str``
+    :param offset: the position of the message in the buffer
+    :return: a tuple (message, the position right after the message), to read what follows it
+    """
+    _, read_msg = _get_codec(msg_class)
+    msg = msg_class()
+    try:
+        end = read_msg(str, offset, msg)
+    except struct.error as e:
+        raise genpy.DeserializationError(e)  # most likely buffer underfill
+    if end > len(str):
+        raise genpy.DeserializationError("buffer underfill : the message ends at {0}, after the end of the buffer at {1}".format(end, len(str)))
+    return msg, end
+
+
+def deserialize(msg_class, str):
+    """
+    Deserialize a message, encoded with the compact encoding
+    :param msg_class: the message type
+    :param str: byte array of the serialized message, ``str``
+    :return: the message
+    """
+    return read(msg_class, str)[0]
+
+
+__all__ = [
+    'serialize',
+    'deserialize',
+    'read',
+]
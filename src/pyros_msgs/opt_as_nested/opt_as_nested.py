@@ -5,33 +5,82 @@ from __future__ import print_function
 
 
 import collections
+import importlib
+import math
+import threading
 
-from pyros_msgs.msg import (
-    # no slot
-    # None
+from pyros_msgs import ros_python_default_mapping, ros_python_range_mapping
+from pyros_msgs import profiling
+from pyros_msgs import registry
 
-    # data slot
-    opt_empty,
 
-    opt_bool,
-    opt_int8, opt_int16, opt_int32, opt_int64,
-    opt_uint8, opt_uint16, opt_uint32, opt_uint64,
-    opt_float32, opt_float64,
-    opt_string,
+class _Uninitialized(object):
+    """The type of the sentinel stored in the data slot, until a default value is needed"""
+    __slots__ = ()
 
-    opt_time,
-    opt_duration,
-    opt_header,
+    def __repr__(self):
+        return 'uninitialized'
 
-    # multiple slots
-    # None
-)
 
-import genpy
-import std_msgs.msg
+uninitialized = _Uninitialized()
+
+
+def _lazy_data(data_slot, default_data_factory):
+    """
+    Build a property wrapping the data slot of an optional message type.
+    When the slot holds the uninitialized sentinel, a fresh default value is built on first read.
+    :param data_slot: the slot descriptor generated for the data field
+    :param default_data_factory: a callable returning a fresh default value
+    :return: the property to set as data on the message class
+    """
+    def get_data(self):
+        data = data_slot.__get__(self)
+        if data is uninitialized:
+            data = default_data_factory()
+            data_slot.__set__(self, data)
+        return data
+
+    def set_data(self, data):
+        data_slot.__set__(self, data)
+
+    return property(get_data, set_data, doc="data, built from its default value on first read if not initialized")
+
 
+def duck_punch(msg_mod, default_data_value=None, strict=False, default_data_factory=None):
+    """
+    Duck punch / monkey patch msg_mod, to set the initialized_ field depending on the data passed on construction.
+    :param msg_mod: the optional message type
+    :param default_data_value: the value of the data field when it is not initialized
+    :param strict: if True, numbers out of the range of the data type are rejected on construction,
+    instead of failing later on serialization.
+    :param default_data_factory: a callable returning the value of the data field when it is not initialized.
+    Use it instead of default_data_value for mutable values, that should not be shared between messages.
+    Nothing is built on construction, the factory is called only when the data field is read.
+    :return:
+    """
+    # doing nothing if already duck punched the same way, and safe from other threads
+    registry.patch(msg_mod, 'opt_as_nested', _duck_punch,
+                   default_data_value=default_data_value, strict=strict, default_data_factory=default_data_factory)
+
+
+def _duck_punch(msg_mod, default_data_value, strict, default_data_factory):
+    data_type = dict(zip(msg_mod.__slots__, msg_mod._slot_types)).get('data')
+    if strict and data_type in ros_python_range_mapping:
+        data_min, data_max = ros_python_range_mapping.get(data_type)
+    else:
+        data_min = data_max = None
+    data_is_float = data_type in ('float32', 'float64')
+
+    if data_type is not None:
+        # keeping the genpy generated slot descriptor around, in case we duck punch again
+        if '_data_slot' not in msg_mod.__dict__:
+            msg_mod._data_slot = msg_mod.__dict__['data']
+        if default_data_factory is not None:
+            default_data_value = uninitialized
+            msg_mod.data = _lazy_data(msg_mod._data_slot, default_data_factory)
+        else:
+            msg_mod.data = msg_mod._data_slot
 
-def duck_punch(msg_mod, default_data_value=None):
     def init_punch(self, *args, **kwds):
         __doc__ = msg_mod.__init__.__doc__
         # excepting when passing initialized_. it is meant to be an internal field.
@@ -55,6 +104,10 @@ def duck_punch(msg_mod, default_data_value=None):
                 self.initialized_ = False
             else:
                 self.initialized_ = True
+                if data_min is not None and (self.data < data_min or self.data > data_max):
+                    # infinity is out of range for floats but can still be packed
+                    if not data_is_float or not math.isinf(self.data):
+                        raise TypeError("value '{0}' is out of range for type {1}".format(self.data, data_type))
         else:
             self.initialized_ = False
             if 'data' in self.__slots__:
@@ -63,27 +116,240 @@ def duck_punch(msg_mod, default_data_value=None):
     # duck punching into genpy generated message classes, to set initialized_ field properly
     msg_mod.__init__ = init_punch
 
+    # Remembering how we duck punched, to build batches of messages the same way
+    _punch_options[msg_mod] = (data_type, default_data_value, strict)
+    profiling.punched(msg_mod)
+
+
+# message class -> (data_type, default_data_value, strict)
+_punch_options = {}
+
+
+def _validate_data_column(column, data_type, strict):
+    """
+    Validate a column of data values, once for all messages. None means the message is not initialized.
+    A column of numbers held in bulk (array.array, numpy array, etc.) is validated at once.
+    """
+    from pyros_msgs import bulk  # importing numpy, only when building messages in bulk
+
+    bulk_types = bulk.bulk_types(data_type)
+    if bulk_types and isinstance(column, bulk_types):
+        column = bulk.make_bulk_validator(data_type)(column)
+        return list(bytearray(column)) if isinstance(column, (bytes, bytearray)) else column.tolist()
+    if data_type == 'string':
+        # special case for string type(to support unicode)
+        return [str(v) if v is not None else None for v in column]
+    if strict and data_type in ros_python_range_mapping:
+        bulk.make_range_validator(data_type)([v for v in column if v is not None])
+    return column
+
+
+def _build(msg_mod, column, default_data_value):
+    new = msg_mod.__new__
+    for v in column:
+        msg = new(msg_mod)
+        if v is None:
+            msg.initialized_ = False
+            msg.data = default_data_value
+        else:
+            msg.initialized_ = True
+            msg.data = v
+        yield msg
+
+
+def build_many(msg_mod, columns, lazy=False):
+    """
+    Build many optional messages at once, from a column of data values.
+    The column is validated once for all messages, and the messages are built without going through the constructor.
+    The message class must have been duck punched first.
+    :param msg_mod: the duck punched optional message type
+    :param columns: a dict {'data': sequence of values, one per message}.
+    A None value means the message is not initialized.
+    :param lazy: if True, return a generator building the messages when iterated on, instead of a list
+    :return: a list, or a generator, of messages
+    """
+    if msg_mod not in _punch_options:
+        raise TypeError("{0} has not been duck punched by pyros_msgs.opt_as_nested".format(msg_mod._type))
+    if 'initialized_' in columns:
+        raise AttributeError("The field 'initialized_' is an internal field of {0} and should not be set by the user.".format(msg_mod._type))
+    for k in columns:
+        if k != 'data':
+            raise AttributeError("%s is not an attribute of %s" % (k, msg_mod.__name__))
+    if not columns:
+        raise ValueError("the data column is needed to build messages")
+
+    data_type, default_data_value, strict = _punch_options[msg_mod]
+    column = _validate_data_column(columns['data'], data_type, strict)
+    messages = _build(msg_mod, column, default_data_value)
+    return messages if lazy else list(messages)
+
+
+# our optional message types, generated from msg/opt_as_nested
+opt_types = (
+    'opt_empty',
+
+    'opt_bool',
+    'opt_int8', 'opt_int16', 'opt_int32', 'opt_int64',
+    'opt_uint8', 'opt_uint16', 'opt_uint32', 'opt_uint64',
+    'opt_float32', 'opt_float64',
+    'opt_string',
+
+    'opt_time',
+    'opt_duration',
+    'opt_header',
+)
 
 #
 # default data values extracted from genpy.generator:default_value()
 #
 
-for msg_int_mod in [
-    opt_int8, opt_int16, opt_int32, opt_int64,
-    opt_uint8, opt_uint16, opt_uint32, opt_uint64,
-]:
-    duck_punch(msg_int_mod, 0)
+default_data_values = {
+    'opt_int8': 0, 'opt_int16': 0, 'opt_int32': 0, 'opt_int64': 0,
+    'opt_uint8': 0, 'opt_uint16': 0, 'opt_uint32': 0, 'opt_uint64': 0,
+    'opt_float32': 0., 'opt_float64': 0.,
+    'opt_string': '',
+    'opt_bool': False,
+    'opt_empty': None,  # default value should be unused here
+}
+
+
+def _default_data_factory(name):
+    """
+    Get the factory for mutable default data values of an optional message type, or None.
+    genpy and std_msgs are already imported with our generated messages when we get here.
+    """
+    import genpy
+    import std_msgs.msg
+
+    return {
+        'opt_time': genpy.Time,
+        'opt_duration': genpy.Duration,
+        'opt_header': std_msgs.msg.Header,
+    }.get(name)
+
+
+_loaded = {}
+_load_lock = threading.Lock()
+
+
+def load(name):
+    """
+    Import an optional message type from our generated messages, and duck punch it.
+    This is done only once, the first time the message type is needed.
+    :param name: the name of the optional message type, ie. 'opt_int32'
+    :return: the duck punched message class
+    """
+    try:
+        return _loaded[name]
+    except KeyError:
+        pass
+    with _load_lock:
+        if name not in _loaded:
+            msg_mod = getattr(importlib.import_module('pyros_msgs.msg'), name)
+            duck_punch(msg_mod, default_data_values.get(name), default_data_factory=_default_data_factory(name))
+            _loaded[name] = msg_mod
+    return _loaded[name]
+
+
+# data types of our generated optional message types, not named after their data type
+_opt_type_names = {
+    'Header': 'opt_header',
+    'std_msgs/Header': 'opt_header',
+    'std_msgs/Empty': 'opt_empty',
+}
+
+
+def opt_type_name(data_type):
+    """
+    The name of the optional message type wrapping a data type.
+    Names are valid ros message names : 'std_msgs/Header' -> 'opt_std_msgs_Header', 'int32[]' -> 'opt_int32_array',
+    'float64[3]' -> 'opt_float64_array3'. Data types of our generated optional message types get their names.
+    :param data_type: the ros type of the data field
+    :return: the name of the optional message type
+    """
+    if data_type in _opt_type_names:
+        return _opt_type_names[data_type]
+    name = 'opt_' + data_type.replace('/', '_').replace('[', '_array').replace(']', '')
+    if not name.replace('_', '').isalnum():
+        raise ValueError("invalid data type {0!r} for an optional message type".format(data_type))
+    return name
+
+
+class _DefaultData(object):
+    """
+    The factory of default data values for a data type, as opt_as_bitmask finds them.
+    It is picklable, so that registry snapshots of the classes duck punched with it can be sent to worker processes.
+    """
+
+    def __init__(self, data_type):
+        from pyros_msgs.opt_as_bitmask.opt_as_bitmask import _default
+        self.data_type = data_type
+        self._factory = _default(data_type)[1]
+
+    def __call__(self):
+        return self._factory()
+
+    def __reduce__(self):
+        return _DefaultData, (self.data_type,)
+
+    def __eq__(self, other):
+        return isinstance(other, _DefaultData) and other.data_type == self.data_type
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(self.data_type)
+
+
+# data type -> optional message class
+_optionals = {}
+
 
-for msg_float_mod in [
-    opt_float32, opt_float64,
-]:
-    duck_punch(msg_float_mod, 0.)
+def optional_of(data_type, cache_dir=None, search_path=None):
+    """
+    Get the optional message type wrapping any data type, synthesizing it if needed, and duck punch it.
+    The message definition is "bool initialized_" and the data field, as in our .msg files :
+    genpy generates the message class at runtime, with its md5sum and full definition, and the code is cached on disk.
+    Our generated optional message types are used for their data types, ie. 'int32' gets opt_int32.
+    This is done only once per data type, and the message class is registered in the typecache under its ros type.
+    Worker processes not forked from this one should call it again, before restoring a registry snapshot.
+    :param data_type: the ros type of the data field, ie. 'geometry_msgs/Pose', 'int32[]' or 'float64[3]'
+    :param cache_dir: the directory where the generated code is cached. Defaults to msg_loader.default_cache_dir()
+    :param search_path: a dict {package : [msg directories]} to find the data message type.
+    It defaults to its generated python class, that should be importable.
+    :return: the duck punched message class
+    """
+    try:
+        return _optionals[data_type]
+    except KeyError:
+        pass
+    name = opt_type_name(data_type)
+    bare_type = data_type.split('[')[0]
+    if '/' not in bare_type and bare_type not in ros_python_default_mapping and bare_type != 'Header':
+        raise ValueError("{0!r} is neither a primitive type nor a message type qualified by its package, ie. 'std_msgs/Header'".format(bare_type))
+    if name in opt_types:
+        return _optionals.setdefault(data_type, load(name))
 
-duck_punch(opt_string, '')
-duck_punch(opt_bool, False)
-duck_punch(opt_empty)  # default value should be unused here
+    from pyros_msgs import msg_loader
+    from pyros_msgs import typecache
+    from pyros_msgs.opt_as_bitmask.opt_as_bitmask import _default
+    with _load_lock:
+        if data_type not in _optionals:
+            msg_mod = msg_loader.load_message_from_string(
+                'bool initialized_\n{0} data\n'.format(data_type), name, cache_dir, search_path
+            )
+            default_data_value, default_data_factory = _default(msg_mod._slot_types[1])
+            if default_data_factory is not None:
+                default_data_factory = _DefaultData(msg_mod._slot_types[1])
+            duck_punch(msg_mod, default_data_value, default_data_factory=default_data_factory)
+            typecache.message_classes[msg_mod._type] = msg_mod
+            _optionals[data_type] = msg_mod
+    return _optionals[data_type]
 
-duck_punch(opt_time, genpy.Time())
-duck_punch(opt_duration, genpy.Duration())
-duck_punch(opt_header, std_msgs.msg.Header())
 
+def __getattr__(name):
+    # Lazy access to our optional message types from this module (python >= 3.7)
+    if name in opt_types:
+        return load(name)
+    raise AttributeError("module {0!r} has no attribute {1!r}".format(__name__, name))
@@ -0,0 +1,109 @@
+from __future__ import absolute_import
+from __future__ import print_function
+
+"""
+pyros_msgs.parallel converts and serializes large batches of dicts into messages, in a pool of worker processes.
+
+The dicts are sharded in chunks. Each worker duck punches the message classes as in this process,
+from a registry snapshot, converts its chunk with pyros_msgs.convert, and serializes it with pyros_msgs.batch :
+it returns one buffer of serialized messages, cheaper to send back than pickled messages.
+The buffers are reassembled in order, into one buffer with its offsets table, as batch.serialize_many() returns.
+
+Only a few chunks are in flight at a time, so the dicts can come from a generator reading a large dataset.
+On python 2, this needs the futures backport of concurrent.futures.
+"""
+
+import collections
+import itertools
+import multiprocessing
+
+try:
+    import concurrent.futures
+except ImportError:  # python 2 without the futures backport
+    concurrent = None
+
+from pyros_msgs import batch
+from pyros_msgs import convert
+from pyros_msgs import registry
+from pyros_msgs.convert import RAISE, SKIP, COLLECT
+
+
+def _convert_chunk(patches, msg_type, start, dicts, on_error):
+    """
+    Convert and serialize a chunk of dicts, in a worker process.
+    :return: a tuple (serialized messages, offsets, errors), errors being (index, dict, error) tuples, index in the whole batch
+    """
+    # duck punching as in the parent process. Nothing to do once done, or if inherited by fork.
+    registry.restore(patches)
+    errors = []
+    msgs = list(convert.from_dicts(msg_type, dicts, on_error=on_error, errors=errors))
+    buf, offsets = batch.serialize_many(msgs)
+    return bytes(buf), offsets, [(start + i, values, e) for i, values, e in errors]
+
+
+def _chunks(dicts, chunk_size):
+    """Split an iterable of dicts into lists of chunk_size dicts, with the index of their first dict"""
+    dicts = iter(dicts)
+    start = 0
+    while True:
+        chunk = list(itertools.islice(dicts, chunk_size))
+        if not chunk:
+            return
+        yield start, chunk
+        start += len(chunk)
+
+
+def convert_serialize(msg_type, dicts, workers=None, chunk_size=10000, on_error=RAISE, errors=None, executor=None):
+    """
+    Convert dicts into messages and serialize them, in parallel in worker processes.
+    :param msg_type: the message class, or the ros message type, ie. 'std_msgs/Header'
+    :param dicts: an iterable of dicts
+    :param workers: the number of worker processes. Defaults to the number of cpus.
+    :param chunk_size: the number of dicts converted at once by a worker
+    :param on_error: what to do when a dict cannot be converted, as for convert.from_dicts() :
+    RAISE the error (default), SKIP the dict, or COLLECT the error in errors and skip the dict
+    :param errors: the list where (index, dict, error) tuples are appended, when on_error is COLLECT
+    :param executor: a concurrent.futures executor to use, instead of starting a process pool for this batch only
+    :return: a tuple (buf, offsets) with buf a bytearray holding the serialized messages, in the order of the dicts,
+    and offsets an array.array of positions : message i is buf[offsets[i]:offsets[i + 1]]
+    """
+    if on_error not in (RAISE, SKIP, COLLECT):
+        raise ValueError("on_error should be one of {0}, not {1!r}".format((RAISE, SKIP, COLLECT), on_error))
+    if on_error == COLLECT and errors is None:
+        raise ValueError("errors should be a list, to collect errors")
+    if executor is None and concurrent is None:
+        raise ImportError("concurrent.futures is needed for parallel conversion. On python 2, install the futures package.")
+
+    msg_type = convert.resolve(msg_type)._type  # workers resolve it again
+    workers = workers or multiprocessing.cpu_count()
+    patches = registry.snapshot()
+
+    own_executor = executor is None
+    if own_executor:
+        executor = concurrent.futures.ProcessPoolExecutor(max_workers=workers)
+    buf, offsets = batch.serialize_many([])
+    try:
+        pending = collections.deque()
+        chunks = _chunks(dicts, chunk_size)
+        while True:
+            # a few chunks in flight per worker, the rest of the dicts are not read yet
+            for start, chunk in itertools.islice(chunks, 2 * workers - len(pending)):
+                pending.append(executor.submit(_convert_chunk, patches, msg_type, start, chunk, on_error))
+            if not pending:
+                break
+            chunk_buf, chunk_offsets, chunk_errors = pending.popleft().result()
+            base = len(buf)
+            buf.extend(chunk_buf)
+            offsets.extend(base + offset for offset in chunk_offsets[1:])
+            if errors is not None:
+                errors.extend(chunk_errors)
+    finally:
+        if own_executor:
+            executor.shutdown(wait=True)
+    return buf, offsets
+
+
+__all__ = [
+    'convert_serialize',
+    'RAISE', 'SKIP', 'COLLECT',
+]
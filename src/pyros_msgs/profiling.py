@@ -0,0 +1,182 @@
+from __future__ import absolute_import
+from __future__ import print_function
+
+"""
+pyros_msgs.profiling counts what the duck punched constructors do, per message type.
+
+For each message type we count constructions, validation failures, fields filled with their default value,
+the cumulative time spent in the constructor, and an histogram of the construction times.
+
+Profiling is disabled by default, and costs nothing then : the duck punched constructors are used as they are.
+When enabled, the constructors of duck punched message types (from opt_as_array, opt_as_nested and opt_as_bitmask)
+are wrapped, including the ones duck punched later.
+"""
+
+import sys
+import threading
+import timeit
+
+enabled = False
+
+# the modules where message types are duck punched, with their registry of duck punched message types
+_punch_modules = (
+    'pyros_msgs.opt_as_array.opt_as_array',
+    'pyros_msgs.opt_as_nested.opt_as_nested',
+    'pyros_msgs.opt_as_bitmask.opt_as_bitmask',
+)
+
+# fields set internally, not by the user
+_internal_slots = ('initialized_', 'presence_')
+
+_lock = threading.Lock()
+
+
+class Stats(object):
+    """
+    The counters of a message type
+    """
+    __slots__ = ('constructions', 'failures', 'default_fills', 'total_time', 'histogram')
+
+    def __init__(self):
+        self.constructions = 0
+        self.failures = 0
+        self.default_fills = 0
+        self.total_time = 0.
+        # upper bound of construction time, in nanoseconds (powers of 2) -> number of constructions
+        self.histogram = {}
+
+    def record(self, duration, default_fills=0, failed=False):
+        bucket = 1 << int(duration * 1e9).bit_length()
+        with _lock:
+            self.constructions += 1
+            self.total_time += duration
+            self.histogram[bucket] = self.histogram.get(bucket, 0) + 1
+            if failed:
+                self.failures += 1
+            else:
+                self.default_fills += default_fills
+
+    def as_dict(self):
+        return {
+            'constructions': self.constructions,
+            'failures': self.failures,
+            'default_fills': self.default_fills,
+            'total_time': self.total_time,
+            'histogram': dict((str(b), c) for b, c in sorted(self.histogram.items())),
+        }
+
+
+# message type -> Stats
+_stats = {}
+
+
+def _instrument(msg_mod):
+    """Wrap the constructor of a duck punched message type, to record its stats"""
+    init = msg_mod.__dict__['__init__']
+    if hasattr(init, '_profiled_init'):
+        return
+    stats = _stats.setdefault(msg_mod._type, Stats())
+    slot_count = len([s for s in msg_mod.__slots__ if s not in _internal_slots])
+    timer = timeit.default_timer
+
+    def init_profiled(self, *args, **kwds):
+        start = timer()
+        try:
+            init(self, *args, **kwds)
+        except Exception:
+            stats.record(timer() - start, failed=True)
+            raise
+        duration = timer() - start
+        stats.record(duration, slot_count - len(args) - sum(1 for v in kwds.values() if v is not None))
+
+    init_profiled.__doc__ = init.__doc__
+    init_profiled._profiled_init = init
+    msg_mod.__init__ = init_profiled
+
+
+def _uninstrument(msg_mod):
+    """Restore the constructor of a duck punched message type"""
+    init = msg_mod.__dict__['__init__']
+    if hasattr(init, '_profiled_init'):
+        msg_mod.__init__ = init._profiled_init
+
+
+def _punched_types():
+    """The message types duck punched so far, from the punch modules already imported"""
+    for module_name in _punch_modules:
+        module = sys.modules.get(module_name)
+        if module is not None:
+            for msg_mod in list(module._punch_options):
+                yield msg_mod
+
+
+def punched(msg_mod):
+    """
+    Called by duck_punch functions, once a message type is duck punched, to profile it if enabled.
+    :param msg_mod: the duck punched message type
+    """
+    if enabled:
+        _instrument(msg_mod)
+
+
+def enable():
+    """Enable profiling of all duck punched message types"""
+    global enabled
+    enabled = True
+    for msg_mod in _punched_types():
+        _instrument(msg_mod)
+
+
+def disable():
+    """Disable profiling, restoring the duck punched constructors. Stats are kept."""
+    global enabled
+    enabled = False
+    for msg_mod in _punched_types():
+        _uninstrument(msg_mod)
+
+
+def reset():
+    """Reset all stats"""
+    with _lock:
+        _stats.clear()
+    # constructors already wrapped keep recording into their Stats : we give them new ones
+    if enabled:
+        for msg_mod in _punched_types():
+            _uninstrument(msg_mod)
+            _instrument(msg_mod)
+
+
+def stats(msg_type=None):
+    """
+    Get the stats recorded so far.
+    :param msg_type: the ros message type, ie. 'pyros_msgs/opt_int32', or None for all message types
+    :return: a dict with constructions, failures, default_fills, total_time (in seconds)
+    and histogram {upper bound of construction time in nanoseconds : number of constructions}.
+    Without msg_type, a dict {message type: stats}
+    """
+    if msg_type is not None:
+        return _stats[msg_type].as_dict() if msg_type in _stats else Stats().as_dict()
+    return dict((t, s.as_dict()) for t, s in _stats.items())
+
+
+def dump(fp=None):
+    """
+    Dump the stats of all message types as JSON.
+    :param fp: a file object to write to, or None
+    :return: the JSON string
+    """
+    import json  # not imported with the duck punching modules, for their import time
+
+    dumped = json.dumps(stats(), sort_keys=True, indent=2)
+    if fp is not None:
+        fp.write(dumped)
+    return dumped
+
+
+__all__ = [
+    'enable',
+    'disable',
+    'reset',
+    'stats',
+    'dump',
+]
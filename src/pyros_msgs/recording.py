@@ -0,0 +1,286 @@
+from __future__ import absolute_import
+from __future__ import print_function
+
+"""
+pyros_msgs.recording records messages with optional fields in an append-only file, and reads them back memory mapped.
+
+Each record holds a serialized message, after the presence bits of its optional fields :
+opt_as_array fields not empty, opt_as_nested fields initialized, and opt_as_bitmask fields with their presence bit.
+The reader indexes records by scanning only their headers, so that finding the records where some fields are set
+does not deserialize any message.
+
+File layout, little endian :
+- 'PYROSREC', the format version (uint32), then the message type, its md5sum, and the names of its optional fields,
+  as genpy serializes a string and a string[].
+- records, each one being the presence bits (uint64, bit i for the i-th optional field),
+  the length of the serialized message (uint32), and the serialized message.
+
+A record being written while the file is read is ignored, until it is complete and the reader refreshed.
+"""
+
+import mmap
+import os
+import struct
+from io import BytesIO
+
+from pyros_msgs import typecache
+
+magic = b'PYROSREC'
+version = 1
+
+_struct_I = struct.Struct('<I')
+_record_header = struct.Struct('<QI')
+
+
+def _is_optional(msg_class):
+    """Whether a message class is an optional message type from opt_as_nested"""
+    return 'initialized_' in msg_class.__slots__
+
+
+def optional_fields(msg_class):
+    """
+    The optional fields of a message class, and how to tell whether they are set.
+    :param msg_class: the message class
+    :return: a list of (field name, function taking a message and returning whether the field is set)
+    """
+    presence_bits = getattr(msg_class, '_presence_bits', None)
+    opt_slots = getattr(msg_class, '_opt_slots', ())
+    fields = []
+    for s, st in zip(msg_class.__slots__, msg_class._slot_types):
+        if s in ('initialized_', 'presence_'):
+            continue  # internal fields
+        elif s == 'data' and _is_optional(msg_class):
+            fields.append((s, lambda msg: msg.initialized_))
+        elif presence_bits is not None and s in presence_bits:
+            fields.append((s, (lambda bit: lambda msg: msg.presence_ & bit)(presence_bits[s])))
+        elif s in opt_slots:
+            fields.append((s, (lambda s: lambda msg: len(getattr(msg, s)) > 0)(s)))
+        elif '/' in st and '[' not in st:
+            field_class = typecache.get_message_class(st)
+            if field_class is not None and _is_optional(field_class):
+                fields.append((s, (lambda s: lambda msg: getattr(msg, s).initialized_)(s)))
+    if len(fields) > 64:
+        raise TypeError("{0} has more than 64 optional fields, the presence bits of a record".format(msg_class._type))
+    return fields
+
+
+def _pack_string(value):
+    value = value.encode('utf-8')
+    return _struct_I.pack(len(value)) + value
+
+
+def _unpack_string(buf, offset):
+    length = _struct_I.unpack_from(buf, offset)[0]
+    offset += 4
+    return buf[offset:offset + length].decode('utf-8'), offset + length
+
+
+def _file_header(msg_class, field_names):
+    return b''.join(
+        [magic, _struct_I.pack(version), _pack_string(msg_class._type), _pack_string(msg_class._md5sum), _struct_I.pack(len(field_names))] +
+        [_pack_string(name) for name in field_names]
+    )
+
+
+def _read_file_header(buf):
+    """
+    Read the header of a recording.
+    :return: a tuple (message type, md5sum, optional field names, offset of the first record)
+    """
+    if buf[:len(magic)] != magic:
+        raise ValueError("not a pyros_msgs recording")
+    offset = len(magic)
+    file_version = _struct_I.unpack_from(buf, offset)[0]
+    if file_version != version:
+        raise ValueError("unsupported recording version {0}".format(file_version))
+    msg_type, offset = _unpack_string(buf, offset + 4)
+    md5sum, offset = _unpack_string(buf, offset)
+    count = _struct_I.unpack_from(buf, offset)[0]
+    offset += 4
+    field_names = []
+    for _ in range(count):
+        name, offset = _unpack_string(buf, offset)
+        field_names.append(name)
+    return msg_type, md5sum, field_names, offset
+
+
+class Recorder(object):
+    """
+    Append messages of one type to a recording file.
+    Appending to an existing recording requires the same message type, with the same optional fields.
+    """
+
+    def __init__(self, path, msg_class):
+        """
+        :param path: the path of the recording file, created if needed
+        :param msg_class: the message class, already duck punched if it has optional fields
+        """
+        self.msg_class = msg_class
+        self._fields = optional_fields(msg_class)
+        self.field_names = [name for name, _ in self._fields]
+        header = _file_header(msg_class, self.field_names)
+        self._file = open(path, 'ab')
+        if self._file.tell() == 0:
+            self._file.write(header)
+            self._file.flush()
+        else:
+            with open(path, 'rb') as f:
+                existing = f.read(len(header))
+            if existing != header:
+                self._file.close()
+                raise ValueError("{0} is a recording of other messages than {1}, or with other optional fields".format(path, msg_class._type))
+
+    def presence(self, msg):
+        """
+        The presence bits of a message, bit i being set when the i-th optional field is set.
+        :param msg: the message
+        :return: the presence bits, as an integer
+        """
+        bits = 0
+        for i, (_, is_set) in enumerate(self._fields):
+            if is_set(msg):
+                bits |= 1 << i
+        return bits
+
+    def write(self, msg):
+        """
+        Append a message to the recording.
+        :param msg: the message, of the recorder message class
+        """
+        if type(msg) is not self.msg_class:
+            raise TypeError("cannot record a {0} in a recording of {1}".format(type(msg).__name__, self.msg_class._type))
+        buff = BytesIO()
+        msg.serialize(buff)
+        data = buff.getvalue()
+        # one write per record, so that readers never see a record header without its message
+        self._file.write(_record_header.pack(self.presence(msg), len(data)) + data)
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class Reader(object):
+    """
+    Read a recording, memory mapped, with an index of records and their presence bits.
+    """
+
+    def __init__(self, path, msg_class=None):
+        """
+        :param path: the path of the recording file
+        :param msg_class: the message class to deserialize records with. Found from the message type by default.
+        """
+        self.path = path
+        self._file = open(path, 'rb')
+        self._map = None
+        self._offsets = []
+        self._presences = []
+        self._end = 0
+        self.refresh()
+        self.msg_type, md5sum, self.field_names, self._end = _read_file_header(self._map)
+        self._bits = dict((name, 1 << i) for i, name in enumerate(self.field_names))
+        if msg_class is None:
+            msg_class = typecache.get_message_class(self.msg_type)
+            if msg_class is None:
+                raise TypeError("message class for '{0}' not found".format(self.msg_type))
+        if msg_class._md5sum != md5sum:
+            raise TypeError("{0} has changed since it was recorded, its md5sum is not {1}".format(msg_class._type, md5sum))
+        self.msg_class = msg_class
+        self._index(len(self._map))
+
+    def refresh(self):
+        """Map the file again, and index the records appended since, ie. while a recorder is still writing"""
+        size = os.fstat(self._file.fileno()).st_size
+        if self._map is None or size != len(self._map):
+            # the previous map is closed when no view from raw() uses it anymore
+            self._map = mmap.mmap(self._file.fileno(), size, access=mmap.ACCESS_READ)
+        if self._end:  # the file header is read already
+            self._index(size)
+
+    def _index(self, size):
+        offset = self._end
+        while offset + _record_header.size <= size:
+            presence, length = _record_header.unpack_from(self._map, offset)
+            start = offset + _record_header.size
+            if start + length > size:
+                break  # record being written
+            self._offsets.append(start)
+            self._presences.append(presence)
+            offset = start + length
+        self._end = offset
+
+    def __len__(self):
+        return len(self._offsets)
+
+    def raw(self, index):
+        """
+        The serialized message of a record, without copying it.
+        The view must be released before closing the reader.
+        :param index: the index of the record
+        :return: a memoryview over the mapped file
+        """
+        start = self._offsets[index]
+        length = _record_header.unpack_from(self._map, start - _record_header.size)[1]
+        return memoryview(self._map)[start:start + length]
+
+    def __getitem__(self, index):
+        """Deserialize the message of a record"""
+        return self.msg_class().deserialize(self.raw(index).tobytes())
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def presence(self, index):
+        """
+        The optional fields set in the message of a record.
+        :param index: the index of the record
+        :return: the list of names of the optional fields that are set
+        """
+        bits = self._presences[index]
+        return [name for i, name in enumerate(self.field_names) if bits & (1 << i)]
+
+    def _mask(self, fields):
+        try:
+            mask = 0
+            for name in fields:
+                mask |= self._bits[name]
+            return mask
+        except KeyError as e:
+            raise AttributeError("{0} is not an optional field of {1}".format(e.args[0], self.msg_type))
+
+    def where(self, present=(), absent=()):
+        """
+        Find the records where some optional fields are set, and others are not, from the index only.
+        :param present: the names of the optional fields that must be set
+        :param absent: the names of the optional fields that must not be set
+        :return: the list of indexes of the matching records
+        """
+        expected = self._mask(present)
+        mask = expected | self._mask(absent)
+        return [index for index, bits in enumerate(self._presences) if bits & mask == expected]
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+__all__ = [
+    'optional_fields',
+    'Recorder',
+    'Reader',
+]
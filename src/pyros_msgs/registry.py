@@ -0,0 +1,152 @@
+from __future__ import absolute_import
+from __future__ import print_function
+
+"""
+pyros_msgs.registry records which message classes are duck punched, by which pattern, with which options.
+
+Duck punching goes through the registry, under a lock : it is safe from several threads,
+and duck punching a class again with the same options does nothing.
+Duck punching a class again with other options does it again, with a warning.
+
+For worker processes :
+- forked after preload(), they inherit the duck punched classes, and all the lazy work already done.
+- spawned, they can duck punch the same classes with restore(snapshot()), ie. as the pool initializer.
+"""
+
+import importlib
+import os
+import threading
+import warnings
+
+
+class RepatchWarning(UserWarning):
+    """Warning issued when a message class is duck punched again, with different options"""
+    pass
+
+
+_lock = threading.RLock()
+
+# message class -> (pattern, options)
+_patched = {}
+
+
+def _freeze(options):
+    """Make options comparable : lists become tuples"""
+    return dict((k, tuple(v) if isinstance(v, list) else v) for k, v in options.items())
+
+
+def patch(msg_mod, pattern, punch, **options):
+    """
+    Duck punch a message class, unless it is already duck punched the same way.
+    :param msg_mod: the ros message class
+    :param pattern: the name of the pattern module, ie. 'opt_as_array'
+    :param punch: the function doing the duck punching, called with msg_mod and options
+    :param options: the duck punching options
+    :return: True if the class has been duck punched, False if it was already
+    """
+    frozen = _freeze(options)
+    with _lock:
+        current = _patched.get(msg_mod)
+        if current == (pattern, frozen):
+            return False
+        if current is not None:
+            warnings.warn("{0} is duck punched again, by {1} with {2}, after {3} with {4}".format(
+                msg_mod._type, pattern, frozen, current[0], current[1]), RepatchWarning, stacklevel=3)
+        punch(msg_mod, **options)
+        _patched[msg_mod] = (pattern, frozen)
+    return True
+
+
+def locked():
+    """
+    The lock of the registry, to hold while changing a duck punched class.
+    :return: the lock, to use in a with statement
+    """
+    return _lock
+
+
+def record(msg_mod, pattern, **options):
+    """
+    Record new options of a duck punched class, after they changed, ie. its validation level.
+    :param msg_mod: the ros message class
+    :param pattern: the name of the pattern module, ie. 'opt_as_array'
+    :param options: the duck punching options
+    """
+    with _lock:
+        _patched[msg_mod] = (pattern, _freeze(options))
+
+
+def patched(msg_mod=None):
+    """
+    Get how message classes are duck punched.
+    :param msg_mod: the ros message class, or None for all duck punched classes
+    :return: a tuple (pattern, options), or None if msg_mod is not duck punched.
+    Without msg_mod, a dict {message class: (pattern, options)}
+    """
+    with _lock:
+        if msg_mod is not None:
+            return _patched.get(msg_mod)
+        return dict(_patched)
+
+
+def snapshot():
+    """
+    Describe how message classes are duck punched, to do the same in another process.
+    :return: a picklable list of (message type, pattern, options)
+    """
+    with _lock:
+        return [(msg_mod._type, pattern, dict(options)) for msg_mod, (pattern, options) in _patched.items()]
+
+
+def restore(patches):
+    """
+    Duck punch message classes as described by a snapshot, ie. in a worker process.
+    Classes already duck punched the same way are left as they are.
+    :param patches: the list of (message type, pattern, options), from snapshot()
+    """
+    from pyros_msgs import typecache  # importing genpy, only when needed
+
+    for msg_type, pattern, options in patches:
+        msg_mod = typecache.get_message_class(msg_type)
+        if msg_mod is None:
+            raise TypeError("message class for '{0}' not found".format(msg_type))
+        importlib.import_module('pyros_msgs.' + pattern).duck_punch(msg_mod, **options)
+
+
+def preload():
+    """
+    Do now the work duck punching does lazily : loading all opt_as_nested message types,
+    and generating the batch builders of the duck punched classes.
+    Call it in a parent process before forking worker processes, so that they inherit it.
+    """
+    import pyros_msgs.opt_as_nested
+    from pyros_msgs.opt_as_array import opt_as_array
+
+    for name in pyros_msgs.opt_as_nested.opt_as_nested.opt_types:
+        pyros_msgs.opt_as_nested.load(name)
+    with _lock:
+        for msg_mod, options in list(opt_as_array._punch_options.items()):
+            if msg_mod not in opt_as_array._builders:
+                opt_as_array._builders[msg_mod] = opt_as_array._generate_builder(msg_mod, *options[:4])
+
+
+def _after_fork_in_child():
+    # the lock may have been held by another thread of the parent when forking
+    global _lock
+    _lock = threading.RLock()
+
+
+if hasattr(os, 'register_at_fork'):  # python >= 3.7
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+__all__ = [
+    'RepatchWarning',
+    'patch',
+    'locked',
+    'record',
+    'patched',
+    'snapshot',
+    'restore',
+    'preload',
+]
@@ -0,0 +1,75 @@
+from __future__ import absolute_import
+from __future__ import print_function
+
+"""
+pyros_msgs.typecache is a process-wide cache of the message classes resolved from ros slot types.
+
+Resolving a slot type like 'std_msgs/Header' through genpy is a string-keyed registry lookup.
+The duck punched constructors need it for every non-primitive slot, so we resolve each type only once,
+and keep the message class, as well as the factory for its default value.
+
+If message modules are reloaded, the cache must be invalidated explicitly with invalidate().
+"""
+
+import genpy
+
+
+# slot type -> message class
+message_classes = {}
+# slot type -> callable returning a fresh default value
+default_factories = {}
+
+
+def get_message_class(slot_type):
+    """
+    Resolve the message class for a slot type, and cache it.
+    :param slot_type: the ros type of the slot, ie. 'std_msgs/Header'
+    :return: the message class, or None if genpy cannot find it (not cached)
+    """
+    msg_class = message_classes.get(slot_type)
+    if msg_class is None:
+        msg_class = genpy.message.get_message_class(slot_type)
+        if msg_class is not None:
+            message_classes[slot_type] = msg_class
+    return msg_class
+
+
+def get_default_factory(slot_type):
+    """
+    Resolve the factory for the default value of a slot type, and cache it.
+    The message class itself is the factory : genpy generated constructors without arguments
+    only assign the default value for each slot, without any validation.
+    :param slot_type: the ros type of the slot, ie. 'std_msgs/Header'
+    :return: a callable returning a fresh default value
+    """
+    factory = default_factories.get(slot_type)
+    if factory is None:
+        factory = get_message_class(slot_type)
+        if factory is not None:
+            default_factories[slot_type] = factory
+    return factory
+
+
+def invalidate(slot_type=None):
+    """
+    Invalidate the cache, for one slot type, or for all of them.
+    This should be called after reloading message modules, so that the new classes are used.
+    genpy keeps its own cache of message classes, which is invalidated as well.
+    :param slot_type: the ros type of the slot to invalidate. If None, the whole cache is invalidated
+    """
+    genpy_cache = getattr(genpy.message, '_message_class_cache', {})
+    if slot_type is None:
+        message_classes.clear()
+        default_factories.clear()
+        genpy_cache.clear()
+    else:
+        message_classes.pop(slot_type, None)
+        default_factories.pop(slot_type, None)
+        genpy_cache.pop(slot_type, None)
+
+
+__all__ = [
+    'get_message_class',
+    'get_default_factory',
+    'invalidate',
+]
@@ -0,0 +1,207 @@
+from __future__ import absolute_import
+from __future__ import print_function
+
+"""
+pyros_msgs.wire walks serialized ros messages, to find where each field is, without deserializing them.
+
+The ros wire format is little endian, with no padding and no field names :
+fixed size fields are packed one after the other, strings and variable length arrays are prefixed by their length
+(a uint32), and nested messages are serialized in place. The position of a field is found by skipping
+the fields before it, which only reads the length prefixes.
+
+The walk of a message type is planned once, and cached : consecutive fixed size fields are skipped at once.
+"""
+
+import struct
+
+from pyros_msgs import typecache
+
+# struct format characters of primitive ros types, as genpy packs them
+primitive_formats = {
+    'bool': 'B',
+    'int8': 'b', 'uint8': 'B', 'byte': 'b', 'char': 'B',
+    'int16': 'h', 'uint16': 'H',
+    'int32': 'i', 'uint32': 'I',
+    'int64': 'q', 'uint64': 'Q',
+    'float32': 'f', 'float64': 'd',
+}
+
+_struct_I = struct.Struct('<I')
+
+
+def _split_array(slot_type):
+    """
+    Split an array slot type into its element type and its size.
+    :return: a tuple (element type, size), size being None for variable length arrays
+    """
+    base_type, size = slot_type[:-1].split('[')
+    return base_type, int(size) if size else None
+
+
+def fixed_size(slot_type):
+    """
+    The size of a slot type on the wire, if it does not depend on the value.
+    :param slot_type: the ros type of the slot
+    :return: the size in bytes, or None if the size depends on the value
+    """
+    if slot_type in primitive_formats:
+        return struct.calcsize('<' + primitive_formats[slot_type])
+    elif slot_type in ('time', 'duration'):
+        return 8
+    elif slot_type == 'string':
+        return None
+    elif '[' in slot_type:
+        base_type, size = _split_array(slot_type)
+        element_size = fixed_size(base_type)
+        return None if size is None or element_size is None else size * element_size
+    else:
+        msg_class = _message_class(slot_type)
+        size = 0
+        for st in msg_class._slot_types:
+            slot_size = fixed_size(st)
+            if slot_size is None:
+                return None
+            size += slot_size
+        return size
+
+
+def _message_class(slot_type):
+    msg_class = typecache.get_message_class(slot_type)
+    if msg_class is None:
+        raise TypeError("message class for '{slot_type}' not found".format(slot_type=slot_type))
+    return msg_class
+
+
+def _skip_string(buf, offset):
+    return offset + 4 + _struct_I.unpack_from(buf, offset)[0]
+
+
+def _make_skip(slot_type):
+    """
+    Build the function skipping a field on the wire.
+    :param slot_type: the ros type of the field
+    :return: a function (buf, offset) -> the offset right after the field
+    """
+    size = fixed_size(slot_type)
+    if size is not None:
+        return lambda buf, offset: offset + size
+    elif slot_type == 'string':
+        return _skip_string
+    elif '[' in slot_type:
+        base_type, count = _split_array(slot_type)
+        element_size = fixed_size(base_type)
+        if element_size is not None:  # variable length array of fixed size elements
+            return lambda buf, offset: offset + 4 + element_size * _struct_I.unpack_from(buf, offset)[0]
+        skip_element = _make_skip(base_type)
+
+        def skip_array(buf, offset):
+            if count is None:
+                n = _struct_I.unpack_from(buf, offset)[0]
+                offset += 4
+            else:
+                n = count
+            for _ in range(n):
+                offset = skip_element(buf, offset)
+            return offset
+        return skip_array
+    else:
+        walk = _get_walk(_message_class(slot_type))
+
+        def skip_message(buf, offset):
+            for _, skip in walk:
+                offset = skip(buf, offset)
+            return offset
+        return skip_message
+
+
+# message class -> list of (slots, skip function)
+_walks = {}
+
+
+def _get_walk(msg_class):
+    """
+    Plan the walk of a message type, once : a list of (slots, skip function),
+    consecutive fixed size fields being grouped and skipped at once.
+    """
+    try:
+        return _walks[msg_class]
+    except KeyError:
+        pass
+    walk = []
+    fixed_slots, fixed_total = [], 0
+    for s, st in zip(msg_class.__slots__, msg_class._slot_types):
+        size = fixed_size(st)
+        if size is not None:
+            fixed_slots.append((s, fixed_total, size))
+            fixed_total += size
+            continue
+        if fixed_slots:
+            walk.append((fixed_slots, (lambda total: lambda buf, offset: offset + total)(fixed_total)))
+            fixed_slots, fixed_total = [], 0
+        walk.append(([(s, 0, None)], _make_skip(st)))
+    if fixed_slots:
+        walk.append((fixed_slots, (lambda total: lambda buf, offset: offset + total)(fixed_total)))
+    _walks[msg_class] = walk
+    return walk
+
+
+def skip(slot_type, buf, offset=0):
+    """
+    Skip a serialized field.
+    :param slot_type: the ros type of the field, or a message type, ie. 'std_msgs/Header'
+    :param buf: the buffer holding the serialized message (bytes, bytearray, memoryview, mmap...)
+    :param offset: the position of the field in the buffer
+    :return: the position right after the field
+    """
+    return _make_skip(slot_type)(buf, offset)
+
+
+def skip_message(msg_class, buf, offset=0):
+    """
+    Skip a serialized message, with the walk planned for its type.
+    :param msg_class: the message class
+    :param buf: the buffer holding the serialized message (bytes, bytearray, memoryview, mmap...)
+    :param offset: the position of the message in the buffer
+    :return: the position right after the message
+    """
+    for _, skip_slots in _get_walk(msg_class):
+        offset = skip_slots(buf, offset)
+    return offset
+
+
+def spans(msg_class, buf, offset=0):
+    """
+    Find where each field of a serialized message is.
+    :param msg_class: the message class
+    :param buf: the buffer holding the serialized message (bytes, bytearray, memoryview, mmap...)
+    :param offset: the position of the message in the buffer
+    :return: a list of (slot, start, end), in the order of the slots. end is the position right after the field,
+    and the end of the last field is the end of the message.
+    """
+    result = []
+    for slots, skip_slots in _get_walk(msg_class):
+        end = skip_slots(buf, offset)
+        if len(slots) == 1 and slots[0][2] is None:
+            result.append((slots[0][0], offset, end))
+        else:
+            for s, start, size in slots:
+                result.append((s, offset + start, offset + start + size))
+        offset = end
+    if offset > len(buf):
+        raise ValueError("buffer underfill : the message ends at {0}, after the end of the buffer at {1}".format(offset, len(buf)))
+    return result
+
+
+def invalidate():
+    """Forget the walks planned so far, ie. after reloading message modules"""
+    _walks.clear()
+
+
+__all__ = [
+    'primitive_formats',
+    'fixed_size',
+    'skip',
+    'skip_message',
+    'spans',
+    'invalidate',
+]
@@ -0,0 +1,52 @@
+from __future__ import absolute_import
+from __future__ import print_function
+
+import array
+
+try:
+    import pyros_msgs.opt_as_array  # This will duck punch the standard message type initialization code.
+    from pyros_msgs.msg import test_opt_int16_as_array  # a message type just for testing
+except ImportError:
+    # Because we need to access Ros message types here (from ROS env or from virtualenv, or from somewhere else)
+    import pyros_setup
+    # We rely on default configuration to point us ot the proper distro
+    pyros_setup.configurable_import().configure().activate()
+    import pyros_msgs.opt_as_array  # This will duck punch the standard message type initialization code.
+    from pyros_msgs.msg import test_opt_int16_as_array  # a message type just for testing
+
+# patching
+pyros_msgs.opt_as_array.duck_punch(test_opt_int16_as_array, ['data'])
+
+import nose
+
+
+def test_build_many():
+    msgs = pyros_msgs.opt_as_array.build_many(test_opt_int16_as_array, {'data': [42, None, [4, 2]]})
+    assert [msg.data for msg in msgs] == [[42], [], [4, 2]]
+    assert msgs[0] == test_opt_int16_as_array(data=42)
+
+
+def test_build_many_bulk():
+    msgs = pyros_msgs.opt_as_array.build_many(test_opt_int16_as_array, {'data': array.array('h', [4, 2])})
+    assert [msg.data for msg in msgs] == [[4], [2]]
+
+
+def test_build_many_lazy():
+    msgs = pyros_msgs.opt_as_array.build_many(test_opt_int16_as_array, {'data': [42]}, lazy=True)
+    assert [msg.data for msg in msgs] == [[42]]
+
+
+def test_build_many_except():
+    with nose.tools.assert_raises(AttributeError) as cm:
+        pyros_msgs.opt_as_array.build_many(test_opt_int16_as_array, {'data': [42, 'fortytwo']})
+    assert str(cm.exception) == "field data has value ['fortytwo'] which is not of type int16[]"
+
+
+def test_build_many_unknown_field_except():
+    with nose.tools.assert_raises(AttributeError):
+        pyros_msgs.opt_as_array.build_many(test_opt_int16_as_array, {'fortytwo': [42]})
+
+
+# Just in case we run this directly
+if __name__ == '__main__':
+    nose.runmodule(__name__)
@@ -0,0 +1,98 @@
+from __future__ import absolute_import
+from __future__ import print_function
+
+import array
+import sys
+from io import BytesIO
+
+try:
+    import pyros_msgs.opt_as_array  # This will duck punch the standard message type initialization code.
+    from pyros_msgs.msg import test_opt_uint16_as_array, test_opt_string_as_array  # a message type just for testing
+except ImportError:
+    # Because we need to access Ros message types here (from ROS env or from virtualenv, or from somewhere else)
+    import pyros_setup
+    # We rely on default configuration to point us ot the proper distro
+    pyros_setup.configurable_import().configure().activate()
+    import pyros_msgs.opt_as_array  # This will duck punch the standard message type initialization code.
+    from pyros_msgs.msg import test_opt_uint16_as_array, test_opt_string_as_array  # a message type just for testing
+
+import nose
+
+
+def setup_module():
+    pyros_msgs.opt_as_array.duck_punch(test_opt_uint16_as_array, ['data'], storage=pyros_msgs.opt_as_array.COMPACT)
+    pyros_msgs.opt_as_array.duck_punch(test_opt_string_as_array, ['data'], storage=pyros_msgs.opt_as_array.COMPACT)
+
+
+def teardown_module():
+    pyros_msgs.opt_as_array.duck_punch(test_opt_uint16_as_array, ['data'])
+    pyros_msgs.opt_as_array.duck_punch(test_opt_string_as_array, ['data'])
+
+
+def roundtrip(msg):
+    buff = BytesIO()
+    msg.serialize(buff)
+    return type(msg)().deserialize(buff.getvalue())
+
+
+def test_init_compact():
+    msg = test_opt_uint16_as_array(data=42)
+    assert isinstance(msg.data, pyros_msgs.opt_as_array.OptionalValue)
+    assert msg.data == [42]
+    assert msg.data[0] == 42
+    assert len(msg.data) == 1
+    assert repr(msg.data) == '[42]'
+
+
+def test_init_default_shared():
+    msg = test_opt_uint16_as_array()
+    assert msg.data == []
+    assert not msg.data
+    assert msg.data is test_opt_uint16_as_array().data  # no allocation for optional values not set
+
+
+def test_init_bulk_kept():
+    values = array.array('H', [1, 2, 3])
+    msg = test_opt_uint16_as_array(data=values)
+    assert msg.data is values
+
+
+def test_init_except():
+    with nose.tools.assert_raises(AttributeError):
+        test_opt_uint16_as_array(data='fortytwo')
+
+
+def test_serialize_same_as_list():
+    compact_msg = test_opt_string_as_array(data='fortytwo')
+    buff = BytesIO()
+    compact_msg.serialize(buff)
+
+    pyros_msgs.opt_as_array.duck_punch(test_opt_string_as_array, ['data'])
+    list_buff = BytesIO()
+    test_opt_string_as_array(data='fortytwo').serialize(list_buff)
+    pyros_msgs.opt_as_array.duck_punch(test_opt_string_as_array, ['data'], storage=pyros_msgs.opt_as_array.COMPACT)
+
+    assert buff.getvalue() == list_buff.getvalue()
+    assert roundtrip(compact_msg) == compact_msg
+    assert roundtrip(test_opt_string_as_array()) == test_opt_string_as_array()
+
+
+def test_smaller_than_list():
+    assert sys.getsizeof(test_opt_uint16_as_array(data=42).data) < sys.getsizeof([42])
+
+
+def test_build_many_compact():
+    msgs = pyros_msgs.opt_as_array.build_many(test_opt_uint16_as_array, {'data': [42, None]})
+    assert isinstance(msgs[0].data, pyros_msgs.opt_as_array.OptionalValue)
+    assert msgs[0].data == [42]
+    assert msgs[1].data is test_opt_uint16_as_array().data
+
+
+def test_wrong_storage():
+    with nose.tools.assert_raises(ValueError):
+        pyros_msgs.opt_as_array.duck_punch(test_opt_uint16_as_array, ['data'], storage='tuple')
+
+
+# Just in case we run this directly
+if __name__ == '__main__':
+    nose.runmodule(__name__)
@@ -0,0 +1,87 @@
+from __future__ import absolute_import
+from __future__ import print_function
+
+import warnings
+from io import BytesIO
+
+try:
+    import genpy
+    import std_msgs.msg as std_msgs
+    import pyros_msgs.opt_as_array  # This will duck punch the standard message type initialization code.
+    from pyros_msgs.opt_as_array import serializers
+    from pyros_msgs.msg import test_opt_int32_as_array, test_opt_string_as_array, test_opt_time_as_array, test_opt_header_as_array  # message types just for testing
+except ImportError:
+    # Because we need to access Ros message types here (from ROS env or from virtualenv, or from somewhere else)
+    import pyros_setup
+    # We rely on default configuration to point us ot the proper distro
+    pyros_setup.configurable_import().configure().activate()
+    import genpy
+    import std_msgs.msg as std_msgs
+    import pyros_msgs.opt_as_array  # This will duck punch the standard message type initialization code.
+    from pyros_msgs.opt_as_array import serializers
+    from pyros_msgs.msg import test_opt_int32_as_array, test_opt_string_as_array, test_opt_time_as_array, test_opt_header_as_array  # message types just for testing
+
+import nose
+
+values = {
+    test_opt_int32_as_array: [[], [42], [4, 2, -42]],
+    test_opt_string_as_array: [[], ['forty two'], [u'quarante-deux', '']],
+    test_opt_time_as_array: [[], [genpy.Time(4, 2)], [genpy.Time(4, 2), genpy.Time(42)]],
+    test_opt_header_as_array: [[], [std_msgs.Header(seq=42, stamp=genpy.Time(4, 2), frame_id='fortytwo')], [std_msgs.Header(), std_msgs.Header(seq=42)]],
+}
+
+
+def serialize(msg, serialize):
+    buff = BytesIO()
+    serialize(msg, buff)
+    return buff.getvalue()
+
+
+def test_same_as_genpy():
+    for msg_mod, slot_values in values.items():
+        pyros_msgs.opt_as_array.duck_punch(msg_mod, ['data'])
+        fast_serialize, fast_deserialize = serializers.generate(msg_mod)
+        for value in slot_values:
+            msg = msg_mod(data=value)
+            buf = serialize(msg, msg_mod.serialize)
+            assert serialize(msg, fast_serialize) == buf
+            assert list(fast_deserialize(msg_mod(), buf).data) == list(msg_mod().deserialize(buf).data)
+
+
+
+def test_time_canon():
+    _, fast_deserialize = serializers.generate(std_msgs.Header)
+    msg = std_msgs.Header(seq=42, stamp=genpy.Time(1))
+    msg.stamp.nsecs = 1500000000  # not normalized, as another node could send it
+    buf = serialize(msg, std_msgs.Header.serialize)
+    stamp = fast_deserialize(std_msgs.Header(), buf).stamp
+    assert (stamp.secs, stamp.nsecs) == (2, 500000000)
+    # genpy does not normalize the time fields of nested messages
+    pyros_msgs.opt_as_array.duck_punch(test_opt_header_as_array, ['data'])
+    _, fast_deserialize = serializers.generate(test_opt_header_as_array)
+    buf = serialize(test_opt_header_as_array(data=msg), test_opt_header_as_array.serialize)
+    stamp = fast_deserialize(test_opt_header_as_array(), buf).data[0].stamp
+    assert (stamp.secs, stamp.nsecs) == (1, 1500000000)
+
+
+def test_duck_punch_fast_serialize():
+    genpy_serialize = test_opt_int32_as_array.serialize
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        pyros_msgs.opt_as_array.duck_punch(test_opt_int32_as_array, ['data'], fast_serialize=True)
+        try:
+            assert test_opt_int32_as_array.serialize is not genpy_serialize
+            buf = serialize(test_opt_int32_as_array(data=42), test_opt_int32_as_array.serialize)
+            assert buf == serialize(test_opt_int32_as_array(data=42), genpy_serialize)
+            assert list(test_opt_int32_as_array().deserialize(buf).data) == [42]
+            with nose.tools.assert_raises(genpy.DeserializationError):
+                test_opt_int32_as_array().deserialize(buf[:-1])
+        finally:
+            # duck punching again without it restores the genpy generated methods
+            pyros_msgs.opt_as_array.duck_punch(test_opt_int32_as_array, ['data'])
+    assert test_opt_int32_as_array.serialize is genpy_serialize
+
+
+# Just in case we run this directly
+if __name__ == '__main__':
+    nose.runmodule(__name__)
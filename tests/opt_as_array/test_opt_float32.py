@@ -0,0 +1,82 @@
+from __future__ import absolute_import
+from __future__ import print_function
+
+import array
+
+try:
+    import pyros_msgs.opt_as_array  # This will duck punch the standard message type initialization code.
+    from pyros_msgs.msg import test_opt_float32_as_array  # a message type just for testing
+except ImportError:
+    # Because we need to access Ros message types here (from ROS env or from virtualenv, or from somewhere else)
+    import pyros_setup
+    # We rely on default configuration to point us ot the proper distro
+    pyros_setup.configurable_import().configure().activate()
+    import pyros_msgs.opt_as_array  # This will duck punch the standard message type initialization code.
+    from pyros_msgs.msg import test_opt_float32_as_array  # a message type just for testing
+
+# patching
+pyros_msgs.opt_as_array.duck_punch(test_opt_float32_as_array, ['data'])
+
+import nose
+
+
+def test_init_rosdata():
+    msg = test_opt_float32_as_array(data=[42.])
+    assert msg.data == [42.]
+
+
+def test_init_data():
+    msg = test_opt_float32_as_array(data=42.)
+    assert msg.data == [42.]
+
+
+def test_init_default():
+    msg = test_opt_float32_as_array()
+    assert msg.data == []
+
+
+def test_init_bulk_array():
+    values = array.array('f', [4., 2.])
+    msg = test_opt_float32_as_array(data=values)
+    assert msg.data is values  # stored without copy
+
+
+def test_init_bulk_memoryview():
+    values = memoryview(array.array('d', [4., 2.]))
+    msg = test_opt_float32_as_array(data=values)
+    assert msg.data is values  # stored without copy
+
+
+def test_init_bulk_except_type():
+    with nose.tools.assert_raises(AttributeError):
+        test_opt_float32_as_array(data=array.array('i', [4, 2]))
+
+
+def test_init_bulk_except_range():
+    with nose.tools.assert_raises(AttributeError):
+        test_opt_float32_as_array(data=array.array('d', [4e42, 2.]))
+
+
+def test_init_bulk_infinity():
+    values = array.array('d', [float('inf'), 2.])
+    msg = test_opt_float32_as_array(data=values)
+    assert msg.data is values
+
+
+def test_init_bulk_nan():
+    values = array.array('d', [float('inf'), float('nan')])
+    msg = test_opt_float32_as_array(data=values)
+    assert msg.data is values
+
+
+def test_init_bulk_nan_except_range():
+    # the range of values is not hidden by NaN, whatever the order
+    with nose.tools.assert_raises(AttributeError):
+        test_opt_float32_as_array(data=array.array('d', [float('nan'), 1e39]))
+    with nose.tools.assert_raises(AttributeError):
+        test_opt_float32_as_array(data=array.array('d', [1e39, float('nan')]))
+
+
+# Just in case we run this directly
+if __name__ == '__main__':
+    nose.runmodule(__name__)
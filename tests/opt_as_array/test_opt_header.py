@@ -0,0 +1,60 @@
+from __future__ import absolute_import
+from __future__ import print_function
+
+try:
+    import std_msgs.msg as std_msgs
+    import pyros_msgs.opt_as_array  # This will duck punch the standard message type initialization code.
+    from pyros_msgs.msg import test_opt_header_as_array  # a message type just for testing
+except ImportError:
+    # Because we need to access Ros message types here (from ROS env or from virtualenv, or from somewhere else)
+    import pyros_setup
+    # We rely on default configuration to point us ot the proper distro
+    pyros_setup.configurable_import().configure().activate()
+    import std_msgs.msg as std_msgs
+    import pyros_msgs.opt_as_array  # This will duck punch the standard message type initialization code.
+    from pyros_msgs.msg import test_opt_header_as_array  # a message type just for testing
+
+# patching
+pyros_msgs.opt_as_array.duck_punch(test_opt_header_as_array, ['data'])
+
+import nose
+
+
+def test_init_rosdata():
+    h = std_msgs.Header(seq=42, frame_id='fortytwo')
+    msg = test_opt_header_as_array(data=[h])
+    assert msg.data == [h]
+
+
+def test_init_data():
+    h = std_msgs.Header(seq=42, frame_id='fortytwo')
+    msg = test_opt_header_as_array(data=h)
+    assert msg.data == [h]
+
+
+def test_init_raw():
+    h = std_msgs.Header(seq=42, frame_id='fortytwo')
+    msg = test_opt_header_as_array(h)
+    assert msg.data == [h]
+
+
+def test_init_default():
+    msg = test_opt_header_as_array()
+    assert msg.data == []
+
+
+def test_init_except():
+    with nose.tools.assert_raises(AttributeError) as cm:
+        test_opt_header_as_array(42)
+    assert str(cm.exception) == "field data has value [42] which is not of type std_msgs/Header[]"
+
+
+def test_init_unknown_field_except():
+    with nose.tools.assert_raises(AttributeError) as cm:
+        test_opt_header_as_array(fortytwo=42)
+    assert str(cm.exception) == "fortytwo is not an attribute of test_opt_header_as_array"
+
+
+# Just in case we run this directly
+if __name__ == '__main__':
+    nose.runmodule(__name__)
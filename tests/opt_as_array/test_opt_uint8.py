@@ -0,0 +1,67 @@
+from __future__ import absolute_import
+from __future__ import print_function
+
+import array
+
+try:
+    import pyros_msgs.opt_as_array  # This will duck punch the standard message type initialization code.
+    from pyros_msgs.msg import test_opt_uint8_as_array  # a message type just for testing
+except ImportError:
+    # Because we need to access Ros message types here (from ROS env or from virtualenv, or from somewhere else)
+    import pyros_setup
+    # We rely on default configuration to point us ot the proper distro
+    pyros_setup.configurable_import().configure().activate()
+    import pyros_msgs.opt_as_array  # This will duck punch the standard message type initialization code.
+    from pyros_msgs.msg import test_opt_uint8_as_array  # a message type just for testing
+
+# patching, rejecting values out of range
+pyros_msgs.opt_as_array.duck_punch(test_opt_uint8_as_array, ['data'], strict=True)
+
+import nose
+
+
+def test_init_rosdata():
+    msg = test_opt_uint8_as_array(data=[42])
+    assert msg.data == [42]
+
+
+def test_init_data():
+    msg = test_opt_uint8_as_array(data=42)
+    assert msg.data == [42]
+
+
+def test_init_default():
+    msg = test_opt_uint8_as_array()
+    assert msg.data == []
+
+
+def test_init_bulk_bytes():
+    msg = test_opt_uint8_as_array(data=b'\x04\x02')
+    assert msg.data == b'\x04\x02'
+
+
+def test_init_bulk_array():
+    msg = test_opt_uint8_as_array(data=array.array('B', [4, 2]))
+    assert msg.data == b'\x04\x02'  # genpy serializes uint8[] from bytes
+
+
+def test_init_except_range():
+    with nose.tools.assert_raises(AttributeError) as cm:
+        test_opt_uint8_as_array(data=420)
+    assert str(cm.exception) == "field data has value [420] which is not of type uint8[]"
+
+
+def test_init_rosdata_except_range():
+    with nose.tools.assert_raises(AttributeError) as cm:
+        test_opt_uint8_as_array(data=[4, -2])
+    assert str(cm.exception) == "field data has value [4, -2] which is not of type uint8[]"
+
+
+def test_init_bulk_except_range():
+    with nose.tools.assert_raises(AttributeError):
+        test_opt_uint8_as_array(data=array.array('h', [4, 420]))
+
+
+# Just in case we run this directly
+if __name__ == '__main__':
+    nose.runmodule(__name__)
@@ -0,0 +1,101 @@
+from __future__ import absolute_import
+from __future__ import print_function
+
+import array
+
+try:
+    import pyros_msgs.opt_as_array  # This will duck punch the standard message type initialization code.
+    from pyros_msgs.msg import test_opt_uint32_as_array, test_opt_float64_as_array  # a message type just for testing
+except ImportError:
+    # Because we need to access Ros message types here (from ROS env or from virtualenv, or from somewhere else)
+    import pyros_setup
+    # We rely on default configuration to point us ot the proper distro
+    pyros_setup.configurable_import().configure().activate()
+    import pyros_msgs.opt_as_array  # This will duck punch the standard message type initialization code.
+    from pyros_msgs.msg import test_opt_uint32_as_array, test_opt_float64_as_array  # a message type just for testing
+
+import nose
+
+
+def setup_module():
+    pyros_msgs.opt_as_array.duck_punch(test_opt_uint32_as_array, ['data'])
+    pyros_msgs.opt_as_array.duck_punch(test_opt_float64_as_array, ['data'])
+
+
+def reset_levels():
+    pyros_msgs.opt_as_array.set_validation_level(None)
+    pyros_msgs.opt_as_array.set_validation_level(None, test_opt_uint32_as_array)
+    pyros_msgs.opt_as_array.set_validation_level(None, test_opt_float64_as_array)
+
+
+def test_default_level():
+    assert test_opt_uint32_as_array(data=2 ** 32).data == [2 ** 32]  # range not checked without strict
+    with nose.tools.assert_raises(AttributeError):
+        test_opt_uint32_as_array(data=[42, 'fortytwo'])
+
+
+def test_strict_level():
+    try:
+        pyros_msgs.opt_as_array.set_validation_level(pyros_msgs.opt_as_array.STRICT, test_opt_uint32_as_array)
+        with nose.tools.assert_raises(AttributeError):
+            test_opt_uint32_as_array(data=2 ** 32)
+        with nose.tools.assert_raises(AttributeError):
+            pyros_msgs.opt_as_array.build_many(test_opt_uint32_as_array, {'data': [2 ** 32]})
+        assert test_opt_uint32_as_array(data=42).data == [42]
+    finally:
+        reset_levels()
+
+
+def test_fast_level():
+    try:
+        pyros_msgs.opt_as_array.set_validation_level(pyros_msgs.opt_as_array.FAST, test_opt_uint32_as_array)
+        # elements of lists are not validated, after the first one
+        assert test_opt_uint32_as_array(data=[42, 'fortytwo']).data == [42, 'fortytwo']
+        # but the top level type is
+        with nose.tools.assert_raises(AttributeError):
+            test_opt_uint32_as_array(data='fortytwo')
+        assert test_opt_uint32_as_array(data=42).data == [42]
+    finally:
+        reset_levels()
+
+
+def test_off_level():
+    try:
+        pyros_msgs.opt_as_array.set_validation_level(pyros_msgs.opt_as_array.OFF, test_opt_uint32_as_array)
+        assert test_opt_uint32_as_array(data='fortytwo').data == ['fortytwo']
+        assert test_opt_uint32_as_array(data=42).data == [42]
+        assert test_opt_uint32_as_array(data=[42]).data == [42]
+        assert test_opt_uint32_as_array().data == []
+        values = array.array('I', [4, 2])
+        assert test_opt_uint32_as_array(data=values).data is values
+        with nose.tools.assert_raises(AttributeError):
+            test_opt_uint32_as_array(not_a_field=42)
+    finally:
+        reset_levels()
+
+
+def test_global_level():
+    try:
+        pyros_msgs.opt_as_array.set_validation_level(pyros_msgs.opt_as_array.STRICT, test_opt_float64_as_array)
+        pyros_msgs.opt_as_array.set_validation_level(pyros_msgs.opt_as_array.OFF)
+        assert test_opt_uint32_as_array(data='fortytwo').data == ['fortytwo']
+        # message types with their own level keep it
+        with nose.tools.assert_raises(AttributeError):
+            test_opt_float64_as_array(data='fortytwo')
+        pyros_msgs.opt_as_array.set_validation_level(None)
+        with nose.tools.assert_raises(AttributeError):
+            test_opt_uint32_as_array(data='fortytwo')
+    finally:
+        reset_levels()
+
+
+def test_wrong_level():
+    with nose.tools.assert_raises(ValueError):
+        pyros_msgs.opt_as_array.set_validation_level('none')
+    with nose.tools.assert_raises(ValueError):
+        pyros_msgs.opt_as_array.duck_punch(test_opt_uint32_as_array, ['data'], validation='none')
+
+
+# Just in case we run this directly
+if __name__ == '__main__':
+    nose.runmodule(__name__)
@@ -0,0 +1,76 @@
+from __future__ import absolute_import
+from __future__ import print_function
+
+import sys
+from io import BytesIO
+
+try:
+    import std_msgs.msg as std_msgs
+    import pyros_msgs.opt_as_array  # This will duck punch the standard message type initialization code.
+    from pyros_msgs.msg import test_opt_float32_as_array, test_opt_uint8_as_array, test_opt_header_as_array  # message types just for testing
+except ImportError:
+    # Because we need to access Ros message types here (from ROS env or from virtualenv, or from somewhere else)
+    import pyros_setup
+    # We rely on default configuration to point us ot the proper distro
+    pyros_setup.configurable_import().configure().activate()
+    import std_msgs.msg as std_msgs
+    import pyros_msgs.opt_as_array  # This will duck punch the standard message type initialization code.
+    from pyros_msgs.msg import test_opt_float32_as_array, test_opt_uint8_as_array, test_opt_header_as_array  # message types just for testing
+
+import nose
+
+native_views = sys.version_info >= (3, 0) and sys.byteorder == 'little'
+
+
+def setup_module():
+    pyros_msgs.opt_as_array.duck_punch(test_opt_float32_as_array, ['data'])
+    pyros_msgs.opt_as_array.duck_punch(test_opt_uint8_as_array, ['data'])
+    pyros_msgs.opt_as_array.duck_punch(test_opt_header_as_array, ['data'])
+
+
+def serialize(msg):
+    buff = BytesIO()
+    msg.serialize(buff)
+    return buff.getvalue()
+
+
+def test_views_float32():
+    buf = serialize(test_opt_float32_as_array(data=[1.5, 2.5, 3.0]))
+    msg = pyros_msgs.opt_as_array.deserialize_views(test_opt_float32_as_array, buf)
+    if native_views:
+        assert isinstance(msg.data, memoryview)
+    assert len(msg.data) == 3 and msg.data[1] == 2.5
+    assert list(msg.data) == [1.5, 2.5, 3.0]
+    assert serialize(msg) == buf
+
+
+def test_views_unset():
+    buf = serialize(test_opt_float32_as_array())
+    msg = pyros_msgs.opt_as_array.deserialize_views(test_opt_float32_as_array, buf)
+    assert len(msg.data) == 0
+
+
+def test_views_uint8_no_copy():
+    buf = bytearray(serialize(test_opt_uint8_as_array(data=b'fortytwo')))
+    msg = pyros_msgs.opt_as_array.deserialize_views(test_opt_uint8_as_array, buf)
+    assert bytes(msg.data) == b'fortytwo'
+    if native_views:
+        buf[4:6] = b'FO'  # the view sees the buffer
+        assert bytes(msg.data) == b'FOrtytwo'
+    pyros_msgs.opt_as_array.materialize(msg)
+    assert msg.data == bytes(buf[4:])
+    assert serialize(msg) == bytes(buf)
+
+
+def test_views_not_numbers():
+    header = std_msgs.Header(seq=42, frame_id='fortytwo')
+    buf = serialize(test_opt_header_as_array(data=header))
+    # arrays of messages are deserialized by genpy as usual
+    assert pyros_msgs.opt_as_array.deserialize_views(test_opt_header_as_array, buf).data == [header]
+    with nose.tools.assert_raises(TypeError):
+        pyros_msgs.opt_as_array.deserialize_views(test_opt_header_as_array, buf, slots=['data'])
+
+
+# Just in case we run this directly
+if __name__ == '__main__':
+    nose.runmodule(__name__)
@@ -0,0 +1,73 @@
+from __future__ import absolute_import
+from __future__ import print_function
+
+from io import BytesIO
+
+try:
+    import genpy
+    import std_msgs.msg as std_msgs
+    import pyros_msgs.opt_as_bitmask
+    from pyros_msgs.opt_as_bitmask import compact
+    from pyros_msgs.msg import test_opt_as_bitmask  # a message type just for testing
+except ImportError:
+    # Because we need to access Ros message types here (from ROS env or from virtualenv, or from somewhere else)
+    import pyros_setup
+    # We rely on default configuration to point us ot the proper distro
+    pyros_setup.configurable_import().configure().activate()
+    import genpy
+    import std_msgs.msg as std_msgs
+    import pyros_msgs.opt_as_bitmask
+    from pyros_msgs.opt_as_bitmask import compact
+    from pyros_msgs.msg import test_opt_as_bitmask  # a message type just for testing
+
+import nose
+
+opt_slots = ['int32_field', 'string_field', 'time_field', 'header_field', 'int32_array_field']
+
+pyros_msgs.opt_as_bitmask.duck_punch(test_opt_as_bitmask, opt_slots)
+
+
+def serialize(msg):
+    buff = BytesIO()
+    msg.serialize(buff)
+    return buff.getvalue()
+
+
+def serialize_compact(msg):
+    buff = BytesIO()
+    compact.serialize(msg, buff)
+    return buff.getvalue()
+
+
+def test_unset_fields_not_written():
+    # presence_, bool_field and float64_field only
+    assert len(serialize_compact(test_opt_as_bitmask())) == 8 + 1 + 8
+    assert len(serialize_compact(test_opt_as_bitmask(int32_field=42))) == 8 + 1 + 4 + 8
+
+
+def test_all_set_as_ros():
+    msg = test_opt_as_bitmask(int32_field=42, string_field='fortytwo', time_field=genpy.Time(4, 2),
+                              header_field=std_msgs.Header(seq=42), int32_array_field=[4, 2])
+    assert serialize_compact(msg) == serialize(msg)
+
+
+def test_roundtrip():
+    for msg in (
+        test_opt_as_bitmask(),
+        test_opt_as_bitmask(bool_field=True, float64_field=4.2, string_field='fortytwo'),
+        test_opt_as_bitmask(header_field=std_msgs.Header(seq=42, frame_id='fortytwo'), int32_array_field=[4, 2]),
+    ):
+        received, end = compact.read(test_opt_as_bitmask, serialize_compact(msg) + b'next')
+        assert end == len(serialize_compact(msg))
+        assert received == msg
+        assert pyros_msgs.opt_as_bitmask.set_slots(received) == pyros_msgs.opt_as_bitmask.set_slots(msg)
+
+
+def test_not_punched_excepts():
+    with nose.tools.assert_raises(TypeError):
+        compact.serialize(std_msgs.Header(), BytesIO())
+
+
+# Just in case we run this directly
+if __name__ == '__main__':
+    nose.runmodule(__name__)
@@ -0,0 +1,128 @@
+from __future__ import absolute_import
+from __future__ import print_function
+
+import copy
+import pickle
+from io import BytesIO
+
+try:
+    import genpy
+    import std_msgs.msg as std_msgs
+    import pyros_msgs.opt_as_bitmask
+    from pyros_msgs.msg import test_opt_as_bitmask  # a message type just for testing
+except ImportError:
+    # Because we need to access Ros message types here (from ROS env or from virtualenv, or from somewhere else)
+    import pyros_setup
+    # We rely on default configuration to point us ot the proper distro
+    pyros_setup.configurable_import().configure().activate()
+    import genpy
+    import std_msgs.msg as std_msgs
+    import pyros_msgs.opt_as_bitmask
+    from pyros_msgs.msg import test_opt_as_bitmask  # a message type just for testing
+
+import nose
+
+opt_slots = ['int32_field', 'string_field', 'time_field', 'header_field', 'int32_array_field']
+
+pyros_msgs.opt_as_bitmask.duck_punch(test_opt_as_bitmask, opt_slots)
+
+
+def roundtrip(msg):
+    buff = BytesIO()
+    msg.serialize(buff)
+    return test_opt_as_bitmask().deserialize(buff.getvalue())
+
+
+def test_init_rejected():
+    with nose.tools.assert_raises(AttributeError):
+        test_opt_as_bitmask(presence_=1)
+
+
+def test_init_default():
+    msg = test_opt_as_bitmask()
+    assert msg.presence_ == 0
+    assert pyros_msgs.opt_as_bitmask.set_slots(msg) == []
+    assert msg.int32_field == 0
+    assert msg.string_field == ''
+    assert msg.time_field == genpy.Time()
+    assert msg.header_field == std_msgs.Header()
+    assert msg.int32_array_field == []
+    assert msg.presence_ == 0  # reading default values does not set them
+
+
+def test_init_data():
+    msg = test_opt_as_bitmask(int32_field=42, header_field=std_msgs.Header(seq=42), bool_field=True)
+    assert msg.bool_field is True
+    assert pyros_msgs.opt_as_bitmask.is_set(msg, 'int32_field')
+    assert pyros_msgs.opt_as_bitmask.is_set(msg, 'header_field')
+    assert not pyros_msgs.opt_as_bitmask.is_set(msg, 'string_field')
+    assert pyros_msgs.opt_as_bitmask.set_slots(msg) == ['int32_field', 'header_field']
+    assert msg.presence_ == 0b1001
+
+
+
+def test_init_none():
+    # None means not set, the default value is used
+    msg = test_opt_as_bitmask(int32_field=None, header_field=None, time_field=None, int32_array_field=None, bool_field=True)
+    assert msg.presence_ == 0
+    assert msg.int32_field == 0
+    assert msg.header_field == std_msgs.Header()
+    assert msg.time_field == genpy.Time()
+    assert msg.int32_array_field == []
+    assert roundtrip(msg) == msg
+
+def test_init_unknown_field():
+    with nose.tools.assert_raises(AttributeError):
+        test_opt_as_bitmask(not_a_field=42)
+
+
+def test_assign_sets():
+    msg = test_opt_as_bitmask()
+    msg.string_field = 'fortytwo'
+    assert pyros_msgs.opt_as_bitmask.set_slots(msg) == ['string_field']
+
+
+def test_mark_set_and_unset():
+    msg = test_opt_as_bitmask()
+    msg.time_field.secs = 42
+    assert not pyros_msgs.opt_as_bitmask.is_set(msg, 'time_field')
+    pyros_msgs.opt_as_bitmask.mark_set(msg, 'time_field')
+    assert pyros_msgs.opt_as_bitmask.is_set(msg, 'time_field')
+    pyros_msgs.opt_as_bitmask.unset(msg, 'time_field')
+    assert not pyros_msgs.opt_as_bitmask.is_set(msg, 'time_field')
+    assert msg.time_field == genpy.Time()
+
+
+def test_not_optional():
+    with nose.tools.assert_raises(AttributeError):
+        pyros_msgs.opt_as_bitmask.is_set(test_opt_as_bitmask(), 'bool_field')
+
+
+def test_default_not_shared():
+    assert test_opt_as_bitmask().header_field is not test_opt_as_bitmask().header_field
+    assert test_opt_as_bitmask().int32_array_field is not test_opt_as_bitmask().int32_array_field
+
+
+def test_roundtrip():
+    msg = test_opt_as_bitmask(int32_field=42, int32_array_field=[4, 2], time_field=genpy.Time(4, 2))
+    received = roundtrip(msg)
+    assert received == msg
+    assert pyros_msgs.opt_as_bitmask.set_slots(received) == ['int32_field', 'time_field', 'int32_array_field']
+    assert pyros_msgs.opt_as_bitmask.set_slots(roundtrip(test_opt_as_bitmask())) == []
+
+
+def test_pickle_and_copy():
+    msg = test_opt_as_bitmask(string_field='fortytwo')
+    for received in (pickle.loads(pickle.dumps(msg)), copy.deepcopy(msg)):
+        assert received == msg
+        assert pyros_msgs.opt_as_bitmask.set_slots(received) == ['string_field']
+
+
+def test_wrong_message_type():
+    with nose.tools.assert_raises(TypeError):
+        pyros_msgs.opt_as_bitmask.duck_punch(std_msgs.Header, ['seq'])
+
+
+# Just in case we run this directly
+if __name__ == '__main__':
+    nose.runmodule(__name__)
@@ -0,0 +1,38 @@
+from __future__ import absolute_import
+from __future__ import print_function
+
+try:
+    import genpy
+    from pyros_msgs.opt_as_nested import opt_int16, opt_time, build_many
+except ImportError:
+    # Because we need to access Ros message types here (from ROS env or from virtualenv, or from somewhere else)
+    import pyros_setup
+    # We rely on default configuration to point us ot the proper distro
+    pyros_setup.configurable_import().configure().activate()
+    import genpy
+    from pyros_msgs.opt_as_nested import opt_int16, opt_time, build_many
+
+import nose
+
+
+def test_build_many():
+    msgs = build_many(opt_int16, {'data': [42, None]})
+    assert [(msg.initialized_, msg.data) for msg in msgs] == [(True, 42), (False, 0)]
+    assert msgs[0] == opt_int16(data=42)
+    assert msgs[1] == opt_int16()
+
+
+def test_build_many_default_not_shared():
+    msgs = build_many(opt_time, {'data': [None, None]})
+    assert msgs[0].data == genpy.Time()
+    assert msgs[0].data is not msgs[1].data
+
+
+def test_build_many_force_init_excepts():
+    with nose.tools.assert_raises(AttributeError):
+        build_many(opt_int16, {'initialized_': [True]})
+
+
+# Just in case we run this directly
+if __name__ == '__main__':
+    nose.runmodule(__name__)
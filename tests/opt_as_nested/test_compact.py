@@ -0,0 +1,95 @@
+from __future__ import absolute_import
+from __future__ import print_function
+
+from io import BytesIO
+
+try:
+    import genpy
+    from pyros_msgs.opt_as_nested import opt_header, opt_int8, opt_int32, compact
+    from pyros_msgs.msg import test_opt_as_nested  # a message type with optional fields, just for testing
+    import std_msgs.msg as std_msgs
+except ImportError:
+    # Because we need to access Ros message types here (from ROS env or from virtualenv, or from somewhere else)
+    import pyros_setup
+    # We rely on default configuration to point us ot the proper distro
+    pyros_setup.configurable_import().configure().activate()
+    import genpy
+    from pyros_msgs.opt_as_nested import opt_header, opt_int8, opt_int32, compact
+    from pyros_msgs.msg import test_opt_as_nested  # a message type with optional fields, just for testing
+    import std_msgs.msg as std_msgs
+
+import nose
+
+
+def serialize(msg):
+    buff = BytesIO()
+    msg.serialize(buff)
+    return buff.getvalue()
+
+
+def serialize_compact(msg):
+    buff = BytesIO()
+    compact.serialize(msg, buff)
+    return buff.getvalue()
+
+
+def test_uninitialized_flag_only():
+    assert serialize_compact(opt_header()) == b'\x00'
+    assert serialize_compact(opt_int8()) == b'\x00'
+
+
+def test_initialized_as_ros():
+    msg = opt_header(data=std_msgs.Header(seq=42, frame_id='fortytwo'))
+    assert serialize_compact(msg) == serialize(msg)
+
+
+def test_uninitialized_roundtrip():
+    msg = compact.deserialize(opt_header, serialize_compact(opt_header()))
+    assert msg.initialized_ is False
+    assert msg.data == std_msgs.Header()
+
+
+def test_initialized_roundtrip():
+    msg = compact.deserialize(opt_int8, serialize_compact(opt_int8(data=42)))
+    assert msg.initialized_ is True
+    assert msg.data == 42
+
+
+def test_parent_uninitialized_flags_only():
+    msg = test_opt_as_nested(int32_array_field=[4, 2])
+    assert serialize_compact(msg) == b'\x00\x00' + serialize(msg)[-12:]
+
+
+def test_parent_roundtrip():
+    for msg in (
+        test_opt_as_nested(),
+        test_opt_as_nested(int32_field=opt_int32(data=42)),
+        test_opt_as_nested(header_field=opt_header(data=std_msgs.Header(seq=42, frame_id='fortytwo')), int32_array_field=[4, 2]),
+    ):
+        assert compact.deserialize(test_opt_as_nested, serialize_compact(msg)) == msg
+
+
+def test_read_end_offset():
+    msgs = [opt_int8(), opt_int8(data=42), opt_int8()]
+    buf = b''.join(serialize_compact(msg) for msg in msgs)
+    offset, read = 0, []
+    while offset < len(buf):
+        msg, offset = compact.read(opt_int8, buf, offset)
+        read.append(msg)
+    assert read == msgs
+    assert offset == len(buf) == 4
+
+
+def test_not_optional_as_ros():
+    msg = std_msgs.Header(seq=42, frame_id='fortytwo')
+    assert serialize_compact(msg) == serialize(msg)
+
+
+def test_underfill_excepts():
+    with nose.tools.assert_raises(genpy.DeserializationError):
+        compact.deserialize(opt_int8, b'\x01')
+
+
+# Just in case we run this directly
+if __name__ == '__main__':
+    nose.runmodule(__name__)
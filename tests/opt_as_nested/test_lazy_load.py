@@ -0,0 +1,60 @@
+from __future__ import absolute_import
+from __future__ import print_function
+
+import subprocess
+import sys
+
+try:
+    import pyros_msgs.opt_as_nested
+    from pyros_msgs.opt_as_nested import opt_float32, opt_float64
+except ImportError:
+    # Because we need to access Ros message types here (from ROS env or from virtualenv, or from somewhere else)
+    import pyros_setup
+    # We rely on default configuration to point us ot the proper distro
+    pyros_setup.configurable_import().configure().activate()
+    import pyros_msgs.opt_as_nested
+    from pyros_msgs.opt_as_nested import opt_float32, opt_float64
+
+import nose
+
+
+def test_opt_float32():
+    assert opt_float32._type == 'pyros_msgs/opt_float32'
+    assert opt_float32 is not opt_float64
+    assert opt_float32._slot_types[1] == 'float32'
+
+
+def test_load():
+    assert pyros_msgs.opt_as_nested.load('opt_int32') is pyros_msgs.opt_as_nested.opt_int32
+    with nose.tools.assert_raises(AttributeError):
+        pyros_msgs.opt_as_nested.load('opt_int128')
+
+
+# checking what is imported and duck punched needs a new process, other tests already accessed the types
+lazy_access = """
+import sys
+import pyros_msgs.opt_as_nested
+from pyros_msgs import registry
+from pyros_msgs.opt_as_nested import opt_as_nested
+assert not opt_as_nested._loaded
+assert 'opt_int32' not in vars(pyros_msgs.opt_as_nested)
+# genpy, numpy and our generated messages are not imported before accessing a message type
+assert not [m for m in ('genpy', 'numpy', 'pyros_msgs.msg') if m in sys.modules], sorted(sys.modules)
+msg_mod = pyros_msgs.opt_as_nested.opt_int32
+assert 'genpy' in sys.modules and 'pyros_msgs.msg' in sys.modules
+assert sorted(opt_as_nested._loaded) == ['opt_int32']
+assert vars(pyros_msgs.opt_as_nested)['opt_int32'] is msg_mod
+assert [m._type for m in registry.patched()] == ['pyros_msgs/opt_int32']
+assert msg_mod().initialized_ is False
+"""
+
+
+def test_lazy_import():
+    if sys.version_info < (3, 7):
+        raise nose.SkipTest("all message types are loaded on import before python 3.7")
+    subprocess.check_call([sys.executable, '-c', lazy_access])
+
+
+# Just in case we run this directly
+if __name__ == '__main__':
+    nose.runmodule(__name__)
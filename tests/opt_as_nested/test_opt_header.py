@@ -0,0 +1,54 @@
+from __future__ import absolute_import
+from __future__ import print_function
+
+try:
+    import genpy
+    from pyros_msgs.opt_as_nested import opt_header
+    import std_msgs.msg as std_msgs
+except ImportError:
+    # Because we need to access Ros message types here (from ROS env or from virtualenv, or from somewhere else)
+    import pyros_setup
+    # We rely on default configuration to point us ot the proper distro
+    pyros_setup.configurable_import().configure().activate()
+    import genpy
+    from pyros_msgs.opt_as_nested import opt_header
+    import std_msgs.msg as std_msgs
+
+import nose
+
+
+def test_init_data():
+    h = std_msgs.Header(seq=42, frame_id='fortytwo')
+    msg = opt_header(data=h)
+    assert msg.initialized_ is True
+    assert msg.data is h
+
+
+def test_init_default():
+    msg = opt_header()
+    assert msg.initialized_ is False
+    assert msg.data == std_msgs.Header()  # default value from genpy
+
+
+def test_init_default_not_shared():
+    msg = opt_header()
+    msg.data.seq = 42
+    assert opt_header().data.seq == 0
+
+
+def test_init_default_lazy():
+    msg = opt_header()
+    data = msg.data
+    assert msg.data is data  # built only once, on first read
+    assert msg.initialized_ is False
+
+
+def test_force_init_excepts():
+    with nose.tools.assert_raises(AttributeError) as cm:
+        opt_header(initialized_=True)
+    assert str(cm.exception) == "The field 'initialized_' is an internal field of pyros_msgs/opt_header and should not be set by the user."
+
+
+# Just in case we run this directly
+if __name__ == '__main__':
+    nose.runmodule(__name__)
@@ -0,0 +1,58 @@
+from __future__ import absolute_import
+from __future__ import print_function
+
+try:
+    import genpy
+    import pyros_msgs.opt_as_nested
+    from pyros_msgs.opt_as_nested import opt_uint8
+except ImportError:
+    # Because we need to access Ros message types here (from ROS env or from virtualenv, or from somewhere else)
+    import pyros_setup
+    # We rely on default configuration to point us ot the proper distro
+    pyros_setup.configurable_import().configure().activate()
+    import genpy
+    import pyros_msgs.opt_as_nested
+    from pyros_msgs.opt_as_nested import opt_uint8
+
+import nose
+
+from pyros_msgs import msg_loader
+from pyros_msgs import typecache
+
+# a message type like opt_uint8, just for testing : duck punching opt_uint8 itself would change it for other tests
+strict_opt_uint8 = msg_loader.load_message_from_string(opt_uint8._full_text, 'test_strict_opt_uint8')
+typecache.message_classes[strict_opt_uint8._type] = strict_opt_uint8  # for registry snapshots to find it
+# patching, rejecting values out of range
+pyros_msgs.opt_as_nested.opt_as_nested.duck_punch(strict_opt_uint8, 0, strict=True)
+
+
+def test_init_data():
+    msg = strict_opt_uint8(data=42)
+    assert msg.initialized_ is True
+    assert msg.data == 42
+
+
+def test_init_default():
+    msg = strict_opt_uint8()
+    assert msg.initialized_ is False
+    assert msg.data == 0
+
+
+def test_init_except_range():
+    with nose.tools.assert_raises(TypeError) as cm:
+        strict_opt_uint8(data=420)
+    assert str(cm.exception) == "value '420' is out of range for type uint8"
+
+
+def test_init_raw_except_range():
+    with nose.tools.assert_raises(TypeError):
+        strict_opt_uint8(-42)
+
+
+def test_opt_uint8_not_strict():
+    assert opt_uint8(data=420).data == 420  # rejected on serialization only
+
+
+# Just in case we run this directly
+if __name__ == '__main__':
+    nose.runmodule(__name__)
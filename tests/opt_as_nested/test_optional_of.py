@@ -0,0 +1,119 @@
+from __future__ import absolute_import
+from __future__ import print_function
+
+import os
+import pickle
+import shutil
+import tempfile
+from io import BytesIO
+
+try:
+    import genpy
+    from pyros_msgs.opt_as_nested import optional_of, opt_int32, opt_header
+    import std_msgs.msg as std_msgs
+except ImportError:
+    # Because we need to access Ros message types here (from ROS env or from virtualenv, or from somewhere else)
+    import pyros_setup
+    # We rely on default configuration to point us ot the proper distro
+    pyros_setup.configurable_import().configure().activate()
+    import genpy
+    from pyros_msgs.opt_as_nested import optional_of, opt_int32, opt_header
+    import std_msgs.msg as std_msgs
+
+import nose
+
+from pyros_msgs import msg_loader
+from pyros_msgs import registry
+from pyros_msgs import typecache
+
+
+def _roundtrip(msg):
+    buff = BytesIO()
+    msg.serialize(buff)
+    return type(msg)().deserialize(buff.getvalue())
+
+
+def test_cached_per_data_type():
+    assert optional_of('int32[]') is optional_of('int32[]')
+    assert optional_of('int32[]') is not optional_of('int32[4]')
+
+
+def test_generated_types_reused():
+    assert optional_of('int32') is opt_int32
+    assert optional_of('std_msgs/Header') is opt_header
+    assert optional_of('Header') is opt_header
+
+
+def test_definition():
+    msg_mod = optional_of('std_msgs/Header[]')
+    assert msg_mod._type == 'pyros_msgs/opt_std_msgs_Header_array'
+    assert msg_mod._full_text.startswith('bool initialized_\nstd_msgs/Header[] data\n')
+    assert 'MSG: std_msgs/Header' in msg_mod._full_text
+    assert typecache.get_message_class(msg_mod._type) is msg_mod
+
+
+def test_md5sum():
+    # the md5sum does not depend on the name of the message type
+    msg_mod = msg_loader.load_message_from_string('bool initialized_\nint32 data\n', 'opt_int32_copy')
+    assert msg_mod._md5sum == opt_int32._md5sum
+
+
+def test_md5sum_dependency_changed():
+    msg_text = 'bool initialized_\nstd_msgs/Header data\n'
+    search_dir = tempfile.mkdtemp()
+    try:
+        msg_mod = msg_loader.load_message_from_string(msg_text, 'opt_std_msgs_Header_copy', cache_dir=search_dir)
+        assert msg_mod._md5sum == opt_header._md5sum
+        # another definition of std_msgs/Header, in the search path
+        with open(os.path.join(search_dir, 'Header.msg'), 'w') as f:
+            f.write('uint32 seq\ntime stamp\nstring frame_id\nstring child_frame_id\n')
+        changed = msg_loader.load_message_from_string(msg_text, 'opt_std_msgs_Header_copy', cache_dir=search_dir,
+                                                      search_path={'std_msgs': [search_dir]})
+        assert changed._md5sum != opt_header._md5sum
+        assert 'child_frame_id' in changed._full_text
+    finally:
+        shutil.rmtree(search_dir)
+
+
+def test_array():
+    msg_mod = optional_of('int32[]')
+    msg = msg_mod()
+    assert msg.initialized_ is False
+    assert msg.data == []
+    msg = _roundtrip(msg_mod(data=[4, 2]))
+    assert msg.initialized_ is True
+    assert list(msg.data) == [4, 2]
+
+
+def test_fixed_size_array_default_not_shared():
+    msg_mod = optional_of('float64[3]')
+    msg = msg_mod()
+    assert msg.data == [0., 0., 0.]
+    msg.data[0] = 42.
+    assert msg_mod().data == [0., 0., 0.]
+
+
+def test_message_array():
+    msg_mod = optional_of('std_msgs/Header[]')
+    msg = _roundtrip(msg_mod(data=[std_msgs.Header(seq=42, frame_id='fortytwo')]))
+    assert msg.initialized_ is True
+    assert msg.data[0].seq == 42
+    assert msg.data[0].frame_id == 'fortytwo'
+
+
+def test_registry_snapshot():
+    msg_mod = optional_of('std_msgs/Header[2]')
+    patches = pickle.loads(pickle.dumps(registry.snapshot()))
+    assert msg_mod._type in [msg_type for msg_type, _, _ in patches]
+    registry.restore(patches)
+    assert msg_mod().data == [std_msgs.Header(), std_msgs.Header()]
+
+
+def test_unqualified_message_type_excepts():
+    with nose.tools.assert_raises(ValueError):
+        optional_of('Pose')
+
+
+# Just in case we run this directly
+if __name__ == '__main__':
+    nose.runmodule(__name__)
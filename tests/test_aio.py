@@ -0,0 +1,107 @@
+from __future__ import absolute_import
+from __future__ import print_function
+
+import socket
+import sys
+import threading
+
+import nose
+
+if sys.version_info < (3, 5):
+    raise nose.SkipTest("asyncio streams need python 3.5 or later")
+
+import asyncio
+
+try:
+    import genpy
+    import std_msgs.msg as std_msgs
+    import pyros_msgs.opt_as_array
+    from pyros_msgs import aio
+    from pyros_msgs.opt_as_nested import opt_header
+    from pyros_msgs.msg import test_opt_int32_as_array  # a message type just for testing
+except ImportError:
+    # Because we need to access Ros message types here (from ROS env or from virtualenv, or from somewhere else)
+    import pyros_setup
+    # We rely on default configuration to point us ot the proper distro
+    pyros_setup.configurable_import().configure().activate()
+    import genpy
+    import std_msgs.msg as std_msgs
+    import pyros_msgs.opt_as_array
+    from pyros_msgs import aio
+    from pyros_msgs.opt_as_nested import opt_header
+    from pyros_msgs.msg import test_opt_int32_as_array  # a message type just for testing
+
+
+msgs = None
+
+
+def setup_module():
+    global msgs
+    pyros_msgs.opt_as_array.duck_punch(test_opt_int32_as_array, ['data'])
+    msgs = [test_opt_int32_as_array(data=i) if i % 3 else test_opt_int32_as_array() for i in range(100)]
+
+
+def decode_all(pieces, msg_class, **kwargs):
+    """Send pieces of a stream on a socketpair, from another thread, and decode all of it"""
+    loop = asyncio.new_event_loop()
+    receiving, sending = socket.socketpair()
+
+    def send():
+        with sending:
+            for piece in pieces:
+                sending.sendall(piece)
+
+    sender = threading.Thread(target=send)
+    sender.start()
+    try:
+        reader, writer = loop.run_until_complete(asyncio.open_connection(sock=receiving))
+        stream = aio.decode(reader, msg_class, **kwargs)
+        decoded = []
+        try:
+            while True:
+                decoded.append(loop.run_until_complete(stream.__anext__()))
+        except StopAsyncIteration:
+            pass
+        finally:
+            writer.close()
+        return decoded
+    finally:
+        sender.join()
+        loop.close()
+
+
+def test_decode():
+    assert decode_all([aio.frame(msgs)], test_opt_int32_as_array) == msgs
+
+
+def test_decode_incremental():
+    # the stream arrives in small pieces, cutting messages and their lengths
+    stream = aio.frame(msgs)
+    pieces = [stream[i:i + 3] for i in range(0, len(stream), 3)]
+    assert decode_all(pieces, test_opt_int32_as_array, read_size=5) == msgs
+
+
+def test_decode_batches():
+    batches = decode_all([aio.frame(msgs)], test_opt_int32_as_array, batch_size=16)
+    assert all(1 <= len(b) <= 16 for b in batches)
+    assert [msg for b in batches for msg in b] == msgs
+
+
+def test_decode_nested():
+    headers = [opt_header(data=std_msgs.Header(seq=42, stamp=genpy.Time(4, 2), frame_id='fortytwo')), opt_header()]
+    assert decode_all([aio.frame(headers)], opt_header) == headers
+
+
+def test_decode_incomplete():
+    with nose.tools.assert_raises(asyncio.IncompleteReadError):
+        decode_all([aio.frame(msgs)[:-1]], test_opt_int32_as_array)
+
+
+def test_decode_corrupted():
+    with nose.tools.assert_raises(ValueError):
+        decode_all([b'\xff\xff\xff\xff'], test_opt_int32_as_array)
+
+
+# Just in case we run this directly
+if __name__ == '__main__':
+    nose.runmodule(__name__)
@@ -0,0 +1,90 @@
+from __future__ import absolute_import
+from __future__ import print_function
+
+import sys
+import warnings
+from io import BytesIO
+
+try:
+    import genpy
+    import std_msgs.msg as std_msgs
+    import pyros_msgs.opt_as_array
+    from pyros_msgs import batch
+    from pyros_msgs.opt_as_nested import opt_header
+    from pyros_msgs.msg import test_opt_int32_as_array, test_opt_string_as_array  # message types just for testing
+except ImportError:
+    # Because we need to access Ros message types here (from ROS env or from virtualenv, or from somewhere else)
+    import pyros_setup
+    # We rely on default configuration to point us ot the proper distro
+    pyros_setup.configurable_import().configure().activate()
+    import genpy
+    import std_msgs.msg as std_msgs
+    import pyros_msgs.opt_as_array
+    from pyros_msgs import batch
+    from pyros_msgs.opt_as_nested import opt_header
+    from pyros_msgs.msg import test_opt_int32_as_array, test_opt_string_as_array  # message types just for testing
+
+import nose
+
+
+def setup_module():
+    pyros_msgs.opt_as_array.duck_punch(test_opt_int32_as_array, ['data'])
+    pyros_msgs.opt_as_array.duck_punch(test_opt_string_as_array, ['data'])
+
+
+def serialize(msg):
+    buff = BytesIO()
+    msg.serialize(buff)
+    return buff.getvalue()
+
+
+def test_serialize_many():
+    msgs = [test_opt_int32_as_array(data=42), test_opt_int32_as_array(), test_opt_int32_as_array(data=[4, 2])]
+    buf, offsets = batch.serialize_many(msgs)
+    assert isinstance(buf, bytearray)
+    assert list(offsets) == [0, 8, 12, 24]
+    assert all(bytes(buf[offsets[i]:offsets[i + 1]]) == serialize(msg) for i, msg in enumerate(msgs))
+    # reusing the buffer
+    assert batch.serialize_many(msgs[:1], buf)[0] is buf and bytes(buf) == serialize(msgs[0])
+
+
+def test_serialize_many_keeps_storage():
+    msgs = [test_opt_string_as_array(data='fortytwo' * (i % 4)) for i in range(1000)]
+    buf, _ = batch.serialize_many(msgs)
+    allocated = sys.getsizeof(buf)
+    for batch_msgs in (msgs[::-1], msgs[:900], msgs):
+        assert batch.serialize_many(batch_msgs, buf)[0] is buf
+        assert sys.getsizeof(buf) == allocated
+    assert bytes(buf) == b''.join(serialize(msg) for msg in msgs)
+
+
+def test_serialize_many_types():
+    with nose.tools.assert_raises(TypeError):
+        batch.serialize_many([test_opt_int32_as_array(), test_opt_string_as_array()])
+
+
+def test_deserialize_many():
+    msgs = [opt_header(data=std_msgs.Header(seq=42, stamp=genpy.Time(4, 2), frame_id='fortytwo')), opt_header()]
+    buf, offsets = batch.serialize_many(msgs)
+    assert batch.deserialize_many(opt_header, buf, offsets) == msgs
+    assert batch.deserialize_many(opt_header, memoryview(buf)) == msgs
+    with nose.tools.assert_raises(genpy.DeserializationError):
+        batch.deserialize_many(opt_header, buf[:-1])
+
+
+def test_deserialize_many_fast_serialize():
+    msgs = [test_opt_string_as_array(data='forty two'), test_opt_string_as_array()]
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        pyros_msgs.opt_as_array.duck_punch(test_opt_string_as_array, ['data'], fast_serialize=True)
+        try:
+            buf, offsets = batch.serialize_many(msgs)
+            assert batch.deserialize_many(test_opt_string_as_array, buf, offsets) == msgs
+            assert batch.deserialize_many(test_opt_string_as_array, buf) == msgs
+        finally:
+            pyros_msgs.opt_as_array.duck_punch(test_opt_string_as_array, ['data'])
+
+
+# Just in case we run this directly
+if __name__ == '__main__':
+    nose.runmodule(__name__)
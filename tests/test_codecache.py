@@ -0,0 +1,80 @@
+from __future__ import absolute_import
+from __future__ import print_function
+
+import os
+import shutil
+import tempfile
+
+try:
+    import pyros_msgs.msg
+    import pyros_msgs.opt_as_array
+    from pyros_msgs import codecache
+    from pyros_msgs.opt_as_array import opt_as_array
+except ImportError:
+    # Because we need to access Ros message types here (from ROS env or from virtualenv, or from somewhere else)
+    import pyros_setup
+    # We rely on default configuration to point us ot the proper distro
+    pyros_setup.configurable_import().configure().activate()
+    import pyros_msgs.msg
+    import pyros_msgs.opt_as_array
+    from pyros_msgs import codecache
+    from pyros_msgs.opt_as_array import opt_as_array
+
+import nose
+
+cache_dir = None
+
+
+def setup_module():
+    global cache_dir
+    cache_dir = tempfile.mkdtemp()
+    codecache.enable(cache_dir)
+
+
+def teardown_module():
+    codecache.disable()
+    shutil.rmtree(cache_dir)
+
+
+def test_cache_key():
+    msg_class = pyros_msgs.msg.test_opt_int32_as_array
+    assert codecache.cache_key(msg_class, 'opt_as_array.__init__', ('data',)) == codecache.cache_key(msg_class, 'opt_as_array.__init__', ('data',))
+    assert codecache.cache_key(msg_class, 'opt_as_array.__init__', ('data',)) != codecache.cache_key(msg_class, 'opt_as_array.__init__', ())
+    assert codecache.cache_key(msg_class, 'opt_as_array.__init__', ('data',)) != codecache.cache_key(pyros_msgs.msg.test_opt_int64_as_array, 'opt_as_array.__init__', ('data',))
+
+
+def test_duck_punch_cached():
+    msg_class = pyros_msgs.msg.test_opt_int32_as_array
+    pyros_msgs.opt_as_array.duck_punch(msg_class, ['data'], validation=pyros_msgs.opt_as_array.OFF)
+    cached = set(os.listdir(cache_dir))
+    pyros_msgs.opt_as_array.duck_punch(msg_class, ['data'])
+    assert set(os.listdir(cache_dir)) - cached
+
+    # duck punching again (like in a new process) loads the plan and the code, without analysis or compilation
+    plan_init, compile_init = opt_as_array._plan_init, opt_as_array._compile_init
+    opt_as_array._plan_init = opt_as_array._compile_init = None
+    try:
+        pyros_msgs.opt_as_array.duck_punch(msg_class, ['data'], strict=True)
+    finally:
+        opt_as_array._plan_init, opt_as_array._compile_init = plan_init, compile_init
+
+    assert msg_class(data=42).data == [42]
+    assert msg_class().data == []
+    with nose.tools.assert_raises(AttributeError):
+        msg_class(data=2 ** 31)  # validators are built again, with the strict option
+    pyros_msgs.opt_as_array.duck_punch(msg_class, ['data'])
+
+
+def test_corrupted_cache():
+    msg_class = pyros_msgs.msg.test_opt_int64_as_array
+    pyros_msgs.opt_as_array.duck_punch(msg_class, ['data'])
+    for f in os.listdir(cache_dir):
+        with open(os.path.join(cache_dir, f), 'wb') as cached:
+            cached.write(b'not marshalled code')
+    pyros_msgs.opt_as_array.duck_punch(msg_class, ['data'])
+    assert msg_class(data=42).data == [42]
+
+
+# Just in case we run this directly
+if __name__ == '__main__':
+    nose.runmodule(__name__)
@@ -0,0 +1,128 @@
+from __future__ import absolute_import
+from __future__ import print_function
+
+try:
+    import genpy
+    import std_msgs.msg as std_msgs
+    import pyros_msgs.opt_as_array
+    import pyros_msgs.opt_as_bitmask
+    from pyros_msgs.opt_as_nested import opt_int32, opt_header
+    from pyros_msgs.msg import test_opt_int32_as_array  # a message type just for testing
+    from pyros_msgs.msg import test_opt_as_nested  # a message type with optional fields, just for testing
+    from pyros_msgs.msg import test_opt_as_bitmask  # a message type with presence bits, just for testing
+    from pyros_msgs import convert
+except ImportError:
+    # Because we need to access Ros message types here (from ROS env or from virtualenv, or from somewhere else)
+    import pyros_setup
+    # We rely on default configuration to point us ot the proper distro
+    pyros_setup.configurable_import().configure().activate()
+    import genpy
+    import std_msgs.msg as std_msgs
+    import pyros_msgs.opt_as_array
+    import pyros_msgs.opt_as_bitmask
+    from pyros_msgs.opt_as_nested import opt_int32, opt_header
+    from pyros_msgs.msg import test_opt_int32_as_array  # a message type just for testing
+    from pyros_msgs.msg import test_opt_as_nested  # a message type with optional fields, just for testing
+    from pyros_msgs.msg import test_opt_as_bitmask  # a message type with presence bits, just for testing
+    from pyros_msgs import convert
+
+# patching
+pyros_msgs.opt_as_array.duck_punch(test_opt_int32_as_array, ['data'])
+pyros_msgs.opt_as_array.duck_punch(test_opt_as_nested, ['int32_array_field'])
+pyros_msgs.opt_as_bitmask.duck_punch(test_opt_as_bitmask, ['int32_field', 'string_field', 'time_field', 'header_field', 'int32_array_field'])
+
+import nose
+
+
+def test_from_dict_opt_as_array():
+    assert convert.from_dict(test_opt_int32_as_array, {'data': 42}).data == [42]
+    assert convert.from_dict(test_opt_int32_as_array, {}).data == []
+
+
+def test_from_dict_opt_as_nested():
+    msg = convert.from_dict(opt_int32, {'data': 42})
+    assert msg.initialized_ is True and msg.data == 42
+    assert convert.from_dict(opt_int32, {}).initialized_ is False
+
+
+def test_from_dict_nested_message():
+    msg = convert.from_dict(opt_header, {'data': {'seq': 42, 'stamp': {'secs': 4, 'nsecs': 2}}})
+    assert msg.data == std_msgs.Header(seq=42, stamp=genpy.Time(4, 2))
+
+
+def test_from_dicts_type_name():
+    msgs = convert.from_dicts('pyros_msgs/test_opt_int32_as_array', iter([{'data': 42}, {}]))
+    assert [msg.data for msg in msgs] == [[42], []]
+
+
+def test_from_dicts_raise():
+    msgs = convert.from_dicts(test_opt_int32_as_array, [{'data': 'fortytwo'}])
+    with nose.tools.assert_raises(AttributeError):
+        list(msgs)
+
+
+def test_from_dicts_skip():
+    msgs = convert.from_dicts(test_opt_int32_as_array, [{'data': 'fortytwo'}, {'data': 42}], on_error=convert.SKIP)
+    assert [msg.data for msg in msgs] == [[42]]
+
+
+def test_from_dicts_collect():
+    errors = []
+    msgs = convert.from_dicts(test_opt_int32_as_array, [{'fortytwo': 42}, {'data': 42}], on_error=convert.COLLECT, errors=errors)
+    assert [msg.data for msg in msgs] == [[42]]
+    assert len(errors) == 1
+    assert errors[0][0] == 0
+    assert isinstance(errors[0][2], AttributeError)
+
+
+def test_to_dict_opt_as_array():
+    assert convert.to_dict(test_opt_int32_as_array(data=42)) == {'data': 42}
+    assert convert.to_dict(test_opt_int32_as_array(data=[4, 2])) == {'data': [4, 2]}
+    assert convert.to_dict(test_opt_int32_as_array()) == {}
+    assert convert.to_dict(test_opt_int32_as_array(), unset_as_none=True) == {'data': None}
+
+
+def test_to_dict_opt_as_nested():
+    assert convert.to_dict(opt_int32(data=42)) == {'data': 42}
+    assert convert.to_dict(opt_int32()) == {}
+    assert convert.to_dict(opt_header(data=std_msgs.Header(seq=42, stamp=genpy.Time(4, 2)))) == {
+        'data': {'seq': 42, 'stamp': {'secs': 4, 'nsecs': 2}, 'frame_id': ''}
+    }
+
+
+def test_dict_roundtrip():
+    for msg in (test_opt_int32_as_array(data=42), test_opt_int32_as_array(), opt_header(data=std_msgs.Header(seq=42)), opt_header()):
+        assert convert.from_dict(type(msg), convert.to_dict(msg)) == msg
+        assert convert.from_dict(type(msg), convert.to_dict(msg, unset_as_none=True)) == msg
+
+
+def test_dict_roundtrip_optional_fields():
+    for msg in (
+        test_opt_as_nested(),
+        test_opt_as_nested(int32_field=opt_int32(data=42), header_field=opt_header(data=std_msgs.Header(seq=42))),
+        test_opt_as_nested(int32_array_field=[4, 2]),
+    ):
+        assert convert.from_dict(type(msg), convert.to_dict(msg)) == msg
+        assert convert.from_dict(type(msg), convert.to_dict(msg, unset_as_none=True)) == msg
+
+
+
+def test_dict_roundtrip_presence_bits():
+    for msg in (
+        test_opt_as_bitmask(),
+        test_opt_as_bitmask(int32_field=42, header_field=std_msgs.Header(seq=42), bool_field=True),
+        test_opt_as_bitmask(string_field='fortytwo', time_field=genpy.Time(4, 2), int32_array_field=[4, 2]),
+    ):
+        for d in (convert.to_dict(msg), convert.to_dict(msg, unset_as_none=True)):
+            converted = convert.from_dict(type(msg), d)
+            assert converted.presence_ == msg.presence_
+            assert converted == msg
+
+def test_json_roundtrip():
+    msg = opt_header(data=std_msgs.Header(seq=42, stamp=genpy.Time(4, 2), frame_id='fortytwo'))
+    assert convert.from_json('pyros_msgs/opt_header', convert.to_json(msg)) == msg
+
+
+# Just in case we run this directly
+if __name__ == '__main__':
+    nose.runmodule(__name__)
@@ -0,0 +1,103 @@
+from __future__ import absolute_import
+from __future__ import print_function
+
+import os
+import shutil
+import tempfile
+
+try:
+    import std_msgs.msg as std_msgs
+    import pyros_msgs.msg
+    from pyros_msgs import msg_loader
+except ImportError:
+    # Because we need to access Ros message types here (from ROS env or from virtualenv, or from somewhere else)
+    import pyros_setup
+    # We rely on default configuration to point us ot the proper distro
+    pyros_setup.configurable_import().configure().activate()
+    import std_msgs.msg as std_msgs
+    import pyros_msgs.msg
+    from pyros_msgs import msg_loader
+
+import nose
+
+cache_dir = None
+
+
+def setup_module():
+    global cache_dir
+    cache_dir = tempfile.mkdtemp()
+
+
+def teardown_module():
+    shutil.rmtree(cache_dir)
+
+
+def test_find_msg_files():
+    msg_files = msg_loader.find_msg_files()
+    assert 'opt_int8' in msg_files
+    assert 'test_opt_int8_as_array' in msg_files
+    assert all(os.path.isfile(f) for f in msg_files.values())
+
+
+def test_load_message_same_as_genpy():
+    loader = msg_loader.Loader(cache_dir=cache_dir, module_name='_test_msg_loader')
+    for name in ('opt_int8', 'opt_header', 'test_opt_string_as_array'):
+        msg_class = loader.load(name)
+        generated = getattr(pyros_msgs.msg, name)
+        assert msg_class is not generated
+        assert msg_class._md5sum == generated._md5sum
+        assert msg_class._full_text == generated._full_text
+        assert msg_class.__slots__ == generated.__slots__
+        assert msg_class._slot_types == generated._slot_types
+
+
+def test_load_message_cached():
+    msg_path = msg_loader.find_msg_files()['opt_header']
+    msg_class = msg_loader.load_message(msg_path, cache_dir=cache_dir, module_name='_test_msg_loader_cached')
+    cached = [f for f in os.listdir(cache_dir) if f.startswith('_opt_header_') and f.endswith('.py')]
+    assert len(cached) == 1
+
+    # next load imports the cached code, without generating it again
+    generate_source = msg_loader.generate_source
+    msg_loader.generate_source = None
+    try:
+        cached_class = msg_loader.load_message(msg_path, cache_dir=cache_dir, module_name='_test_msg_loader_cached')
+    finally:
+        msg_loader.generate_source = generate_source
+    assert cached_class._md5sum == msg_class._md5sum
+    assert cached_class(initialized_=True, data=std_msgs.Header(seq=42)).data.seq == 42
+
+
+def test_load_message_dependency_changed():
+    msg_path = msg_loader.find_msg_files()['opt_header']
+    msg_class = msg_loader.load_message(msg_path, cache_dir=cache_dir, module_name='_test_msg_loader_dependency')
+
+    # another definition of std_msgs/Header, in the search path
+    std_msgs_dir = os.path.join(cache_dir, 'std_msgs')
+    os.mkdir(std_msgs_dir)
+    with open(os.path.join(std_msgs_dir, 'Header.msg'), 'w') as f:
+        f.write('uint32 seq\ntime stamp\nstring frame_id\nstring child_frame_id\n')
+    changed_class = msg_loader.load_message(msg_path, cache_dir=cache_dir, search_path={'std_msgs': [std_msgs_dir]},
+                                            module_name='_test_msg_loader_dependency')
+    assert changed_class._md5sum != msg_class._md5sum
+    assert 'child_frame_id' in changed_class._full_text
+    cached = [f for f in os.listdir(cache_dir) if f.startswith('_opt_header_') and f.endswith('.py')]
+    assert len(cached) == 2
+
+
+def test_loader_module():
+    msg_module = msg_loader.Loader(cache_dir=cache_dir, module_name='_test_msg_loader_module').module()
+    assert 'opt_bool' in msg_module.__all__
+    assert msg_module.opt_bool(data=True).data is True
+    with nose.tools.assert_raises(AttributeError):
+        msg_module.not_a_message
+
+
+def test_loader_unknown_message():
+    with nose.tools.assert_raises(AttributeError):
+        msg_loader.Loader(cache_dir=cache_dir).load('not_a_message')
+
+
+# Just in case we run this directly
+if __name__ == '__main__':
+    nose.runmodule(__name__)
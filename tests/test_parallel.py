@@ -0,0 +1,56 @@
+from __future__ import absolute_import
+from __future__ import print_function
+
+try:
+    import std_msgs.msg as std_msgs
+    import pyros_msgs.opt_as_array
+    from pyros_msgs import batch, parallel
+    from pyros_msgs.opt_as_nested import opt_header
+    from pyros_msgs.msg import test_opt_int32_as_array  # a message type just for testing
+except ImportError:
+    # Because we need to access Ros message types here (from ROS env or from virtualenv, or from somewhere else)
+    import pyros_setup
+    # We rely on default configuration to point us ot the proper distro
+    pyros_setup.configurable_import().configure().activate()
+    import std_msgs.msg as std_msgs
+    import pyros_msgs.opt_as_array
+    from pyros_msgs import batch, parallel
+    from pyros_msgs.opt_as_nested import opt_header
+    from pyros_msgs.msg import test_opt_int32_as_array  # a message type just for testing
+
+import nose
+
+
+def setup_module():
+    pyros_msgs.opt_as_array.duck_punch(test_opt_int32_as_array, ['data'])
+
+
+def test_convert_serialize_in_order():
+    dicts = [{'data': i} if i % 3 else {} for i in range(100)]
+    buf, offsets = parallel.convert_serialize(test_opt_int32_as_array, iter(dicts), workers=2, chunk_size=7)
+    msgs = batch.deserialize_many(test_opt_int32_as_array, buf, offsets)
+    assert len(offsets) == 101
+    assert [list(msg.data) for msg in msgs] == [[d['data']] if d else [] for d in dicts]
+
+
+def test_convert_serialize_nested():
+    dicts = [{'data': {'seq': i, 'frame_id': 'fortytwo'}} for i in range(10)]
+    buf, offsets = parallel.convert_serialize('pyros_msgs/opt_header', dicts, workers=2, chunk_size=3)
+    msgs = batch.deserialize_many(opt_header, buf, offsets)
+    assert msgs == [opt_header(data=std_msgs.Header(seq=i, frame_id='fortytwo')) for i in range(10)]
+
+
+def test_convert_serialize_errors():
+    dicts = [{'data': 42}, {'data': 'not an int'}, {'data': 4}, {'not_a_field': 2}]
+    with nose.tools.assert_raises(AttributeError):
+        parallel.convert_serialize(test_opt_int32_as_array, dicts, workers=2, chunk_size=2)
+    errors = []
+    buf, offsets = parallel.convert_serialize(test_opt_int32_as_array, dicts, workers=2, chunk_size=2,
+                                              on_error=parallel.COLLECT, errors=errors)
+    assert [list(msg.data) for msg in batch.deserialize_many(test_opt_int32_as_array, buf, offsets)] == [[42], [4]]
+    assert [i for i, _, _ in errors] == [1, 3]
+
+
+# Just in case we run this directly
+if __name__ == '__main__':
+    nose.runmodule(__name__)
@@ -0,0 +1,83 @@
+from __future__ import absolute_import
+from __future__ import print_function
+
+import json
+
+try:
+    import pyros_msgs.opt_as_array
+    import pyros_msgs.opt_as_nested
+    from pyros_msgs import profiling
+    from pyros_msgs.msg import test_opt_int8_as_array, test_opt_float64_as_array
+except ImportError:
+    # Because we need to access Ros message types here (from ROS env or from virtualenv, or from somewhere else)
+    import pyros_setup
+    # We rely on default configuration to point us ot the proper distro
+    pyros_setup.configurable_import().configure().activate()
+    import pyros_msgs.opt_as_array
+    import pyros_msgs.opt_as_nested
+    from pyros_msgs import profiling
+    from pyros_msgs.msg import test_opt_int8_as_array, test_opt_float64_as_array
+
+import nose
+
+
+def setup_module():
+    pyros_msgs.opt_as_array.duck_punch(test_opt_int8_as_array, ['data'])
+    profiling.reset()
+    profiling.enable()
+
+
+def teardown_module():
+    profiling.disable()
+    profiling.reset()
+
+
+def test_counters():
+    test_opt_int8_as_array(data=42)
+    test_opt_int8_as_array()
+    with nose.tools.assert_raises(AttributeError):
+        test_opt_int8_as_array(data='fortytwo')
+
+    stats = profiling.stats('pyros_msgs/test_opt_int8_as_array')
+    assert stats['constructions'] == 3
+    assert stats['failures'] == 1
+    assert stats['default_fills'] == 1
+    assert stats['total_time'] > 0
+    assert sum(stats['histogram'].values()) == 3
+
+
+def test_opt_as_nested():
+    pyros_msgs.opt_as_nested.opt_bool(data=True)
+    pyros_msgs.opt_as_nested.opt_bool()
+    stats = profiling.stats('pyros_msgs/opt_bool')
+    assert stats['constructions'] == 2
+    assert stats['default_fills'] == 1
+
+
+def test_punched_after_enable():
+    pyros_msgs.opt_as_array.duck_punch(test_opt_float64_as_array, ['data'])
+    test_opt_float64_as_array(data=4.2)
+    assert profiling.stats('pyros_msgs/test_opt_float64_as_array')['constructions'] == 1
+
+
+def test_dump():
+    test_opt_int8_as_array(data=42)
+    dumped = json.loads(profiling.dump())
+    assert dumped['pyros_msgs/test_opt_int8_as_array']['constructions'] >= 1
+
+
+def test_disabled():
+    profiling.disable()
+    try:
+        init = test_opt_int8_as_array.__init__
+        assert not hasattr(init, '_profiled_init')
+        constructions = profiling.stats('pyros_msgs/test_opt_int8_as_array')['constructions']
+        test_opt_int8_as_array(data=42)
+        assert profiling.stats('pyros_msgs/test_opt_int8_as_array')['constructions'] == constructions
+    finally:
+        profiling.enable()
+
+
+# Just in case we run this directly
+if __name__ == '__main__':
+    nose.runmodule(__name__)
@@ -0,0 +1,105 @@
+from __future__ import absolute_import
+from __future__ import print_function
+
+import os
+import shutil
+import tempfile
+
+try:
+    import std_msgs.msg as std_msgs
+    import pyros_msgs.opt_as_array
+    import pyros_msgs.opt_as_bitmask
+    from pyros_msgs import recording
+    from pyros_msgs.opt_as_nested import opt_header
+    from pyros_msgs.msg import test_opt_int32_as_array, test_opt_as_bitmask  # message types just for testing
+except ImportError:
+    # Because we need to access Ros message types here (from ROS env or from virtualenv, or from somewhere else)
+    import pyros_setup
+    # We rely on default configuration to point us ot the proper distro
+    pyros_setup.configurable_import().configure().activate()
+    import std_msgs.msg as std_msgs
+    import pyros_msgs.opt_as_array
+    import pyros_msgs.opt_as_bitmask
+    from pyros_msgs import recording
+    from pyros_msgs.opt_as_nested import opt_header
+    from pyros_msgs.msg import test_opt_int32_as_array, test_opt_as_bitmask  # message types just for testing
+
+import nose
+
+record_dir = None
+
+
+def setup_module():
+    global record_dir
+    record_dir = tempfile.mkdtemp()
+    pyros_msgs.opt_as_array.duck_punch(test_opt_int32_as_array, ['data'])
+    pyros_msgs.opt_as_bitmask.duck_punch(test_opt_as_bitmask, ['int32_field', 'string_field', 'header_field'])
+
+
+def teardown_module():
+    shutil.rmtree(record_dir)
+
+
+def test_optional_fields():
+    assert [name for name, _ in recording.optional_fields(test_opt_int32_as_array)] == ['data']
+    assert [name for name, _ in recording.optional_fields(opt_header)] == ['data']
+    assert [name for name, _ in recording.optional_fields(test_opt_as_bitmask)] == ['int32_field', 'string_field', 'header_field']
+    assert recording.optional_fields(std_msgs.Header) == []
+
+
+def test_record_read():
+    path = os.path.join(record_dir, 'opt_int32.rec')
+    messages = [test_opt_int32_as_array(data=42), test_opt_int32_as_array(), test_opt_int32_as_array(data=[4, 2])]
+    with recording.Recorder(path, test_opt_int32_as_array) as recorder:
+        for msg in messages:
+            recorder.write(msg)
+    with recording.Reader(path) as reader:
+        assert reader.msg_class is test_opt_int32_as_array
+        assert list(reader) == messages
+        assert reader.where(present=['data']) == [0, 2]
+        assert reader.where(absent=['data']) == [1]
+        assert reader.presence(1) == []
+
+
+def test_where_bitmask():
+    path = os.path.join(record_dir, 'bitmask.rec')
+    with recording.Recorder(path, test_opt_as_bitmask) as recorder:
+        recorder.write(test_opt_as_bitmask(int32_field=42))
+        recorder.write(test_opt_as_bitmask(int32_field=42, string_field='fortytwo'))
+        recorder.write(test_opt_as_bitmask(header_field=std_msgs.Header(seq=42)))
+    with recording.Reader(path) as reader:
+        assert reader.where(present=['int32_field']) == [0, 1]
+        assert reader.where(present=['int32_field'], absent=['string_field']) == [0]
+        assert reader.presence(2) == ['header_field']
+        assert reader[2].header_field.seq == 42
+        with nose.tools.assert_raises(AttributeError):
+            reader.where(present=['bool_field'])
+
+
+def test_append_refresh():
+    path = os.path.join(record_dir, 'append.rec')
+    recorder = recording.Recorder(path, test_opt_int32_as_array)
+    reader = recording.Reader(path)
+    try:
+        assert len(reader) == 0
+        recorder.write(test_opt_int32_as_array(data=42))
+        recorder.flush()
+        reader.refresh()
+        assert len(reader) == 1 and list(reader[0].data) == [42]
+        # appending to another recording with the same messages
+        recorder.close()
+        recorder = recording.Recorder(path, test_opt_int32_as_array)
+        recorder.write(test_opt_int32_as_array())
+        recorder.flush()
+        reader.refresh()
+        assert reader.where(absent=['data']) == [1]
+    finally:
+        recorder.close()
+        reader.close()
+    with nose.tools.assert_raises(ValueError):
+        recording.Recorder(path, test_opt_as_bitmask)
+
+
+# Just in case we run this directly
+if __name__ == '__main__':
+    nose.runmodule(__name__)
@@ -0,0 +1,94 @@
+from __future__ import absolute_import
+from __future__ import print_function
+
+import pickle
+import threading
+import warnings
+
+try:
+    import pyros_msgs.opt_as_array
+    import pyros_msgs.opt_as_nested
+    from pyros_msgs import registry
+    from pyros_msgs.msg import test_opt_bool_as_array, test_opt_duration_as_array
+except ImportError:
+    # Because we need to access Ros message types here (from ROS env or from virtualenv, or from somewhere else)
+    import pyros_setup
+    # We rely on default configuration to point us ot the proper distro
+    pyros_setup.configurable_import().configure().activate()
+    import pyros_msgs.opt_as_array
+    import pyros_msgs.opt_as_nested
+    from pyros_msgs import registry
+    from pyros_msgs.msg import test_opt_bool_as_array, test_opt_duration_as_array
+
+import nose
+
+
+def test_patched():
+    pyros_msgs.opt_as_array.duck_punch(test_opt_bool_as_array, ['data'])
+    pattern, options = registry.patched(test_opt_bool_as_array)
+    assert pattern == 'opt_as_array'
+    assert options['opt_slot_list'] == ('data',)
+    assert registry.patched(pyros_msgs.opt_as_nested.opt_bool)[0] == 'opt_as_nested'
+
+
+def test_patch_idempotent():
+    pyros_msgs.opt_as_array.duck_punch(test_opt_bool_as_array, ['data'])
+    init = test_opt_bool_as_array.__init__
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        pyros_msgs.opt_as_array.duck_punch(test_opt_bool_as_array, ['data'])
+    assert test_opt_bool_as_array.__init__ is init
+
+
+def test_repatch_warns():
+    pyros_msgs.opt_as_array.duck_punch(test_opt_bool_as_array, ['data'])
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter('always')
+        pyros_msgs.opt_as_array.duck_punch(test_opt_bool_as_array, ['data'], strict=True)
+    assert [w.category for w in caught] == [registry.RepatchWarning]
+    assert registry.patched(test_opt_bool_as_array)[1]['strict'] is True
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        pyros_msgs.opt_as_array.duck_punch(test_opt_bool_as_array, ['data'])
+
+
+def test_patch_threads():
+    punched = []
+
+    def punch(msg_mod, **options):
+        punched.append(msg_mod)
+
+    class Message(object):
+        _type = 'test_registry/Message'
+
+    threads = [threading.Thread(target=registry.patch, args=(Message, 'opt_as_array', punch)) for _ in range(8)]
+    try:
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert punched == [Message]
+    finally:
+        registry._patched.pop(Message, None)
+
+
+def test_snapshot_restore():
+    pyros_msgs.opt_as_array.duck_punch(test_opt_duration_as_array, ['data'])
+    patches = pickle.loads(pickle.dumps(registry.snapshot()))
+    assert ('pyros_msgs/test_opt_duration_as_array', 'opt_as_array',
+            {'opt_slot_list': ('data',), 'strict': False, 'storage': 'list', 'validation': None, 'fast_serialize': False}) in patches
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')  # already duck punched the same way, nothing to do
+        registry.restore(patches)
+
+
+def test_preload():
+    pyros_msgs.opt_as_array.duck_punch(test_opt_duration_as_array, ['data'])
+    registry.preload()
+    assert test_opt_duration_as_array in pyros_msgs.opt_as_array.opt_as_array._builders
+    assert registry.patched(pyros_msgs.opt_as_nested.opt_header)[0] == 'opt_as_nested'
+
+
+# Just in case we run this directly
+if __name__ == '__main__':
+    nose.runmodule(__name__)
@@ -0,0 +1,53 @@
+from __future__ import absolute_import
+from __future__ import print_function
+
+try:
+    import std_msgs.msg as std_msgs
+    from pyros_msgs import typecache
+except ImportError:
+    # Because we need to access Ros message types here (from ROS env or from virtualenv, or from somewhere else)
+    import pyros_setup
+    # We rely on default configuration to point us ot the proper distro
+    pyros_setup.configurable_import().configure().activate()
+    import std_msgs.msg as std_msgs
+    from pyros_msgs import typecache
+
+import nose
+
+
+def test_get_message_class():
+    typecache.invalidate()
+    assert typecache.get_message_class('std_msgs/Header') is std_msgs.Header
+    assert typecache.message_classes['std_msgs/Header'] is std_msgs.Header
+
+
+def test_get_message_class_not_found():
+    assert typecache.get_message_class('not_a_pkg/NotAType') is None
+    assert 'not_a_pkg/NotAType' not in typecache.message_classes
+
+
+def test_get_default_factory():
+    factory = typecache.get_default_factory('std_msgs/Header')
+    assert factory() == std_msgs.Header()
+    assert factory() is not factory()
+
+
+def test_invalidate_type():
+    typecache.get_default_factory('std_msgs/Header')
+    typecache.get_default_factory('std_msgs/Empty')
+    typecache.invalidate('std_msgs/Header')
+    assert 'std_msgs/Header' not in typecache.message_classes
+    assert 'std_msgs/Header' not in typecache.default_factories
+    assert 'std_msgs/Empty' in typecache.default_factories
+
+
+def test_invalidate_all():
+    typecache.get_default_factory('std_msgs/Header')
+    typecache.invalidate()
+    assert not typecache.message_classes
+    assert not typecache.default_factories
+
+
+# Just in case we run this directly
+if __name__ == '__main__':
+    nose.runmodule(__name__)
@@ -0,0 +1,63 @@
+from __future__ import absolute_import
+from __future__ import print_function
+
+import struct
+from io import BytesIO
+
+try:
+    import genpy
+    import std_msgs.msg as std_msgs
+    from pyros_msgs import wire
+    from pyros_msgs.msg import test_opt_as_bitmask  # a message type just for testing
+except ImportError:
+    # Because we need to access Ros message types here (from ROS env or from virtualenv, or from somewhere else)
+    import pyros_setup
+    # We rely on default configuration to point us ot the proper distro
+    pyros_setup.configurable_import().configure().activate()
+    import genpy
+    import std_msgs.msg as std_msgs
+    from pyros_msgs import wire
+    from pyros_msgs.msg import test_opt_as_bitmask  # a message type just for testing
+
+import nose
+
+
+def serialize(msg):
+    buff = BytesIO()
+    msg.serialize(buff)
+    return buff.getvalue()
+
+
+def test_fixed_size():
+    assert wire.fixed_size('int32') == 4
+    assert wire.fixed_size('time') == 8
+    assert wire.fixed_size('float64[3]') == 24
+    assert wire.fixed_size('float64[]') is None
+    assert wire.fixed_size('string') is None
+    assert wire.fixed_size('std_msgs/Header') is None
+
+
+def test_spans():
+    header = std_msgs.Header(seq=42, stamp=genpy.Time(4, 2), frame_id='fortytwo')
+    msg = test_opt_as_bitmask(string_field='forty two', header_field=header, int32_array_field=[4, 2])
+    buf = serialize(msg)
+    spans = wire.spans(test_opt_as_bitmask, buf)
+    assert [s for s, _, _ in spans] == list(test_opt_as_bitmask.__slots__)
+    # fields are contiguous, and the last one ends the message
+    assert all(spans[i][2] == spans[i + 1][1] for i in range(len(spans) - 1))
+    assert spans[0][1] == 0 and spans[-1][2] == len(buf)
+    fields = dict((s, buf[start:end]) for s, start, end in spans)
+    assert fields['string_field'] == struct.pack('<I', 9) + b'forty two'
+    assert fields['header_field'] == serialize(header)
+    assert wire.skip('std_msgs/Header', fields['header_field']) == len(fields['header_field'])
+
+
+def test_spans_underfill():
+    buf = serialize(test_opt_as_bitmask(int32_array_field=[4, 2]))
+    with nose.tools.assert_raises(ValueError):
+        wire.spans(test_opt_as_bitmask, buf[:-1])
+
+
+# Just in case we run this directly
+if __name__ == '__main__':
+    nose.runmodule(__name__)